@@ -49,16 +49,13 @@ import sys
 import configparser
 import yaml
 
-from urllib3.util.retry import Retry
-import requests
-from requests.adapters import HTTPAdapter
-
 from flask import Flask, request
 from flask_cors import CORS
 from flask_babel import Babel
 
 from celery import Celery
 from celery.schedules import crontab
+from kombu import Exchange, Queue
 
 from flask_sqlalchemy import SQLAlchemy
 
@@ -78,15 +75,6 @@ try:
 
     CeleryConf = app.config['system_config']['celery']
 
-    # requests session
-    session = requests.Session()
-    session.keep_alive = False
-    retry = Retry(total=app.config['system_config']['global'].get('Retry'),
-                  backoff_factor=0.01, status_forcelist=[502, 503, 504])
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount('http://', adapter)
-    session.mount('https://', adapter)
-
     db_params = {
         'Host': app.config['dev_config']['Database']['Host'],
         'Port': app.config['dev_config']['Database']['Port'],
@@ -117,6 +105,21 @@ try:
     # register tasks
     app.config['imports'] = CeleryConf['CeleryTasks']
 
+    # priority queue for fair share / shortest job scheduling of bulk requests, an existing celery queue
+    # must be deleted once when enabling since RabbitMQ does not change arguments of a declared queue
+    if global_config['global'].get('SchedulingPolicies'):
+        app.config['task_queues'] = [Queue('celery', Exchange('celery'), routing_key='celery',
+                                           queue_arguments={'x-max-priority': global_config['global']['MaxJobPriority']})]
+        app.config['worker_prefetch_multiplier'] = 1  # prefetched messages would bypass priorities
+
+    # compact task payloads and results, json messages stay accepted for tasks queued before switching
+    if CeleryConf.get('TaskSerializer') == 'msgpack':
+        app.config['task_serializer'] = app.config['result_serializer'] = 'msgpack'
+        app.config['accept_content'] = ['json', 'msgpack']
+    if CeleryConf.get('TaskCompression'):
+        # celery compresses task messages with result_compression, task_compression is set for clarity only
+        app.config['task_compression'] = app.config['result_compression'] = CeleryConf['TaskCompression']
+
     # initialize celery
     celery = Celery(app.name, broker=app.config['CELERY_BROKER_URL'])
 
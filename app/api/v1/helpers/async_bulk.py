@@ -0,0 +1,212 @@
+"""
+ SPDX-License-Identifier: BSD-4-Clause-Clear
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ All rights reserved.
+
+ Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+ limitations in the disclaimer below) provided that the following conditions are met:
+
+ * Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+ * Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+ * All advertising materials mentioning features or use of this software, or any deployment of this software, or
+   documentation accompanying any distribution of this software, must display the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+   products derived from this software without specific prior written permission.
+
+ SPDX-License-Identifier: ZLIB-ACKNOWLEDGEMENT
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ This software is provided 'as-is', without any express or implied warranty. In no event will the authors be held liable
+ for any damages arising from the use of this software.
+
+ Permission is granted to anyone to use this software for any purpose, including commercial applications, and to alter
+ it and redistribute it freely, subject to the following restrictions:
+
+ * The origin of this software must not be misrepresented; you must not claim that you wrote the original software. If
+   you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Altered source versions must be plainly marked as such, and must not be misrepresented as being the original software.
+ * This notice may not be removed or altered from any source distribution.
+
+ NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+ THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+ THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+ DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+ BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.                                                               #
+"""
+
+import asyncio
+from time import monotonic
+
+from app import app
+from ..helpers.bulk_common import BulkCommonResources
+from ..helpers.batch_controller import BatchController
+from ..helpers.retry_policy import RetryPolicy
+from ..helpers.core_client import CoreClient
+from ..helpers.core_codec import CoreCodec
+from ..helpers.rate_limiter import RateLimiter
+from ..helpers.result_cache import ResultCache
+
+
+class AsyncBulkResources:
+    """Non-blocking fetch engine for bulk request."""
+
+    @staticmethod
+    def start_fetch(imeis_list, invalid_imeis, fetch_stats=None, records=None, progress=None):
+        """Process IMEI batches keeping a bounded number of batch requests in flight."""
+        try:
+            records = [] if records is None else records
+            unprocessed_imeis = []
+            controller = None
+            if app.config['system_config']['global'].get('AdaptiveFetch'):
+                controller = BatchController()
+                batches = controller.batches(imeis_list)
+            else:
+                batches = BulkCommonResources.batch_data(imeis_list)
+            policy = RetryPolicy()  # failed batches are retried individually with backoff, shared breaker per job
+            cache = ResultCache.create()
+            loop = asyncio.new_event_loop()
+            try:
+                loop.run_until_complete(AsyncBulkResources.fetch_batches(batches, records, unprocessed_imeis,
+                                                                         controller, policy, progress, cache))
+            finally:
+                loop.close()
+
+            policy.report(fetch_stats)
+            if cache is not None:
+                cache.report(fetch_stats)
+            if controller is not None and fetch_stats is not None:
+                fetch_stats['adaptive_fetch'] = controller.report()
+            return records, invalid_imeis, unprocessed_imeis
+        except Exception as e:
+            app.logger.info("Error occurred while fetching batches asynchronously.")
+            app.logger.exception(e)
+            raise e
+
+    @staticmethod
+    async def fetch_batches(batches, records, unprocessed_imeis, controller=None, policy=None, progress=None,
+                            cache=None):
+        """Drain IMEI batches with at most MaxInFlightBatches concurrent core requests."""
+        policy = policy or RetryPolicy()
+        max_in_flight = int(app.config['system_config']['global'].get('MaxInFlightBatches', 50))
+        pending = iter(batches)
+        gate = asyncio.Condition()
+        exhausted = asyncio.Event()
+        async with CoreClient.async_session(limit=max_in_flight) as client:
+            await asyncio.gather(*[AsyncBulkResources.drain(client, pending, records, unprocessed_imeis, controller,
+                                                            policy, gate, exhausted, worker, progress, cache)
+                                   for worker in range(max_in_flight)])
+
+    @staticmethod
+    async def drain(client, pending, records, unprocessed_imeis, controller, policy, gate, exhausted, worker,
+                    progress=None, cache=None):
+        """Pull batches from the shared iterator until it is exhausted."""
+        loop = asyncio.get_event_loop()
+        while True:
+            if controller is not None:
+                async with gate:  # workers above the controller's concurrency wait for it to grow
+                    await gate.wait_for(lambda: worker < controller.concurrency or exhausted.is_set())
+            # cancelled request drains like an exhausted one, records of fetched batches are kept. Cancellation is
+            # looked up in the database, like progress it must not block the event loop
+            cancelled = progress is not None and await loop.run_in_executor(None, progress.cancelled)
+            imeis = None if cancelled else next(pending, None)
+            if imeis is None:
+                exhausted.set()
+                async with gate:
+                    gate.notify_all()
+                break
+            await AsyncBulkResources.fetch_batch(client, imeis, records, unprocessed_imeis, controller, policy, gate,
+                                                 progress, cache)
+
+    @staticmethod
+    async def fetch_batch(client, imeis, records, unprocessed_imeis, controller, policy, gate, progress=None,
+                          cache=None):
+        """Fetch a single batch, retrying it with backoff and jitter while the breaker allows."""
+        imeis = list(imeis)  # IMEIs of lazy TAC ranges are generated batch by batch
+        batch_size = len(imeis)
+        results = records
+        loop = asyncio.get_event_loop()
+        if cache is not None:
+            # cache lookups may wait for other requests, they must not block the event loop
+            imeis = await loop.run_in_executor(None, cache.resolve, imeis, records)
+            results = []
+        attempt = 0
+        while imeis:
+            pause = policy.pause()
+            while pause > 0:
+                await asyncio.sleep(pause)
+                pause = policy.pause()
+            started = monotonic()
+            status = await AsyncBulkResources.get_records(client, imeis, results)
+            policy.record(status)
+            if controller is not None:
+                controller.record(monotonic() - started, status)
+                async with gate:
+                    gate.notify_all()
+            if status == 200:
+                if cache is not None:
+                    # pipelined summaries block while their stages are behind, keep that off the event loop
+                    await loop.run_in_executor(None, records.extend, results)
+                    await loop.run_in_executor(None, cache.store, imeis, results)
+                break
+            if policy.rejected(status) and len(imeis) > 1:
+                # core rejects the batch again on retry, halves isolate the offending IMEIs and verify the rest
+                if cache is not None:
+                    await loop.run_in_executor(None, cache.release, imeis)
+                for half in policy.bisect(imeis):
+                    await AsyncBulkResources.fetch_batch(client, half, records, unprocessed_imeis, controller, policy,
+                                                         gate, None, cache)
+                break
+            if policy.rejected(status):
+                # isolated IMEI is listed in the summary instead of unprocessed IMEIs, re-processing it is pointless
+                policy.reject(imeis)
+                if cache is not None:
+                    await loop.run_in_executor(None, cache.release, imeis)
+                break
+            if attempt >= policy.retries:
+                unprocessed_imeis.append(imeis)  # retries exhausted, append imei batch to unprocessed IMEIs list
+                if cache is not None:
+                    await loop.run_in_executor(None, cache.release, imeis)
+                if progress is not None:
+                    await loop.run_in_executor(None, progress.record, batch_size, False)
+                return
+            attempt += 1
+            if progress is not None and await loop.run_in_executor(None, progress.cancelled):
+                if cache is not None:
+                    await loop.run_in_executor(None, cache.release, imeis)
+                return
+            await asyncio.sleep(policy.delay(attempt))
+        if progress is not None:
+            await loop.run_in_executor(None, progress.record, batch_size)
+
+    @staticmethod
+    async def get_records(client, imeis, records):
+        """Compile a single IMEI batch response from DIRBS core system, returns response status."""
+        try:
+            await RateLimiter.acquire_async('bulk')
+            headers = {'content-type': 'application/json', 'charset': 'utf-8'}
+            async with client.post(CoreClient.url('imei-batch'),
+                                   data=CoreCodec.batch_request(imeis),
+                                   headers=headers) as imei_response:  # dirbs core batch api call
+                if imei_response.status == 200:
+                    content = await imei_response.read()
+                    if hasattr(records, 'feed'):
+                        # back-pressure of pipelined summary blocks an executor thread instead of the event loop
+                        await asyncio.get_event_loop().run_in_executor(None, records.feed, content)
+                    else:
+                        records.extend(CoreCodec.batch_results(content))
+                else:
+                    app.logger.info("imei batch failed due to status other than 200")
+                return imei_response.status
+        except Exception as e:
+            app.logger.exception(e)
+            return None
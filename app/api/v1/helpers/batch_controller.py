@@ -0,0 +1,111 @@
+"""
+ SPDX-License-Identifier: BSD-4-Clause-Clear
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ All rights reserved.
+
+ Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+ limitations in the disclaimer below) provided that the following conditions are met:
+
+ * Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+ * Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+ * All advertising materials mentioning features or use of this software, or any deployment of this software, or
+   documentation accompanying any distribution of this software, must display the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+   products derived from this software without specific prior written permission.
+
+ SPDX-License-Identifier: ZLIB-ACKNOWLEDGEMENT
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ This software is provided 'as-is', without any express or implied warranty. In no event will the authors be held liable
+ for any damages arising from the use of this software.
+
+ Permission is granted to anyone to use this software for any purpose, including commercial applications, and to alter
+ it and redistribute it freely, subject to the following restrictions:
+
+ * The origin of this software must not be misrepresented; you must not claim that you wrote the original software. If
+   you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Altered source versions must be plainly marked as such, and must not be misrepresented as being the original software.
+ * This notice may not be removed or altered from any source distribution.
+
+ NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+ THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+ THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+ DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+ BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.                                                               #
+"""
+
+from time import monotonic
+from threading import Lock
+
+from app import app
+
+
+class BatchController:
+    """AIMD controller for batch size and concurrency of DIRBS core batch calls."""
+
+    def __init__(self):
+        """Constructor."""
+        config = app.config['system_config']['global']
+        self.target_latency = float(config.get('TargetBatchLatency', 2))
+        self.min_batch_size = int(config.get('MinImeiBatchSize', 100))
+        self.max_batch_size = int(config['ImeiBatchSize'])
+        self.min_concurrency = int(config.get('MinInFlightBatches', 2))
+        self.max_concurrency = int(config.get('MaxInFlightBatches', 50))
+        self.batch_size = self.max_batch_size
+        self.concurrency = max(self.min_concurrency, min(int(config['NoOfThreads']), self.max_concurrency))
+        self.latency = None
+        self.successes = 0
+        self.increases = 0
+        self.decreases = 0
+        self.last_decrease = 0
+        self.lock = Lock()
+
+    def batches(self, imeis_list):
+        """Cut IMEI batches lazily using current batch size."""
+        start = 0
+        while start < len(imeis_list):
+            end = start + self.batch_size
+            yield imeis_list[start:end]
+            start = end
+
+    def record(self, latency, status):
+        """Adjust batch size and concurrency from a finished batch call."""
+        with self.lock:
+            self.latency = latency if self.latency is None else 0.3 * latency + 0.7 * self.latency
+            if status is None or status >= 500 or self.latency > self.target_latency:
+                # back off at most once per round trip, so one slow wave is not punished repeatedly
+                if monotonic() - self.last_decrease > self.latency:
+                    self.concurrency = max(self.min_concurrency, self.concurrency // 2)
+                    self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+                    self.last_decrease = monotonic()
+                    self.successes = 0
+                    self.decreases += 1
+            else:
+                self.successes += 1
+                if self.successes >= self.concurrency:  # grow once per round of in-flight batches
+                    self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+                    self.batch_size = min(self.max_batch_size,
+                                          self.batch_size + max(1, self.max_batch_size // 10))
+                    self.successes = 0
+                    self.increases += 1
+
+    def report(self):
+        """Return chosen values for the job summary."""
+        with self.lock:
+            return {
+                "batch_size": self.batch_size,
+                "concurrency": self.concurrency,
+                "latency": round(self.latency, 3) if self.latency is not None else None,
+                "increases": self.increases,
+                "decreases": self.decreases
+            }
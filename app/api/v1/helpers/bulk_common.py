@@ -45,11 +45,17 @@
 """
 
 import os
-from app import session
 from requests import ConnectionError
 from app.api.v1.handlers.error_handling import *
 from ..helpers.common import CommonResources
-
+from ..helpers.core_client import CoreClient
+from ..helpers.core_codec import CoreCodec
+from ..helpers.retry_policy import RetryPolicy
+from ..helpers.result_cache import ResultCache
+from ..helpers.fetch_executor import FetchExecutor
+from ..helpers.hedge_policy import HedgePolicy
+
+from time import sleep
 from threading import Thread
 from math import ceil
 
@@ -60,13 +66,18 @@ import uuid
 class BulkCommonResources:
     """Common resources for bulk request."""
 
+    @staticmethod
+    def batch_data(imeis_list):
+        """Divide IMEIs into batches of ImeiBatchSize."""
+        return list(imeis_list[i:i + app.config['system_config']['global']['ImeiBatchSize']] for i in
+                    range(0, len(imeis_list), app.config['system_config']['global']['ImeiBatchSize']))
+
     @staticmethod
     def chunked_data(imeis_list):
         """Divide IMEIs into batches of 1000 and chunks for multi threading."""
         try:
             if imeis_list:
-                imeis_list = list(imeis_list[i:i + app.config['system_config']['global']['ImeiBatchSize']] for i in
-                                  range(0, len(imeis_list), app.config['system_config']['global']['ImeiBatchSize']))
+                imeis_list = BulkCommonResources.batch_data(imeis_list)
                 chunksize = int(ceil(len(imeis_list) / app.config['system_config']['global']['NoOfThreads']))
                 imeis_list = list(imeis_list[i:i + chunksize] for i in range(0, len(imeis_list), chunksize))
                 return imeis_list
@@ -77,26 +88,46 @@ class BulkCommonResources:
             raise e
 
     @staticmethod
-    def start_threads(imeis_list, invalid_imeis):
+    def start_threads(imeis_list, invalid_imeis, records=None, fetch_stats=None, progress=None):
         """Process IMEIs simultaneously by starting multiple threads at a time."""
         try:
             thread_list = []
-            records = []
+            records = [] if records is None else records
             unprocessed_imeis = []
-            for imei in imeis_list:
-                thread_list.append(Thread(target=BulkCommonResources.get_records, args=(imei, records, unprocessed_imeis)))
-
-            # start threads for all imei chunks
-            for x in thread_list:
-                x.start()
-
-            # stop all threads on completion
-            for t in thread_list:
-                t.join()
+            policy = RetryPolicy()  # failed batches are retried individually with backoff, shared breaker per job
+            cache = ResultCache.create()
+            hedge = HedgePolicy.create(int(app.config['system_config']['global']['NoOfThreads']),
+                                       shared=bool(FetchExecutor.size()))
+            if FetchExecutor.size():
+                # shared threads of the worker process, the request keeps NoOfThreads batches in flight at most and
+                # schedules retries on them instead of sleeping through its backoff
+                FetchExecutor.run((batch for chunk in imeis_list for batch in chunk),
+                                  lambda batch, schedule: BulkCommonResources.fetch_batch(
+                                      batch, records, unprocessed_imeis, policy, progress, cache, hedge, schedule),
+                                  int(app.config['system_config']['global']['NoOfThreads']),
+                                  progress.cancelled if progress is not None else None)
+            else:
+                # threads pull batches from one shared queue, a thread held up by slow responses leaves the
+                # remaining batches to the others instead of a private chunk waiting behind it
+                batches = [batch for chunk in imeis_list for batch in chunk][::-1]
+                for _ in imeis_list:
+                    thread_list.append(Thread(target=BulkCommonResources.get_records,
+                                              args=(batches, records, unprocessed_imeis, policy, progress, cache,
+                                                    hedge)))
+
+                # start threads for all imei chunks
+                for x in thread_list:
+                    x.start()
 
-            if len(unprocessed_imeis)>0:
-                records, unprocessed_imeis = BulkCommonResources.retry(records, unprocessed_imeis)
+                # stop all threads on completion
+                for t in thread_list:
+                    t.join()
 
+            policy.report(fetch_stats)
+            if cache is not None:
+                cache.report(fetch_stats)
+            if hedge is not None:
+                hedge.report(fetch_stats)
             return records, invalid_imeis, unprocessed_imeis
         except Exception as e:
             app.logger.info("Error occurred while multi threading.")
@@ -105,61 +136,118 @@ class BulkCommonResources:
 
     # get records from core system
     @staticmethod
-    def get_records(imeis, records, unprocessed_imeis):
-        """Compile IMEIs batch responses from DIRBS core system."""
+    def get_records(imeis, records, unprocessed_imeis, policy=None, progress=None, cache=None, hedge=None):
+        """Compile IMEIs batch responses from DIRBS core system, imeis is a queue of batches shared by threads."""
         try:
+            policy = policy or RetryPolicy()
             while imeis:
-                imei = imeis.pop(-1)  # pop the last item from queue
+                if progress is not None and progress.cancelled():
+                    break  # request cancelled, records of fetched batches are kept
                 try:
-                    if imei:
-                        batch_req = {
-                            "imeis": imei
-                        }
-                        headers = {'content-type': 'application/json', 'charset': 'utf-8', 'keep_alive': 'false'}
-                        imei_response = session.post('{}/{}/imei-batch'.format(app.config['dev_config']['dirbs_core']['BaseUrl'], app.config['dev_config']['dirbs_core']['Version']),
-                                                     data=json.dumps(batch_req),
-                                                     headers=headers)  # dirbs core batch api call
-                        if imei_response.status_code == 200:
-                            imei_response = imei_response.json()
-                            records.extend(imei_response['results'])
-                        else:
-                            app.logger.info("imei batch failed due to status other than 200")
-                            unprocessed_imeis.append(imei)  # in case of connection error append imei count to unprocessed IMEIs list
-                    else:
-                        continue
-                except (ConnectionError, Exception) as e:
-                    unprocessed_imeis.append(imei)  # in case of connection error append imei count to unprocessed IMEIs list
-                    app.logger.exception(e)
+                    imei = imeis.pop(-1)  # pop the last item from queue
+                except IndexError:
+                    break  # last batch taken by another thread
+                if imei:
+                    BulkCommonResources.fetch_batch(imei, records, unprocessed_imeis, policy, progress, cache, hedge)
         except Exception as error:
             raise error
 
     @staticmethod
-    def retry(records, unprocessed_imeis):
-        """Retry failed IMEI batches."""
-        try:
-            retry = app.config['system_config']['global'].get('retry')
+    def fetch_batch(imeis, records, unprocessed_imeis, policy, progress=None, cache=None, hedge=None, schedule=None):
+        """Fetch a single batch, retrying it with backoff and jitter while the breaker allows.
+
+        With schedule(delay, retry) the batch hands its backoff and breaker pauses to the caller instead of sleeping.
+        """
+        imeis = list(imeis)  # IMEIs of lazy TAC ranges are generated batch by batch
+        batch_size = len(imeis)
+        if cache is not None:
+            imeis = cache.resolve(imeis, records)  # only IMEIs without cached result go out to core
+        BulkCommonResources.attempt_batch(imeis, batch_size, 0, records, unprocessed_imeis, policy, progress, cache,
+                                          hedge, schedule)
 
-            while retry and len(unprocessed_imeis) > 0:
-                threads = []
-                retry = retry - 1
-                imeis_list = unprocessed_imeis
-                unprocessed_imeis = []
-                chunksize = int(ceil(len(imeis_list) / app.config['system_config']['global']['NoOfThreads']))
-                imeis_list = list(imeis_list[i:i + chunksize] for i in
-                                  range(0, len(imeis_list), chunksize))  # make 100 chunks for 1 million imeis
-                for imeis in imeis_list:
-                    threads.append(Thread(target=BulkCommonResources.get_records, args=(imeis, records, unprocessed_imeis)))
-                for x in threads:
-                    x.start()
+    @staticmethod
+    def attempt_batch(imeis, batch_size, attempt, records, unprocessed_imeis, policy, progress, cache, hedge,
+                      schedule):
+        """Post a batch from the given retry attempt on until it is answered, rejected or out of retries."""
+        results = records if cache is None else []
+        while imeis:
+            pause = policy.pause()
+            if pause > 0:
+                if schedule is not None:
+                    schedule(pause, lambda: BulkCommonResources.attempt_batch(
+                        imeis, batch_size, attempt, records, unprocessed_imeis, policy, progress, cache, hedge,
+                        schedule))
+                    return
+                sleep(pause)  # breaker open
+                continue
+            if hedge is not None:
+                status = hedge.call(BulkCommonResources.post_batch, imeis, results)  # stragglers are duplicated
+            else:
+                status = BulkCommonResources.post_batch(imeis, results)
+            policy.record(status)
+            if status == 200:
+                if cache is not None:
+                    records.extend(results)
+                    cache.store(imeis, results)
+                break
+            if policy.rejected(status) and len(imeis) > 1:
+                # core rejects the batch again on retry, halves isolate the offending IMEIs and verify the rest
+                if cache is not None:
+                    cache.release(imeis)
+                for half in policy.bisect(imeis):
+                    BulkCommonResources.fetch_batch(half, records, unprocessed_imeis, policy, None, cache, hedge,
+                                                    schedule)
+                break
+            if policy.rejected(status):
+                # isolated IMEI is listed in the summary instead of unprocessed IMEIs, re-processing it is pointless
+                policy.reject(imeis)
+                if cache is not None:
+                    cache.release(imeis)
+                break
+            if attempt >= policy.retries:
+                unprocessed_imeis.append(imeis)  # retries exhausted, append imei batch to unprocessed IMEIs list
+                if cache is not None:
+                    cache.release(imeis)
+                if progress is not None:
+                    progress.record(batch_size, processed=False)
+                return
+            attempt += 1
+            if progress is not None and progress.cancelled():
+                if cache is not None:
+                    cache.release(imeis)
+                return
+            if schedule is not None:
+                schedule(policy.delay(attempt), lambda: BulkCommonResources.attempt_batch(
+                    imeis, batch_size, attempt, records, unprocessed_imeis, policy, progress, cache, hedge, schedule))
+                return
+            sleep(policy.delay(attempt))
+        if progress is not None:
+            progress.record(batch_size)
 
-                for t in threads:
-                    t.join()
+    @staticmethod
+    def collect(records, content):
+        """Compile a core batch response into records, pipelined summaries decode it in their own stage."""
+        if hasattr(records, 'feed'):
+            records.feed(content)
+        else:
+            records.extend(CoreCodec.batch_results(content))
 
-            return records, unprocessed_imeis
-        except Exception as e:
-            app.logger.info("Error occurred while retrying.")
+    @staticmethod
+    def post_batch(imeis, records):
+        """Post a batch to DIRBS core and compile its records, returns response status."""
+        try:
+            headers = {'content-type': 'application/json', 'charset': 'utf-8'}
+            imei_response = CoreClient.post('imei-batch', traffic='bulk',
+                                            data=CoreCodec.batch_request(imeis),
+                                            headers=headers)  # dirbs core batch api call
+            if imei_response.status_code == 200:
+                BulkCommonResources.collect(records, imei_response.content)
+            else:
+                app.logger.info("imei batch failed due to status other than 200")
+            return imei_response.status_code
+        except (ConnectionError, Exception) as e:
             app.logger.exception(e)
-            raise e
+            return None
 
     @staticmethod
     def build_summary(records, invalid_imeis, unprocessed_imeis):
@@ -233,18 +321,29 @@ class BulkCommonResources:
                 if "Compliant" not in status['status']:
                     complaint_report.append(status)
                     non_complaint += 1
-            complaint_report = pd.DataFrame(complaint_report)  # dataframe of compliant report
-            report_name = "report not generated."
-            if non_complaint != 0:
-                report_name = 'compliant_report' + str(uuid.uuid4()) + '.tsv'
-                complaint_report.to_csv(os.path.join(app.config['dev_config']['UPLOADS']['report_dir'], report_name),
-                                        sep='\t')  # writing non compliant statuses to .tsv file
+            report_name, complaint_report = BulkCommonResources.write_compliant_report(complaint_report)
             return non_complaint, report_name, complaint_report
         except Exception as e:
             app.logger.info("Error occurred while generating report.")
             app.logger.exception(e)
             raise e
 
+    @staticmethod
+    def write_compliant_report(complaint_report):
+        """Write non compliant statuses to report file, returns report name and dataframe."""
+        complaint_report = pd.DataFrame(complaint_report)  # dataframe of compliant report
+        report_name = "report not generated."
+        if len(complaint_report) != 0:
+            report_name = 'compliant_report' + str(uuid.uuid4()) + '.tsv'
+            complaint_report.to_csv(os.path.join(app.config['dev_config']['UPLOADS']['report_dir'], report_name),
+                                    sep='\t')  # writing non compliant statuses to .tsv file
+        return report_name, complaint_report
+
+    @staticmethod
+    def summary_context():
+        """Return request context needed to translate statuses outside of a flask request."""
+        return app.request_context({'wsgi.url_scheme': "", 'SERVER_PORT': "", 'SERVER_NAME': "", 'REQUEST_METHOD': ""})
+
     # count per condition classification state
     @staticmethod
     def count_condition(conditions, count):
@@ -0,0 +1,198 @@
+"""
+ SPDX-License-Identifier: BSD-4-Clause-Clear
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ All rights reserved.
+
+ Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+ limitations in the disclaimer below) provided that the following conditions are met:
+
+ * Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+ * Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+ * All advertising materials mentioning features or use of this software, or any deployment of this software, or
+   documentation accompanying any distribution of this software, must display the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+   products derived from this software without specific prior written permission.
+
+ SPDX-License-Identifier: ZLIB-ACKNOWLEDGEMENT
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ This software is provided 'as-is', without any express or implied warranty. In no event will the authors be held liable
+ for any damages arising from the use of this software.
+
+ Permission is granted to anyone to use this software for any purpose, including commercial applications, and to alter
+ it and redistribute it freely, subject to the following restrictions:
+
+ * The origin of this software must not be misrepresented; you must not claim that you wrote the original software. If
+   you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Altered source versions must be plainly marked as such, and must not be misrepresented as being the original software.
+ * This notice may not be removed or altered from any source distribution.
+
+ NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+ THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+ THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+ DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+ BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.                                                               #
+"""
+
+from queue import Queue
+from threading import Thread, Lock
+
+from billiard.pool import Pool, ApplyResult
+
+from app import app
+from ..helpers.core_codec import CoreCodec
+from ..helpers.compliant_report import CompliantReport
+from ..helpers.bulk_common import BulkCommonResources
+from ..helpers.summary_aggregator import SummaryAggregator
+
+
+class BulkPipeline:
+    """Bulk summary built by concurrent stages connected by bounded queues.
+
+    Fetch threads feed raw core batch responses, which are decoded, classified and written to the compliant
+    report by one thread per stage. Queues hold at most PipelineQueueSize batches, a full queue blocks the stage
+    feeding it so back-pressure reaches the fetch threads and memory stays bounded.
+
+    With PipelineProcesses set, raw responses are decoded and classified in a process pool shared by all
+    requests of the worker, which returns partial summaries so decoding and classification are not serialized
+    by the GIL of the fetching process. The pool is a billiard pool since prefork worker processes are daemonic and
+    may not start multiprocessing children, it is started at worker_process_init before any fetch thread runs.
+    """
+
+    _pool = None
+    _pool_lock = Lock()
+
+    def __init__(self, size=None, processes=None):
+        """Constructor."""
+        size = size or int(app.config['system_config']['global'].get('PipelineQueueSize', 8))
+        if processes is None:
+            processes = int(app.config['system_config']['global'].get('PipelineProcesses', 0))
+        self.processes = processes
+        self.decoded = Queue(size)  # raw batch responses waiting for decode
+        self.classified = Queue(size)  # decoded batch records waiting for classification
+        self.reported = Queue(size)  # non compliant statuses waiting to be written to report
+        self.summary = SummaryAggregator()
+        self.report = CompliantReport()
+        self.error = None
+        self.lock = Lock()
+        self.closed = False
+        self.stages = [Thread(target=self.stage, args=(self.decoded, self.decode, self.classified), daemon=True),
+                       Thread(target=self.stage, args=(self.classified, self.classify, self.reported), daemon=True),
+                       Thread(target=self.stage, args=(self.reported, self.write_report, None), daemon=True)]
+        for stage in self.stages:
+            stage.start()
+
+    def __len__(self):
+        """Count of classified IMEIs."""
+        return len(self.summary)
+
+    def feed(self, content):
+        """Queue a raw core batch response for decode, blocks while decode stage is behind."""
+        self.decoded.put(content)
+
+    def extend(self, results):
+        """Queue already decoded records for classification, same interface as list.extend."""
+        self.classified.put(list(results))
+
+    def stage(self, source, work, target):
+        """Run a stage until its source is closed, keeps draining source after an error so feeders never block."""
+        with BulkCommonResources.summary_context():
+            for item in iter(source.get, None):
+                if self.error is not None:
+                    continue
+                try:
+                    result = work(item)
+                    if target is not None and result:
+                        target.put(result)
+                except Exception as e:
+                    app.logger.info("Error occurred in bulk summary pipeline stage.")
+                    app.logger.exception(e)
+                    self.error = e
+        if target is not None:
+            target.put(None)  # close next stage once all items are passed on
+
+    @staticmethod
+    def start_pool(processes=None):
+        """Start process pool shared by pipelines of this worker process.
+
+        Without processes the pool is sized to PipelineProcesses, no-op when it is 0 or PipelinedSummary is off.
+        """
+        if processes is None:
+            config = app.config['system_config']['global']
+            processes = int(config.get('PipelineProcesses', 0)) if config.get('PipelinedSummary') else 0
+        with BulkPipeline._pool_lock:
+            if processes and BulkPipeline._pool is None:
+                BulkPipeline._pool = Pool(processes)
+            return BulkPipeline._pool
+
+    @staticmethod
+    def stop_pool():
+        """Terminate process pool of this worker process."""
+        with BulkPipeline._pool_lock:
+            if BulkPipeline._pool is not None:
+                BulkPipeline._pool.terminate()
+                BulkPipeline._pool = None
+
+    @staticmethod
+    def pool(processes):
+        """Return process pool of this worker process, started here only outside prefork workers (solo, tests)."""
+        return BulkPipeline._pool or BulkPipeline.start_pool(processes)
+
+    @staticmethod
+    def summarize(content):
+        """Decode and classify a raw core batch response in a pool process, returns partial summary."""
+        partial = SummaryAggregator()
+        with BulkCommonResources.summary_context():
+            for record in CoreCodec.batch_results(content):
+                partial.add(record)
+        return partial.partial()
+
+    def decode(self, content):
+        """Decode stage, returns records of a core batch response or a pending partial summary of the pool."""
+        if self.processes:
+            return BulkPipeline.pool(self.processes).apply_async(BulkPipeline.summarize, (content,))
+        return CoreCodec.batch_results(content)
+
+    def classify(self, records):
+        """Classification stage, folds records into summary and returns their non compliant statuses."""
+        partial = SummaryAggregator()
+        if isinstance(records, ApplyResult):
+            summary = records.get()  # raises WorkerLostError when the pool process died, billiard replaces it
+            partial.restore(summary, [])
+            non_compliant = summary['non_compliant']
+        else:
+            for record in records:
+                partial.add(record)
+            non_compliant, partial.non_compliant = partial.non_compliant, []
+        self.summary.merge(partial)
+        return non_compliant
+
+    def write_report(self, non_compliant):
+        """Report stage, appends non compliant statuses to compliant report file."""
+        self.report.append(non_compliant)
+
+    def close(self):
+        """Close pipeline and wait for all queued batches to pass through every stage."""
+        with self.lock:
+            if not self.closed:
+                self.closed = True
+                self.decoded.put(None)
+        for stage in self.stages:
+            stage.join()
+
+    def finalize(self, invalid_imeis, unprocessed_imeis):
+        """Drain pipeline and return summary in the same format as build_summary."""
+        self.close()
+        if self.error is not None:
+            raise self.error
+        return self.summary.finalize(invalid_imeis, unprocessed_imeis, report=(self.report.name, self.report.rows))
@@ -0,0 +1,146 @@
+"""
+ SPDX-License-Identifier: BSD-4-Clause-Clear
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ All rights reserved.
+
+ Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+ limitations in the disclaimer below) provided that the following conditions are met:
+
+ * Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+ * Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+ * All advertising materials mentioning features or use of this software, or any deployment of this software, or
+   documentation accompanying any distribution of this software, must display the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+   products derived from this software without specific prior written permission.
+
+ SPDX-License-Identifier: ZLIB-ACKNOWLEDGEMENT
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ This software is provided 'as-is', without any express or implied warranty. In no event will the authors be held liable
+ for any damages arising from the use of this software.
+
+ Permission is granted to anyone to use this software for any purpose, including commercial applications, and to alter
+ it and redistribute it freely, subject to the following restrictions:
+
+ * The origin of this software must not be misrepresented; you must not claim that you wrote the original software. If
+   you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Altered source versions must be plainly marked as such, and must not be misrepresented as being the original software.
+ * This notice may not be removed or altered from any source distribution.
+
+ NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+ THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+ THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+ DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+ BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.                                                               #
+"""
+
+import os
+import json
+
+from app import app
+from ..models.checkpoint import Checkpoint
+
+
+class BulkCheckpoint:
+    """Persist and restore progress of bulk requests so restarted jobs resume where they stopped."""
+
+    @staticmethod
+    def rows_path(tracking_id):
+        """Return path of the append-only file holding non compliant statuses of a request."""
+        return os.path.join(app.config['dev_config']['UPLOADS']['report_dir'], 'checkpoint_' + tracking_id + '.jsonl')
+
+    @staticmethod
+    def load(tracking_id, total_imeis, aggregator):
+        """Restore aggregator from last checkpoint of a request, returns its progress."""
+        try:
+            progress = {"completed_imeis": 0, "unprocessed_imeis": [], "rows": 0, "rows_offset": 0}
+            checkpoint = Checkpoint.find_by_trackingid(tracking_id)
+            if checkpoint is None or checkpoint['total_imeis'] != total_imeis:
+                BulkCheckpoint.clear(tracking_id)  # nothing to resume, drop leftovers of a different input
+                checkpoint = None
+            else:
+                progress = checkpoint['state']['progress']
+
+            rows = open(BulkCheckpoint.rows_path(tracking_id), 'a+')
+            rows.truncate(progress['rows_offset'])  # drop statuses written after the last committed checkpoint
+            non_compliant = []
+            if aggregator.budget:
+                # statuses stay in the rows file, the aggregator spills to it instead of reading them back
+                rows.seek(0, 2)
+                aggregator.spill_to(rows, progress['rows'])
+            else:
+                with rows:
+                    rows.seek(0)
+                    non_compliant = [json.loads(line) for line in rows]
+            if checkpoint is not None:
+                aggregator.restore(checkpoint['state']['summary'], non_compliant)
+                app.logger.info("resuming bulk request {0} from IMEI {1} of {2}".format(
+                    tracking_id, progress['completed_imeis'], total_imeis))
+            return progress
+        except Exception as e:
+            app.logger.info("Error occurred while loading checkpoint.")
+            app.logger.exception(e)
+            raise e
+
+    @staticmethod
+    def save(tracking_id, total_imeis, aggregator, progress):
+        """Persist progress and partial aggregates of a request, new statuses are appended to its rows file."""
+        try:
+            if aggregator.budget:
+                # aggregator spills to the rows file, statuses still in memory are spilled at every checkpoint
+                with aggregator.lock:
+                    aggregator.spill_rows()
+                    rows = aggregator.spill
+                    rows.flush()
+                    os.fsync(rows.fileno())
+                    progress['rows'] = aggregator.spilled
+                    progress['rows_offset'] = rows.tell()
+            else:
+                with open(BulkCheckpoint.rows_path(tracking_id), 'a') as rows:
+                    for row in aggregator.non_compliant[progress['rows']:]:
+                        rows.write(json.dumps(row) + '\n')
+                    rows.flush()
+                    os.fsync(rows.fileno())
+                    progress['rows'] = len(aggregator.non_compliant)
+                    progress['rows_offset'] = rows.tell()
+            Checkpoint.save({
+                "tracking_id": tracking_id,
+                "total_imeis": total_imeis,
+                "completed_imeis": progress['completed_imeis'],
+                "state": {"summary": aggregator.state(), "progress": progress}
+            })
+            return progress
+        except Exception as e:
+            app.logger.info("Error occurred while saving checkpoint.")
+            app.logger.exception(e)
+            raise e
+
+    @staticmethod
+    def clear(tracking_id):
+        """Remove checkpoint of a request."""
+        Checkpoint.delete(tracking_id)
+        if os.path.exists(BulkCheckpoint.rows_path(tracking_id)):
+            os.remove(BulkCheckpoint.rows_path(tracking_id))
+
+    @staticmethod
+    def move(tracking_id, new_tracking_id):
+        """Move checkpoint of a request resubmitted under a new tracking id so the new job resumes from it."""
+        try:
+            BulkCheckpoint.clear(new_tracking_id)
+            Checkpoint.move(tracking_id, new_tracking_id)
+            if os.path.exists(BulkCheckpoint.rows_path(tracking_id)):
+                os.replace(BulkCheckpoint.rows_path(tracking_id), BulkCheckpoint.rows_path(new_tracking_id))
+        except Exception as e:
+            app.logger.info("Error occurred while moving checkpoint.")
+            app.logger.exception(e)
+            raise e
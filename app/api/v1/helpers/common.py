@@ -45,8 +45,8 @@
 """
 
 from app import app
-import requests
 from flask_babel import _
+from ..helpers.core_client import CoreClient
 
 
 class CommonResources:
@@ -130,7 +130,7 @@ class CommonResources:
     def get_imei(imei):
         """Return IMEI response obtained from DIRBS core."""
 
-        imei_url = requests.get('{base}/{version}/imei/{imei}'.format(base=app.config['dev_config']['dirbs_core']['BaseUrl'], version=app.config['dev_config']['dirbs_core']['Version'], imei=imei))  # dirbs core imei api call
+        imei_url = CoreClient.get('imei/{imei}'.format(imei=imei))  # dirbs core imei api call
         try:
             if imei_url.status_code == 200:
                 response = imei_url.json()
@@ -145,7 +145,7 @@ class CommonResources:
         """Return TAC response obtained from DIRBS core."""
 
         try:
-            tac_response = requests.get('{}/{}/tac/{}'.format(app.config['dev_config']['dirbs_core']['BaseUrl'], app.config['dev_config']['dirbs_core']['Version'], tac))  # dirbs core tac api call
+            tac_response = CoreClient.get('tac/{}'.format(tac))  # dirbs core tac api call
             if tac_response.status_code == 200:
                 resp = tac_response.json()
                 return resp
@@ -158,7 +158,7 @@ class CommonResources:
         """Return registration information obtained from DIRBS core."""
 
         try:
-            reg_response = requests.get('{base}/{version}/imei/{imei}/info'.format(base=app.config['dev_config']['dirbs_core']['BaseUrl'], version=app.config['dev_config']['dirbs_core']['Version'], imei=imei))
+            reg_response = CoreClient.get('imei/{imei}/info'.format(imei=imei))
             if reg_response.status_code == 200:
                 resp = reg_response.json()
                 return resp
@@ -206,8 +206,8 @@ class CommonResources:
     def subscribers(imei, start, limit):
         """Return subscriber's details."""
         try:
-            seen_with_url = requests.get('{base}/{version}/imei/{imei}/subscribers?limit={limit}&offset={offset}'
-                                         .format(base=app.config['dev_config']['dirbs_core']['BaseUrl'], version=app.config['dev_config']['dirbs_core']['Version'], imei=imei, limit=limit, offset=start))  # dirbs core imei api call
+            seen_with_url = CoreClient.get('imei/{imei}/subscribers?limit={limit}&offset={offset}'
+                                           .format(imei=imei, limit=limit, offset=start))  # dirbs core imei api call
             seen_with_resp = seen_with_url.json()
             response = {"count": seen_with_resp.get('_keys').get('result_size'),
                         "start": start,
@@ -221,9 +221,8 @@ class CommonResources:
     def pairings(imei, start, limit):
         """Return pairings information."""
         try:
-            pairings_url = requests.get('{base}/{version}/imei/{imei}/pairings?limit={limit}&offset={offset}'
-                                         .format(base=app.config['dev_config']['dirbs_core']['BaseUrl'], version=app.config['dev_config']['dirbs_core']['Version'], imei=imei, limit=limit,
-                                                 offset=start))  # dirbs core imei api call
+            pairings_url = CoreClient.get('imei/{imei}/pairings?limit={limit}&offset={offset}'
+                                          .format(imei=imei, limit=limit, offset=start))  # dirbs core imei api call
             pairings_resp = pairings_url.json()
             response = {"count": pairings_resp.get('_keys').get('result_size'),
                         "start": start,
@@ -0,0 +1,126 @@
+"""
+ SPDX-License-Identifier: BSD-4-Clause-Clear
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ All rights reserved.
+
+ Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+ limitations in the disclaimer below) provided that the following conditions are met:
+
+ * Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+ * Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+ * All advertising materials mentioning features or use of this software, or any deployment of this software, or
+   documentation accompanying any distribution of this software, must display the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+   products derived from this software without specific prior written permission.
+
+ SPDX-License-Identifier: ZLIB-ACKNOWLEDGEMENT
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ This software is provided 'as-is', without any express or implied warranty. In no event will the authors be held liable
+ for any damages arising from the use of this software.
+
+ Permission is granted to anyone to use this software for any purpose, including commercial applications, and to alter
+ it and redistribute it freely, subject to the following restrictions:
+
+ * The origin of this software must not be misrepresented; you must not claim that you wrote the original software. If
+   you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Altered source versions must be plainly marked as such, and must not be misrepresented as being the original software.
+ * This notice may not be removed or altered from any source distribution.
+
+ NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+ THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+ THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+ DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+ BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.                                                               #
+"""
+
+import os
+from threading import Lock
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+from app import app
+from .rate_limiter import RateLimiter
+
+
+class CoreClient:
+    """Pooled keep-alive HTTP client used for every DIRBS core call."""
+
+    _sessions = {}
+    _pid = None
+    _lock = Lock()
+
+    @staticmethod
+    def url(path):
+        """Return absolute DIRBS core url for an api path."""
+        return '{base}/{version}/{path}'.format(base=app.config['dev_config']['dirbs_core']['BaseUrl'],
+                                                version=app.config['dev_config']['dirbs_core']['Version'], path=path)
+
+    @staticmethod
+    def timeout(connect=None, read=None):
+        """Return (connect, read) timeout tuple, defaults taken from configurations."""
+        return (connect or app.config['system_config']['global'].get('CoreConnectTimeout', 5),
+                read or app.config['system_config']['global'].get('CoreReadTimeout', 60))
+
+    @staticmethod
+    def session(traffic='interactive'):
+        """Return pooled session of current process for interactive or bulk traffic."""
+        with CoreClient._lock:
+            if CoreClient._pid != os.getpid():  # sessions must not share sockets with a forked parent process
+                CoreClient._sessions = {}
+                CoreClient._pid = os.getpid()
+            if traffic not in CoreClient._sessions:
+                CoreClient._sessions[traffic] = CoreClient.build_session(traffic)
+            return CoreClient._sessions[traffic]
+
+    @staticmethod
+    def build_session(traffic):
+        """Create keep-alive session with connection pool sized to the caller's concurrency."""
+        session = requests.Session()
+        if traffic == 'bulk':
+            config = app.config['system_config']['global']
+            # shared fetch threads may outnumber NoOfThreads and every fetch thread may have a hedged duplicate
+            # in flight, connections beyond the pool size would be closed instead of kept alive
+            pool_size = max(int(config['NoOfThreads']), int(config.get('SharedFetchThreads', 0)))
+            if config.get('HedgePercentile'):
+                pool_size *= 2
+        else:
+            pool_size = int(app.config['system_config']['global'].get('CorePoolSize', 10))
+        # no transport level retries, bulk batches are retried by RetryPolicy with backoff and jitter
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    @staticmethod
+    def get(path, traffic='interactive', timeout=None, **kwargs):
+        """Send GET request to DIRBS core."""
+        RateLimiter.acquire(traffic)
+        return CoreClient.session(traffic).get(CoreClient.url(path), timeout=timeout or CoreClient.timeout(),
+                                               **kwargs)
+
+    @staticmethod
+    def post(path, traffic='interactive', timeout=None, **kwargs):
+        """Send POST request to DIRBS core."""
+        RateLimiter.acquire(traffic)
+        return CoreClient.session(traffic).post(CoreClient.url(path), timeout=timeout or CoreClient.timeout(),
+                                                **kwargs)
+
+    @staticmethod
+    def async_session(limit):
+        """Return aiohttp session pooled to limit connections using configured core timeouts."""
+        connect, read = CoreClient.timeout()
+        return aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=limit),
+                                     timeout=aiohttp.ClientTimeout(sock_connect=connect, sock_read=read))
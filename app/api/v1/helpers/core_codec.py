@@ -0,0 +1,95 @@
+"""
+ SPDX-License-Identifier: BSD-4-Clause-Clear
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ All rights reserved.
+
+ Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+ limitations in the disclaimer below) provided that the following conditions are met:
+
+ * Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+ * Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+ * All advertising materials mentioning features or use of this software, or any deployment of this software, or
+   documentation accompanying any distribution of this software, must display the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+   products derived from this software without specific prior written permission.
+
+ SPDX-License-Identifier: ZLIB-ACKNOWLEDGEMENT
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ This software is provided 'as-is', without any express or implied warranty. In no event will the authors be held liable
+ for any damages arising from the use of this software.
+
+ Permission is granted to anyone to use this software for any purpose, including commercial applications, and to alter
+ it and redistribute it freely, subject to the following restrictions:
+
+ * The origin of this software must not be misrepresented; you must not claim that you wrote the original software. If
+   you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Altered source versions must be plainly marked as such, and must not be misrepresented as being the original software.
+ * This notice may not be removed or altered from any source distribution.
+
+ NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+ THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+ THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+ DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+ BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.                                                               #
+"""
+
+import json
+
+from app import app
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, standard json is used without it
+    orjson = None
+
+
+class CoreCodec:
+    """JSON codec for DIRBS core batch traffic."""
+
+    # record fields read by bulk summary and non compliant report
+    SUMMARY_FIELDS = ('imei_norm', 'registration_status', 'stolen_status', 'realtime_checks',
+                      'classification_state', 'block_date')
+
+    @staticmethod
+    def fast():
+        """Return True when orjson is configured and installed."""
+        return orjson is not None and app.config['system_config']['global'].get('CoreJsonCodec', 'json') == 'orjson'
+
+    @staticmethod
+    def dumps(obj):
+        """Encode object to JSON."""
+        return orjson.dumps(obj) if CoreCodec.fast() else json.dumps(obj)
+
+    @staticmethod
+    def loads(content):
+        """Decode JSON bytes or string."""
+        return orjson.loads(content) if CoreCodec.fast() else json.loads(content)
+
+    @staticmethod
+    def batch_request(imeis):
+        """Encode imei-batch request body."""
+        return CoreCodec.dumps({"imeis": imeis})
+
+    @staticmethod
+    def batch_results(content):
+        """Decode imei-batch response body, keeping only summary fields if configured."""
+        results = CoreCodec.loads(content)['results']
+        if app.config['system_config']['global'].get('ExtractSummaryFields'):
+            return [CoreCodec.extract(record) for record in results]
+        return results
+
+    @staticmethod
+    def extract(record):
+        """Return record with summary fields only."""
+        return {field: record[field] for field in CoreCodec.SUMMARY_FIELDS if field in record}
@@ -0,0 +1,198 @@
+"""
+ SPDX-License-Identifier: BSD-4-Clause-Clear
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ All rights reserved.
+
+ Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+ limitations in the disclaimer below) provided that the following conditions are met:
+
+ * Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+ * Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+ * All advertising materials mentioning features or use of this software, or any deployment of this software, or
+   documentation accompanying any distribution of this software, must display the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+   products derived from this software without specific prior written permission.
+
+ SPDX-License-Identifier: ZLIB-ACKNOWLEDGEMENT
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ This software is provided 'as-is', without any express or implied warranty. In no event will the authors be held liable
+ for any damages arising from the use of this software.
+
+ Permission is granted to anyone to use this software for any purpose, including commercial applications, and to alter
+ it and redistribute it freely, subject to the following restrictions:
+
+ * The origin of this software must not be misrepresented; you must not claim that you wrote the original software. If
+   you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Altered source versions must be plainly marked as such, and must not be misrepresented as being the original software.
+ * This notice may not be removed or altered from any source distribution.
+
+ NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+ THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+ THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+ DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+ BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.                                                               #
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from heapq import heappop, heappush
+from itertools import count
+from threading import Condition, Event, Thread
+from time import monotonic
+
+from app import app
+
+
+class FetchJob:
+    """Batches of a bulk request waiting for shared fetch threads."""
+
+    def __init__(self, batches, work, limit, cancelled=None):
+        """Constructor."""
+        self.batches = deque(batches)
+        self.work = work
+        self.limit = limit  # batches of this request in flight at most
+        self.cancelled = cancelled
+        self.retries = []  # heap of (due time, sequence, retry) scheduled by batches backing off
+        self.active = 0
+        self.error = None
+        self.done = Event()
+
+    def due(self):
+        """Return seconds until the next scheduled retry is due, None without retries."""
+        if not self.retries:
+            return None
+        return self.retries[0][0] - monotonic()
+
+    def ready(self):
+        """Return True when a batch or due retry can be taken without exceeding limit of the request."""
+        due = self.due()
+        return (bool(self.batches) or (due is not None and due <= 0)) and self.active < self.limit
+
+    def take(self):
+        """Return next task of the request, due retries before new batches, caller holds the condition."""
+        self.active += 1
+        due = self.due()
+        if due is not None and due <= 0:
+            return heappop(self.retries)[2]
+        batch = self.batches.popleft()
+        return lambda: self.work(batch, lambda delay, retry: FetchExecutor.schedule(self, delay, retry))
+
+    def finished(self):
+        """Return True when all batches and retries are taken and none is in flight."""
+        return not self.batches and not self.retries and not self.active
+
+
+class FetchExecutor:
+    """Long lived fetch threads of a worker process, shared by all bulk requests running in it.
+
+    At most SharedFetchThreads batches are in flight per process. Idle threads serve requests in turn, each
+    taking the next batch of the request after the one it served last, and a request never has more than
+    NoOfThreads batches in flight. Batches backing off are scheduled for retry instead of holding a thread, and
+    hedged duplicate calls of all requests go through one pool of the process.
+    """
+
+    _condition = Condition()
+    _jobs = deque()
+    _threads = []
+    _sequence = count()
+    _hedge_executor = None
+
+    @staticmethod
+    def size():
+        """Return configured count of shared fetch threads, 0 when requests start their own threads."""
+        return int(app.config['system_config']['global'].get('SharedFetchThreads', 0))
+
+    @staticmethod
+    def hedge_executor():
+        """Return pool running hedged core calls of shared threads, a call and its duplicate per shared thread."""
+        with FetchExecutor._condition:
+            if FetchExecutor._hedge_executor is None:
+                FetchExecutor._hedge_executor = ThreadPoolExecutor(max_workers=2 * FetchExecutor.size())
+            return FetchExecutor._hedge_executor
+
+    @staticmethod
+    def run(batches, work, limit, cancelled=None):
+        """Fetch batches of a request on shared threads by calling work for each batch, returns once all are done.
+
+        work is called with the batch and a schedule(delay, retry) callable, retry is called on a shared thread
+        once delay seconds have passed. cancelled is asked before every batch and retry, remaining ones are
+        dropped once it returns True.
+        """
+        job = FetchJob(batches, work, limit, cancelled)
+        if not job.batches:
+            return
+        with FetchExecutor._condition:
+            FetchExecutor._jobs.append(job)
+            while len(FetchExecutor._threads) < FetchExecutor.size():
+                thread = Thread(target=FetchExecutor.serve, daemon=True)
+                FetchExecutor._threads.append(thread)
+                thread.start()
+            FetchExecutor._condition.notify_all()
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+
+    @staticmethod
+    def schedule(job, delay, retry):
+        """Schedule retry of a request to run on a shared thread after delay seconds."""
+        with FetchExecutor._condition:
+            heappush(job.retries, (monotonic() + delay, next(FetchExecutor._sequence), retry))
+            FetchExecutor._condition.notify_all()
+
+    @staticmethod
+    def next_due():
+        """Return seconds until a scheduled retry of a request below its limit is due, caller holds the condition."""
+        due = [job.due() for job in FetchExecutor._jobs if job.retries and job.active < job.limit]
+        return max(0, min(due)) if due else None
+
+    @staticmethod
+    def next_job():
+        """Return request to take a batch from in round robin order, caller holds the condition."""
+        for _ in range(len(FetchExecutor._jobs)):
+            job = FetchExecutor._jobs[0]
+            FetchExecutor._jobs.rotate(-1)
+            if job.ready():
+                return job
+        return None
+
+    @staticmethod
+    def serve():
+        """Shared fetch thread, takes batches of running requests for the lifetime of the process."""
+        while True:
+            with FetchExecutor._condition:
+                job = FetchExecutor.next_job()
+                while job is None:
+                    FetchExecutor._condition.wait(FetchExecutor.next_due())
+                    job = FetchExecutor.next_job()
+                task = job.take()
+            stop = False
+            try:
+                if job.cancelled is not None and job.cancelled():
+                    stop = True  # request cancelled, records of fetched batches are kept
+                else:
+                    task()
+            except Exception as e:
+                app.logger.info("Error occurred while fetching batch on shared thread.")
+                app.logger.exception(e)
+                job.error = e
+                stop = True
+            with FetchExecutor._condition:
+                if stop:
+                    job.batches.clear()
+                    job.retries = []
+                job.active -= 1
+                if job.finished():
+                    FetchExecutor._jobs.remove(job)
+                    job.done.set()
+                FetchExecutor._condition.notify_all()
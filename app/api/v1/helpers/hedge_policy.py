@@ -0,0 +1,144 @@
+"""
+ SPDX-License-Identifier: BSD-4-Clause-Clear
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ All rights reserved.
+
+ Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+ limitations in the disclaimer below) provided that the following conditions are met:
+
+ * Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+ * Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+ * All advertising materials mentioning features or use of this software, or any deployment of this software, or
+   documentation accompanying any distribution of this software, must display the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+   products derived from this software without specific prior written permission.
+
+ SPDX-License-Identifier: ZLIB-ACKNOWLEDGEMENT
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ This software is provided 'as-is', without any express or implied warranty. In no event will the authors be held liable
+ for any damages arising from the use of this software.
+
+ Permission is granted to anyone to use this software for any purpose, including commercial applications, and to alter
+ it and redistribute it freely, subject to the following restrictions:
+
+ * The origin of this software must not be misrepresented; you must not claim that you wrote the original software. If
+   you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Altered source versions must be plainly marked as such, and must not be misrepresented as being the original software.
+ * This notice may not be removed or altered from any source distribution.
+
+ NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+ THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+ THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+ DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+ BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.                                                               #
+"""
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from threading import Lock
+from time import monotonic
+
+from app import app
+from ..helpers.fetch_executor import FetchExecutor
+
+
+class HedgePolicy:
+    """Duplicates core batch calls running longer than a percentile of recent batch latencies, first answer wins.
+
+    Duplicate calls are capped to HedgeMaxRatio of all batch calls of the request.
+    """
+
+    MIN_SAMPLES = 20  # batch latencies observed before any call is hedged
+
+    def __init__(self, threads, shared=False):
+        """Constructor, shared policies send calls through the hedge pool of the shared fetch threads."""
+        config = app.config['system_config']['global']
+        self.percentile = float(config.get('HedgePercentile') or 0)
+        self.max_ratio = float(config.get('HedgeMaxRatio', 0.05))
+        self.latencies = deque(maxlen=int(config.get('HedgeWindow', 200)))
+        self.calls = 0
+        self.hedged = 0
+        self.wins = 0
+        self.lock = Lock()
+        self.shared = shared
+        if shared:
+            self.executor = FetchExecutor.hedge_executor()
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=2 * threads)  # a call and its duplicate per fetch thread
+
+    @staticmethod
+    def create(threads, shared=False):
+        """Return hedge policy of a request, None when hedging is disabled."""
+        if app.config['system_config']['global'].get('HedgePercentile'):
+            return HedgePolicy(threads, shared)
+        return None
+
+    def threshold(self):
+        """Return seconds after which a batch call is hedged, None until enough latencies are observed."""
+        with self.lock:
+            if len(self.latencies) < self.MIN_SAMPLES:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))]
+
+    def allow(self):
+        """Return True and count a duplicate call if the request is below its hedging budget."""
+        with self.lock:
+            if self.hedged + 1 > self.max_ratio * self.calls:
+                return False
+            self.hedged += 1
+            return True
+
+    def call(self, post, imeis, records):
+        """Post a batch, sending a duplicate call once it runs past the latency threshold, returns status."""
+        with self.lock:
+            self.calls += 1
+        threshold = self.threshold()
+        started = monotonic()
+        if threshold is None:
+            status = post(imeis, records)
+            if status == 200:
+                with self.lock:
+                    self.latencies.append(monotonic() - started)
+            return status
+
+        results = [[]]
+        futures = [self.executor.submit(post, imeis, results[0])]
+        done, _ = wait(futures, timeout=threshold)
+        if not done and self.allow():
+            results.append([])
+            futures.append(self.executor.submit(post, imeis, results[1]))
+        status = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                status = future.result()  # post catches its own errors and returns None
+                if status == 200:
+                    records.extend(results[futures.index(future)])  # the slower answer is discarded
+                    with self.lock:
+                        self.latencies.append(monotonic() - started)
+                        self.wins += futures.index(future)
+                    return status
+        return status
+
+    def report(self, fetch_stats):
+        """Add hedging figures of this policy to the job's fetch stats and release its threads."""
+        if not self.shared:
+            self.executor.shutdown(wait=False)
+        if fetch_stats is not None:
+            stats = fetch_stats.setdefault('hedged_requests', {"batch_calls": 0, "hedged_calls": 0, "hedge_wins": 0})
+            stats['batch_calls'] += self.calls
+            stats['hedged_calls'] += self.hedged
+            stats['hedge_wins'] += self.wins
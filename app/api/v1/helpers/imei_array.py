@@ -0,0 +1,95 @@
+"""
+ SPDX-License-Identifier: BSD-4-Clause-Clear
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ All rights reserved.
+
+ Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+ limitations in the disclaimer below) provided that the following conditions are met:
+
+ * Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+ * Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+ * All advertising materials mentioning features or use of this software, or any deployment of this software, or
+   documentation accompanying any distribution of this software, must display the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+   products derived from this software without specific prior written permission.
+
+ SPDX-License-Identifier: ZLIB-ACKNOWLEDGEMENT
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ This software is provided 'as-is', without any express or implied warranty. In no event will the authors be held liable
+ for any damages arising from the use of this software.
+
+ Permission is granted to anyone to use this software for any purpose, including commercial applications, and to alter
+ it and redistribute it freely, subject to the following restrictions:
+
+ * The origin of this software must not be misrepresented; you must not claim that you wrote the original software. If
+   you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Altered source versions must be plainly marked as such, and must not be misrepresented as being the original software.
+ * This notice may not be removed or altered from any source distribution.
+
+ NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+ THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+ THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+ DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+ BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.                                                               #
+"""
+
+from base64 import b64decode, b64encode
+
+import numpy as np
+
+
+class ImeiArray:
+    """Compact IMEIs list, all digit IMEIs of one length are kept as int64 and others as fixed width bytes."""
+
+    def __init__(self, values, width=None):
+        """Constructor."""
+        self.values = values
+        self.width = width  # digit count of int64 IMEIs, None for bytes
+
+    @staticmethod
+    def pack(imeis):
+        """Pack validated IMEI strings."""
+        widths = {len(imei) for imei in imeis}
+        if len(widths) == 1 and all(imei.isdigit() for imei in imeis):
+            return ImeiArray(np.fromiter((int(imei) for imei in imeis), dtype=np.int64, count=len(imeis)),
+                             widths.pop())
+        return ImeiArray(np.array([imei.encode() for imei in imeis], dtype='S16'))
+
+    def __len__(self):
+        """Count of IMEIs."""
+        return len(self.values)
+
+    def __iter__(self):
+        """Generate IMEI strings."""
+        return (self.imei(value) for value in self.values)
+
+    def __getitem__(self, key):
+        """Return IMEI string at index, slices are zero copy views."""
+        if isinstance(key, slice):
+            return ImeiArray(self.values[key], self.width)
+        return self.imei(self.values[key])
+
+    def imei(self, value):
+        """Convert packed value to IMEI string."""
+        return value.decode() if self.width is None else str(value).zfill(self.width)
+
+    def descriptor(self):
+        """Celery payload of packed IMEIs."""
+        return {"imeis": b64encode(self.values.tobytes()).decode(), "dtype": self.values.dtype.str,
+                "width": self.width}
+
+    @staticmethod
+    def from_descriptor(payload):
+        """Unpack celery payload without copying values."""
+        return ImeiArray(np.frombuffer(b64decode(payload['imeis']), dtype=payload['dtype']), payload['width'])
@@ -0,0 +1,98 @@
+"""
+ SPDX-License-Identifier: BSD-4-Clause-Clear
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ All rights reserved.
+
+ Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+ limitations in the disclaimer below) provided that the following conditions are met:
+
+ * Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+ * Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+ * All advertising materials mentioning features or use of this software, or any deployment of this software, or
+   documentation accompanying any distribution of this software, must display the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+   products derived from this software without specific prior written permission.
+
+ SPDX-License-Identifier: ZLIB-ACKNOWLEDGEMENT
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ This software is provided 'as-is', without any express or implied warranty. In no event will the authors be held liable
+ for any damages arising from the use of this software.
+
+ Permission is granted to anyone to use this software for any purpose, including commercial applications, and to alter
+ it and redistribute it freely, subject to the following restrictions:
+
+ * The origin of this software must not be misrepresented; you must not claim that you wrote the original software. If
+   you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Altered source versions must be plainly marked as such, and must not be misrepresented as being the original software.
+ * This notice may not be removed or altered from any source distribution.
+
+ NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+ THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+ THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+ DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+ BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.                                                               #
+"""
+
+from .imei_array import ImeiArray
+from .job_input import JobInputStore
+
+
+class ImeiRange:
+    """Lazy IMEI range of a TAC, IMEIs are generated only when a batch is fetched."""
+
+    def __init__(self, tac, start, count, width=6):
+        """Constructor."""
+        self.tac = str(tac)
+        self.start = int(start)
+        self.count = int(count)
+        self.width = int(width)
+
+    def __len__(self):
+        """Count of IMEIs in range."""
+        return self.count
+
+    def __iter__(self):
+        """Generate IMEIs of range."""
+        return (self.imei(serial) for serial in range(self.start, self.start + self.count))
+
+    def __getitem__(self, key):
+        """Return IMEI at index, slices without step return a lazy sub range."""
+        serials = range(self.start, self.start + self.count)[key]
+        if isinstance(key, slice):
+            if serials.step == 1:
+                return ImeiRange(self.tac, serials.start, len(serials), self.width)
+            return [self.imei(serial) for serial in serials]
+        return self.imei(serials)
+
+    def imei(self, serial):
+        """Build IMEI from TAC and serial number."""
+        return self.tac + str(serial).zfill(self.width)
+
+    def descriptor(self):
+        """Compact (TAC, start, count) descriptor sent to celery instead of IMEIs."""
+        return {"tac": self.tac, "start": self.start, "count": self.count, "width": self.width}
+
+    @staticmethod
+    def dump(imeis_list):
+        """Return celery payload of an IMEIs list, packed array or range."""
+        return imeis_list.descriptor() if isinstance(imeis_list, (ImeiRange, ImeiArray)) else imeis_list
+
+    @staticmethod
+    def load(payload):
+        """Return IMEIs list, packed array, stored input or lazy range of a celery payload."""
+        if isinstance(payload, dict):
+            if 'input' in payload:
+                return JobInputStore.get(payload)  # claim check of an input kept in job input store
+            return ImeiRange(**payload) if 'tac' in payload else ImeiArray.from_descriptor(payload)
+        return payload
@@ -0,0 +1,106 @@
+"""
+ SPDX-License-Identifier: BSD-4-Clause-Clear
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ All rights reserved.
+
+ Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+ limitations in the disclaimer below) provided that the following conditions are met:
+
+ * Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+ * Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+ * All advertising materials mentioning features or use of this software, or any deployment of this software, or
+   documentation accompanying any distribution of this software, must display the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+   products derived from this software without specific prior written permission.
+
+ SPDX-License-Identifier: ZLIB-ACKNOWLEDGEMENT
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ This software is provided 'as-is', without any express or implied warranty. In no event will the authors be held liable
+ for any damages arising from the use of this software.
+
+ Permission is granted to anyone to use this software for any purpose, including commercial applications, and to alter
+ it and redistribute it freely, subject to the following restrictions:
+
+ * The origin of this software must not be misrepresented; you must not claim that you wrote the original software. If
+   you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Altered source versions must be plainly marked as such, and must not be misrepresented as being the original software.
+ * This notice may not be removed or altered from any source distribution.
+
+ NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+ THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+ THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+ DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+ BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.                                                               #
+"""
+
+import os
+import tempfile
+
+import numpy as np
+
+from app import app
+from ..helpers.imei_array import ImeiArray
+
+
+class JobInputStore:
+    """Claim check store of bulk request inputs, only a reference and counts are sent through the celery broker.
+
+    IMEIs are kept packed in JobInputDir, which must be shared by web and worker hosts, and workers read the
+    range of a task memory mapped from it.
+    """
+
+    @staticmethod
+    def backend():
+        """Return configured store backend, empty when inputs are sent inline."""
+        return app.config['system_config']['global'].get('JobInputStore') or ''
+
+    @staticmethod
+    def path(tracking_id):
+        """Return path of stored input of a request."""
+        directory = app.config['system_config']['global'].get('JobInputDir') or tempfile.gettempdir()
+        return os.path.join(directory, 'job_input_' + tracking_id + '.npy')
+
+    @staticmethod
+    def put(tracking_id, imeis_list):
+        """Store IMEIs of a request, returns reference to all of them."""
+        try:
+            packed = imeis_list if isinstance(imeis_list, ImeiArray) else ImeiArray.pack(list(imeis_list))
+            np.save(JobInputStore.path(tracking_id), packed.values)
+            return {"input": tracking_id, "start": 0, "count": len(packed), "width": packed.width}
+        except Exception as e:
+            app.logger.info("Error occurred while storing bulk request input.")
+            app.logger.exception(e)
+            raise e
+
+    @staticmethod
+    def part(reference, start, count):
+        """Return reference to a range of stored IMEIs."""
+        return dict(reference, start=reference['start'] + start,
+                    count=max(0, min(count, reference['count'] - start)))
+
+    @staticmethod
+    def get(reference):
+        """Return stored IMEIs of a reference, values are read from disk as they are used."""
+        values = np.load(JobInputStore.path(reference['input']), mmap_mode='r' if reference['count'] else None)
+        return ImeiArray(values[reference['start']:reference['start'] + reference['count']], reference['width'])
+
+    @staticmethod
+    def delete(tracking_id):
+        """Remove stored input of a finished request."""
+        try:
+            if os.path.exists(JobInputStore.path(tracking_id)):
+                os.remove(JobInputStore.path(tracking_id))
+        except Exception as e:
+            app.logger.info("Error occurred while removing bulk request input.")
+            app.logger.exception(e)
@@ -0,0 +1,114 @@
+"""
+ SPDX-License-Identifier: BSD-4-Clause-Clear
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ All rights reserved.
+
+ Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+ limitations in the disclaimer below) provided that the following conditions are met:
+
+ * Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+ * Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+ * All advertising materials mentioning features or use of this software, or any deployment of this software, or
+   documentation accompanying any distribution of this software, must display the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+   products derived from this software without specific prior written permission.
+
+ SPDX-License-Identifier: ZLIB-ACKNOWLEDGEMENT
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ This software is provided 'as-is', without any express or implied warranty. In no event will the authors be held liable
+ for any damages arising from the use of this software.
+
+ Permission is granted to anyone to use this software for any purpose, including commercial applications, and to alter
+ it and redistribute it freely, subject to the following restrictions:
+
+ * The origin of this software must not be misrepresented; you must not claim that you wrote the original software. If
+   you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Altered source versions must be plainly marked as such, and must not be misrepresented as being the original software.
+ * This notice may not be removed or altered from any source distribution.
+
+ NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+ THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+ THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+ DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+ BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.                                                               #
+"""
+
+from threading import Lock
+from time import monotonic
+
+from app import app
+from ..models.job_progress import JobProgress
+from ..models.summary import Summary
+
+
+class ProgressTracker:
+    """Counts fetched batches of a bulk request, publishing them at most every ProgressInterval seconds.
+
+    Fetch loops also ask the tracker before every batch whether the request has been cancelled.
+    """
+
+    def __init__(self, tracking_id):
+        """Constructor."""
+        self.tracking_id = tracking_id
+        self.interval = float(app.config['system_config']['global'].get('ProgressInterval', 5))
+        self.batches_done = 0
+        self.batches_failed = 0
+        self.imeis_done = 0
+        self.published = None  # first batch is published right away to mark the start of processing
+        self.lock = Lock()
+        self.cancel_interval = float(app.config['system_config']['global'].get('CancelCheckInterval', 1))
+        self.checked = None
+        self.is_cancelled = False
+
+    def record(self, imeis_count, processed=True):
+        """Count a batch once it is processed or given up."""
+        with self.lock:
+            if processed:
+                self.batches_done += 1
+            else:
+                self.batches_failed += 1
+            self.imeis_done += imeis_count
+            due = self.published is None or monotonic() - self.published >= self.interval
+        if due:
+            self.publish()
+
+    def publish(self):
+        """Publish counts since last publish, progress is best effort and never fails the request."""
+        with self.lock:
+            counts = (self.batches_done, self.batches_failed, self.imeis_done)
+            self.batches_done = self.batches_failed = self.imeis_done = 0
+            self.published = monotonic()
+        if self.tracking_id is None or not any(counts):
+            return
+        try:
+            JobProgress.add(self.tracking_id, *counts)
+        except Exception as e:
+            app.logger.info("Error occurred while publishing bulk request progress.")
+            app.logger.exception(e)
+
+    def cancelled(self):
+        """Return True once the request is cancelled, looked up at most every CancelCheckInterval seconds."""
+        if self.tracking_id is None or self.is_cancelled:
+            return self.is_cancelled
+        with self.lock:
+            due = self.checked is None or monotonic() - self.checked >= self.cancel_interval
+            if due:
+                self.checked = monotonic()
+        if due:
+            try:
+                self.is_cancelled = Summary.is_cancelled(self.tracking_id)
+            except Exception as e:
+                app.logger.info("Error occurred while checking bulk request cancellation.")
+                app.logger.exception(e)
+        return self.is_cancelled
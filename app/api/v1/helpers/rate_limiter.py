@@ -0,0 +1,117 @@
+"""
+ SPDX-License-Identifier: BSD-4-Clause-Clear
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ All rights reserved.
+
+ Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+ limitations in the disclaimer below) provided that the following conditions are met:
+
+ * Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+ * Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+ * All advertising materials mentioning features or use of this software, or any deployment of this software, or
+   documentation accompanying any distribution of this software, must display the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+   products derived from this software without specific prior written permission.
+
+ SPDX-License-Identifier: ZLIB-ACKNOWLEDGEMENT
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ This software is provided 'as-is', without any express or implied warranty. In no event will the authors be held liable
+ for any damages arising from the use of this software.
+
+ Permission is granted to anyone to use this software for any purpose, including commercial applications, and to alter
+ it and redistribute it freely, subject to the following restrictions:
+
+ * The origin of this software must not be misrepresented; you must not claim that you wrote the original software. If
+   you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Altered source versions must be plainly marked as such, and must not be misrepresented as being the original software.
+ * This notice may not be removed or altered from any source distribution.
+
+ NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+ THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+ THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+ DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+ BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.                                                               #
+"""
+
+import asyncio
+from threading import Lock
+from time import monotonic, sleep
+
+from app import app
+from ..models.rate_limit import RateLimit
+
+
+class RateLimiter:
+    """Token bucket limits of DIRBS core calls per traffic class, shared in postgres or local to the process."""
+
+    _buckets = {}
+    _lock = Lock()
+
+    @staticmethod
+    def limits(traffic):
+        """Return (rate, burst) of traffic class."""
+        config = app.config['system_config']['global']
+        prefix = 'Bulk' if traffic == 'bulk' else 'Interactive'
+        rate = float(config['{0}RateLimit'.format(prefix)])
+        return rate, float(config.get('{0}Burst'.format(prefix)) or rate)
+
+    @staticmethod
+    def acquire(traffic='interactive'):
+        """Block until a core call of traffic class is allowed."""
+        wait = RateLimiter.reserve(traffic)
+        while wait:
+            sleep(wait)
+            wait = RateLimiter.reserve(traffic)
+
+    @staticmethod
+    async def acquire_async(traffic='bulk'):
+        """Wait without blocking event loop until a core call of traffic class is allowed."""
+        loop = asyncio.get_event_loop()
+        wait = await loop.run_in_executor(None, RateLimiter.reserve, traffic)  # postgres bucket blocks on database
+        while wait:
+            await asyncio.sleep(wait)
+            wait = await loop.run_in_executor(None, RateLimiter.reserve, traffic)
+
+    @staticmethod
+    def reserve(traffic='interactive'):
+        """Take a token if available, otherwise return seconds to wait before trying again."""
+        backend = app.config['system_config']['global'].get('RateLimitBackend')
+        if not backend:
+            return 0
+        wait = RateLimiter.take(backend, traffic, *RateLimiter.limits(traffic))
+        if wait and traffic == 'bulk' and app.config['system_config']['global'].get('BulkBorrowsInteractive'):
+            # bulk soaks up spare interactive budget while the interactive bucket is more than half full
+            rate, burst = RateLimiter.limits('interactive')
+            if not RateLimiter.take(backend, 'interactive', rate, burst, floor=burst / 2):
+                return 0
+        return wait
+
+    @staticmethod
+    def take(backend, traffic, rate, burst, floor=0):
+        """Take a token from bucket of configured backend, returns seconds to wait if none."""
+        if backend == 'postgres':
+            try:
+                return RateLimit.take(traffic, rate, burst, floor)
+            except Exception as e:
+                # core calls are not blocked when the shared bucket is unavailable
+                app.logger.info("Error occurred while taking rate limit token, call is not limited.")
+                app.logger.exception(e)
+                return 0
+        with RateLimiter._lock:
+            now = monotonic()
+            tokens, updated = RateLimiter._buckets.get(traffic, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            wait = 0 if tokens - 1 >= floor else (floor + 1 - tokens) / rate
+            RateLimiter._buckets[traffic] = (tokens if wait else tokens - 1, now)
+            return wait
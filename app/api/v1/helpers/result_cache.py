@@ -0,0 +1,261 @@
+"""
+ SPDX-License-Identifier: BSD-4-Clause-Clear
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ All rights reserved.
+
+ Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+ limitations in the disclaimer below) provided that the following conditions are met:
+
+ * Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+ * Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+ * All advertising materials mentioning features or use of this software, or any deployment of this software, or
+   documentation accompanying any distribution of this software, must display the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+   products derived from this software without specific prior written permission.
+
+ SPDX-License-Identifier: ZLIB-ACKNOWLEDGEMENT
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ This software is provided 'as-is', without any express or implied warranty. In no event will the authors be held liable
+ for any damages arising from the use of this software.
+
+ Permission is granted to anyone to use this software for any purpose, including commercial applications, and to alter
+ it and redistribute it freely, subject to the following restrictions:
+
+ * The origin of this software must not be misrepresented; you must not claim that you wrote the original software. If
+   you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Altered source versions must be plainly marked as such, and must not be misrepresented as being the original software.
+ * This notice may not be removed or altered from any source distribution.
+
+ NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+ THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+ THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+ DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+ BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.                                                               #
+"""
+
+import json
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from threading import Event, Lock
+from time import monotonic, sleep
+
+from app import app
+from ..models.imei_cache import ImeiCache
+
+
+class ResultCache:
+    """Per request view of DIRBS core results cached across requests by normalized IMEI.
+
+    IMEIs missing from the cache are claimed while in flight, other requests wait for their result
+    instead of querying core again.
+    """
+
+    _records = OrderedDict()  # local backend, normalized IMEI: (record, cached monotonic time)
+    _in_flight = {}  # local backend, normalized IMEI: event set once its lookup is finished
+    _lock = Lock()
+
+    def __init__(self, backend):
+        """Constructor."""
+        config = app.config['system_config']['global']
+        self.backend = backend
+        self.ttl = float(config.get('ResultCacheTTL', 21600))
+        self.wait_timeout = float(config.get('ResultCacheWait', 30))
+        self.local_size = int(config.get('ResultCacheLocalSize', 1000000))
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.max_age = 0
+        self.lock = Lock()
+
+    @staticmethod
+    def create():
+        """Return result cache of a request, None if caching is disabled."""
+        backend = app.config['system_config']['global'].get('ResultCacheBackend')
+        return ResultCache(backend) if backend else None
+
+    @staticmethod
+    def normalize(imei):
+        """Normalize IMEI the way core reports it in imei_norm."""
+        return imei[:14] if imei[:14].isdigit() else imei.upper()
+
+    def resolve(self, imeis, records):
+        """Add cached records of a batch to records, returns IMEIs to be fetched from core."""
+        try:
+            hits, pending, misses = self.lookup(imeis)
+            coalesced = []
+            if pending:
+                coalesced, pending = self.wait(pending)
+            records.extend(hits + coalesced)
+            with self.lock:
+                self.hits += len(hits)
+                self.coalesced += len(coalesced)
+                self.misses += len(misses) + len(pending)
+            return misses + pending
+        except Exception as e:
+            # cache is best effort, whole batch is fetched from core
+            app.logger.info("Error occurred while looking up cached results.")
+            app.logger.exception(e)
+            return imeis
+
+    def lookup(self, imeis):
+        """Split IMEIs into cached records, IMEIs in flight for other requests and misses claimed by this one."""
+        hits, pending, misses = [], [], []
+        entries = self.entries(imeis)
+        for imei in imeis:
+            record, age, in_flight = entries[ResultCache.normalize(imei)]
+            if record is not None:
+                hits.append(record)
+                with self.lock:
+                    self.max_age = max(self.max_age, age)
+            elif in_flight:
+                pending.append(imei)
+            else:
+                misses.append(imei)
+        self.claim({ResultCache.normalize(imei) for imei in misses},
+                   {key for key, (record, age, in_flight) in entries.items() if age is not None and not in_flight})
+        return hits, pending, misses
+
+    def entries(self, imeis):
+        """Return {normalized IMEI: (fresh record, age, in flight)} of IMEIs."""
+        keys = {ResultCache.normalize(imei) for imei in imeis}
+        entries = dict.fromkeys(keys, (None, None, False))
+        if self.backend == 'postgres':
+            now = datetime.utcnow()
+            for key, (record, cached_time) in ImeiCache.find(list(keys)).items():
+                age = max((now - cached_time).total_seconds(), 0)
+                if record is None:  # claims older than the wait timeout belong to lost lookups
+                    entries[key] = (None, age, age < self.wait_timeout)
+                else:
+                    entries[key] = (json.loads(record) if age < self.ttl else None, age, False)
+            return entries
+        with ResultCache._lock:
+            now = monotonic()
+            for key in keys:
+                record, cached_time = ResultCache._records.get(key, (None, None))
+                age = now - cached_time if cached_time is not None else None
+                entries[key] = (record if age is not None and age < self.ttl else None, age,
+                                key in ResultCache._in_flight)
+        return entries
+
+    def claim(self, keys, expired):
+        """Mark keys in flight, a failed claim only means lookups of this batch are not shared."""
+        if self.backend == 'postgres':
+            ImeiCache.claim(list(keys), datetime.utcnow(), list(expired & keys))
+            return
+        with ResultCache._lock:
+            for key in keys:
+                ResultCache._in_flight.setdefault(key, Event())
+
+    def wait(self, imeis):
+        """Wait for lookups of other requests, returns their records and IMEIs to be fetched by this one."""
+        deadline = monotonic() + self.wait_timeout
+        records, pending, unresolved = [], list(imeis), []
+        while pending:
+            entries = self.entries(pending)
+            waiting = []
+            for imei in pending:
+                record, age, in_flight = entries[ResultCache.normalize(imei)]
+                if record is not None:
+                    records.append(record)
+                elif in_flight:
+                    waiting.append(imei)
+                else:
+                    unresolved.append(imei)  # lookup of the other request failed
+            pending = waiting
+            remaining = deadline - monotonic()
+            if pending and remaining <= 0:
+                unresolved.extend(pending)
+                break
+            if pending:
+                self.pause(ResultCache.normalize(pending[0]), remaining)
+        return records, unresolved
+
+    def pause(self, key, timeout):
+        """Wait until a lookup in flight may have finished."""
+        if self.backend == 'postgres':
+            sleep(min(0.2, timeout))
+            return
+        event = ResultCache._in_flight.get(key)
+        if event is not None:
+            event.wait(timeout)
+
+    def store(self, imeis, results):
+        """Cache core results of a batch and release claims of its IMEIs."""
+        try:
+            if self.backend == 'postgres':
+                ImeiCache.store({result['imei_norm']: json.dumps(result) for result in results}, datetime.utcnow())
+            else:
+                with ResultCache._lock:
+                    now = monotonic()
+                    for result in results:
+                        ResultCache._records[result['imei_norm']] = (result, now)
+                        ResultCache._records.move_to_end(result['imei_norm'])
+                    while len(ResultCache._records) > self.local_size:
+                        ResultCache._records.popitem(last=False)  # oldest entries are evicted first
+        except Exception as e:
+            app.logger.info("Error occurred while caching results.")
+            app.logger.exception(e)
+        self.release(imeis)
+
+    def release(self, imeis):
+        """Release claims of IMEIs, waiting requests fetch IMEIs without cached result themselves."""
+        keys = {ResultCache.normalize(imei) for imei in imeis}
+        try:
+            if self.backend == 'postgres':
+                ImeiCache.release(list(keys))
+                return
+            with ResultCache._lock:
+                for key in keys:
+                    event = ResultCache._in_flight.pop(key, None)
+                    if event is not None:
+                        event.set()
+        except Exception as e:
+            app.logger.info("Error occurred while releasing cache claims.")
+            app.logger.exception(e)
+
+    def report(self, fetch_stats):
+        """Add hit ratio and freshness of cached results to the request's fetch stats."""
+        if fetch_stats is not None:
+            stats = fetch_stats.setdefault('result_cache', {"hits": 0, "coalesced": 0, "misses": 0,
+                                                            "max_hit_age_seconds": 0, "ttl_seconds": self.ttl})
+            stats['hits'] += self.hits
+            stats['coalesced'] += self.coalesced
+            stats['misses'] += self.misses
+            stats['max_hit_age_seconds'] = max(stats['max_hit_age_seconds'], int(self.max_age))
+            ResultCache.hit_ratio(stats)
+
+    @staticmethod
+    def hit_ratio(stats):
+        """Set ratio of IMEIs served without own core call."""
+        total = stats['hits'] + stats['coalesced'] + stats['misses']
+        stats['hit_ratio'] = round((stats['hits'] + stats['coalesced']) / total, 4) if total else 0
+
+    @staticmethod
+    def merge_report(fetch_stats, stats):
+        """Merge result cache stats of a distributed subtask."""
+        if 'result_cache' not in fetch_stats:
+            fetch_stats['result_cache'] = dict(stats)
+            return
+        merged = fetch_stats['result_cache']
+        for key in ('hits', 'coalesced', 'misses'):
+            merged[key] += stats[key]
+        merged['max_hit_age_seconds'] = max(merged['max_hit_age_seconds'], stats['max_hit_age_seconds'])
+        ResultCache.hit_ratio(merged)
+
+    @staticmethod
+    def purge():
+        """Delete shared cache entries older than the cache TTL."""
+        if app.config['system_config']['global'].get('ResultCacheBackend') == 'postgres':
+            ttl = float(app.config['system_config']['global'].get('ResultCacheTTL', 21600))
+            ImeiCache.purge(datetime.utcnow() - timedelta(seconds=ttl))
@@ -0,0 +1,168 @@
+"""
+ SPDX-License-Identifier: BSD-4-Clause-Clear
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ All rights reserved.
+
+ Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+ limitations in the disclaimer below) provided that the following conditions are met:
+
+ * Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+ * Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+ * All advertising materials mentioning features or use of this software, or any deployment of this software, or
+   documentation accompanying any distribution of this software, must display the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+   products derived from this software without specific prior written permission.
+
+ SPDX-License-Identifier: ZLIB-ACKNOWLEDGEMENT
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ This software is provided 'as-is', without any express or implied warranty. In no event will the authors be held liable
+ for any damages arising from the use of this software.
+
+ Permission is granted to anyone to use this software for any purpose, including commercial applications, and to alter
+ it and redistribute it freely, subject to the following restrictions:
+
+ * The origin of this software must not be misrepresented; you must not claim that you wrote the original software. If
+   you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Altered source versions must be plainly marked as such, and must not be misrepresented as being the original software.
+ * This notice may not be removed or altered from any source distribution.
+
+ NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+ THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+ THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+ DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+ BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.                                                               #
+"""
+
+import random
+from time import sleep, monotonic
+from collections import deque
+from threading import Lock
+
+from app import app
+
+
+class CircuitBreaker:
+    """Pauses a bulk request while DIRBS core error rate is above threshold."""
+
+    def __init__(self):
+        """Constructor."""
+        config = app.config['system_config']['global']
+        self.error_rate = float(config.get('BreakerErrorRate', 0.5))
+        self.cooldown = float(config.get('BreakerCooldown', 10))
+        self.window = deque(maxlen=int(config.get('BreakerWindow', 20)))
+        self.state = 'closed'
+        self.opened_at = 0
+        self.trips = 0
+        self.lock = Lock()
+
+    def acquire(self):
+        """Return seconds to wait before calling core, 0 when the call may go ahead."""
+        with self.lock:
+            if self.state == 'open':
+                remaining = self.opened_at + self.cooldown - monotonic()
+                if remaining > 0:
+                    return remaining
+                self.state = 'half_open'  # this caller becomes the probe
+                return 0
+            if self.state == 'half_open':
+                return min(self.cooldown, 0.5)  # wait for the probe result
+            return 0
+
+    def record(self, status):
+        """Record result of a core call, 5xx and connection errors count as failures."""
+        ok = status is not None and status < 500
+        with self.lock:
+            if self.state == 'half_open':
+                if ok:
+                    self.state = 'closed'
+                    self.window.clear()
+                else:
+                    self.open()
+                return
+            self.window.append(ok)
+            if self.state == 'closed' and len(self.window) == self.window.maxlen and \
+                    self.window.count(False) >= self.error_rate * len(self.window):
+                self.open()
+
+    def open(self):
+        """Open the breaker, caller holds the lock."""
+        self.state = 'open'
+        self.opened_at = monotonic()
+        self.trips += 1
+        app.logger.info("core error rate above threshold, pausing bulk request for {0}s".format(self.cooldown))
+
+
+class RetryPolicy:
+    """Per batch retry scheduling with exponential backoff, full jitter and a circuit breaker."""
+
+    def __init__(self):
+        """Constructor."""
+        config = app.config['system_config']['global']
+        self.retries = int(config.get('Retry') or 0)
+        self.base = float(config.get('RetryBackoffBase', 0.5))
+        self.cap = float(config.get('RetryBackoffMax', 30))
+        self.breaker = CircuitBreaker()
+        self.retried_batches = 0
+        self.bisected_batches = 0
+        self.rejected_imeis = []
+        self.lock = Lock()
+
+    @staticmethod
+    def rejected(status):
+        """Return True when core rejects the content of a batch, other client errors come from configuration."""
+        return status in (400, 422)
+
+    def bisect(self, imeis):
+        """Split a rejected batch in halves to isolate the IMEIs core rejects, returns the halves."""
+        with self.lock:
+            self.bisected_batches += 1
+        half = len(imeis) // 2
+        return imeis[:half], imeis[half:]
+
+    def reject(self, imeis):
+        """Keep IMEIs isolated by bisection that core rejects on their own, they are listed in the summary."""
+        with self.lock:
+            self.rejected_imeis.extend(str(imei) for imei in imeis)
+
+    def delay(self, attempt):
+        """Return jittered backoff delay for the given retry attempt."""
+        with self.lock:
+            self.retried_batches += 1
+        return random.uniform(0, min(self.cap, self.base * 2 ** attempt))
+
+    def pause(self):
+        """Return seconds to pause before the next core call."""
+        return self.breaker.acquire()
+
+    def wait(self):
+        """Block calling thread while the breaker is open."""
+        pause = self.pause()
+        while pause > 0:
+            sleep(pause)
+            pause = self.pause()
+
+    def record(self, status):
+        """Record result of a core call."""
+        self.breaker.record(status)
+
+    def report(self, fetch_stats):
+        """Add retry figures of this policy to the job's fetch stats."""
+        if fetch_stats is not None:
+            stats = fetch_stats.setdefault('core_retries', {"retried_batches": 0, "breaker_trips": 0})
+            stats['retried_batches'] += self.retried_batches
+            stats['breaker_trips'] += self.breaker.trips
+            stats = fetch_stats.setdefault('batch_bisection', {"bisected_batches": 0, "rejected_imeis": 0})
+            stats['bisected_batches'] += self.bisected_batches
+            stats['rejected_imeis'] += len(self.rejected_imeis)
+            fetch_stats.setdefault('rejected_imeis', []).extend(self.rejected_imeis)
@@ -0,0 +1,262 @@
+"""
+ SPDX-License-Identifier: BSD-4-Clause-Clear
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ All rights reserved.
+
+ Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+ limitations in the disclaimer below) provided that the following conditions are met:
+
+ * Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+ * Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+ * All advertising materials mentioning features or use of this software, or any deployment of this software, or
+   documentation accompanying any distribution of this software, must display the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+   products derived from this software without specific prior written permission.
+
+ SPDX-License-Identifier: ZLIB-ACKNOWLEDGEMENT
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ This software is provided 'as-is', without any express or implied warranty. In no event will the authors be held liable
+ for any damages arising from the use of this software.
+
+ Permission is granted to anyone to use this software for any purpose, including commercial applications, and to alter
+ it and redistribute it freely, subject to the following restrictions:
+
+ * The origin of this software must not be misrepresented; you must not claim that you wrote the original software. If
+   you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Altered source versions must be plainly marked as such, and must not be misrepresented as being the original software.
+ * This notice may not be removed or altered from any source distribution.
+
+ NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+ THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+ THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+ DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+ BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.                                                               #
+"""
+
+import sys
+import json
+import tempfile
+from itertools import islice
+from threading import Lock
+
+from app import app
+from ..helpers.common import CommonResources
+from ..helpers.bulk_common import BulkCommonResources
+from ..helpers.compliant_report import CompliantReport
+
+
+class SummaryAggregator:
+    """Running DVS bulk summary, folds core batch results as soon as they arrive.
+
+    Once non compliant statuses kept in memory cross the memory budget of the job they are spilled to an
+    append-only temp file, which is merged into the compliant report when the summary is finalized.
+    """
+
+    SPILL_CHUNK = 10000  # statuses read back from spill file per report chunk
+
+    def __init__(self, budget=0):
+        """Constructor, budget is bytes of non compliant statuses kept in memory, 0 for no limit."""
+        self.verified_imei = 0
+        self.pending_registration = 0
+        self.pending_stolen_verification = 0
+        self.no_condition = 0
+        self.blocking_count = {}
+        self.info_count = {}
+        self.non_compliant = []  # only non compliant statuses are kept for the report
+        self.lock = Lock()
+        self.budget = budget
+        self.non_compliant_size = 0
+        self.spill = None
+        self.spilled = 0
+
+    @staticmethod
+    def job_budget():
+        """Return per job memory budget in bytes from JobMemoryBudget megabytes, 0 for no limit."""
+        return int(float(app.config['system_config']['global'].get('JobMemoryBudget', 0)) * 1024 * 1024)
+
+    @staticmethod
+    def row_size(row):
+        """Estimate memory held by a non compliant status."""
+        size = sys.getsizeof(row)
+        for value in row.values():
+            size += sys.getsizeof(value)
+            if isinstance(value, list):
+                size += sum(sys.getsizeof(item) for item in value)
+        return size
+
+    def __len__(self):
+        """Count of verified IMEIs."""
+        return self.verified_imei
+
+    def extend(self, results):
+        """Fold a batch of core results into the summary, same interface as list.extend."""
+        partial = SummaryAggregator()
+        with BulkCommonResources.summary_context():
+            for record in results:
+                partial.add(record)
+        self.merge(partial)
+
+    def add(self, record):
+        """Fold a single IMEI record, not thread safe, use extend for shared aggregators."""
+        self.verified_imei += 1
+        if record['registration_status']['provisional_only'] is True:
+            self.pending_registration += 1
+        if record['stolen_status']['provisional_only'] is True:
+            self.pending_stolen_verification += 1
+
+        conditions_met = False
+        for condition in record['classification_state']['blocking_conditions']:
+            met = bool(condition['condition_met'])
+            self.blocking_count[condition['condition_name']] = self.blocking_count.get(condition['condition_name'], 0) + met
+            conditions_met = conditions_met or met
+        for condition in record['classification_state']['informative_conditions']:
+            met = bool(condition['condition_met'])
+            self.info_count[condition['condition_name']] = self.info_count.get(condition['condition_name'], 0) + met
+            conditions_met = conditions_met or met
+        if not conditions_met and not any(record['realtime_checks'].values()):
+            self.no_condition += 1
+
+        status = CommonResources.compliance_status(resp=record, status_type="bulk", imei=record['imei_norm'])
+        if "Compliant" not in status['status']:
+            self.non_compliant.append(status)
+
+    def merge(self, other):
+        """Merge counters of another aggregator into this one."""
+        with self.lock:
+            self.verified_imei += other.verified_imei
+            self.pending_registration += other.pending_registration
+            self.pending_stolen_verification += other.pending_stolen_verification
+            self.no_condition += other.no_condition
+            for name, count in other.blocking_count.items():
+                self.blocking_count[name] = self.blocking_count.get(name, 0) + count
+            for name, count in other.info_count.items():
+                self.info_count[name] = self.info_count.get(name, 0) + count
+            self.non_compliant.extend(other.non_compliant)
+            if self.budget:
+                self.non_compliant_size += sum(self.row_size(row) for row in other.non_compliant)
+                if self.non_compliant_size > self.budget:
+                    self.spill_rows()
+
+    def spill_rows(self):
+        """Move non compliant statuses held in memory to spill file, caller holds the lock."""
+        if self.spill is None:
+            spill_dir = app.config['system_config']['global'].get('SpillDir') or None  # system temp dir by default
+            self.spill = tempfile.TemporaryFile(mode='w+', dir=spill_dir)
+        for row in self.non_compliant:
+            self.spill.write(json.dumps(row) + '\n')
+        self.spilled += len(self.non_compliant)
+        self.non_compliant = []
+        self.non_compliant_size = 0
+
+    def spill_to(self, spill, spilled):
+        """Spill to an open file already holding spilled statuses, e.g. rows file of a checkpointed request."""
+        with self.lock:
+            self.spill = spill
+            self.spilled = spilled
+
+    def non_compliant_count(self):
+        """Count of non compliant statuses, spilled ones included."""
+        return self.spilled + len(self.non_compliant)
+
+    def rows(self):
+        """Yield chunks of non compliant statuses, spilled ones first."""
+        if self.spill is not None:
+            self.spill.flush()
+            self.spill.seek(0)
+            while True:
+                chunk = [json.loads(line) for line in islice(self.spill, self.SPILL_CHUNK)]
+                if not chunk:
+                    break
+                yield chunk
+            self.spill.seek(0, 2)  # later spills append again
+        if self.non_compliant:
+            yield self.non_compliant
+
+    def state(self):
+        """Return running counters, non compliant statuses are persisted separately."""
+        with self.lock:
+            return {
+                "verified_imei": self.verified_imei,
+                "pending_registration": self.pending_registration,
+                "pending_stolen_verification": self.pending_stolen_verification,
+                "no_condition": self.no_condition,
+                "blocking_count": dict(self.blocking_count),
+                "info_count": dict(self.info_count)
+            }
+
+    def restore(self, state, non_compliant):
+        """Restore running counters and non compliant statuses of a partially processed request."""
+        with self.lock:
+            self.verified_imei = state["verified_imei"]
+            self.pending_registration = state["pending_registration"]
+            self.pending_stolen_verification = state["pending_stolen_verification"]
+            self.no_condition = state["no_condition"]
+            self.blocking_count = dict(state["blocking_count"])
+            self.info_count = dict(state["info_count"])
+            self.non_compliant = list(non_compliant)
+
+    def partial(self):
+        """Return running counters along with non compliant statuses, mergeable by merge_partial."""
+        return dict(self.state(), non_compliant=[row for chunk in self.rows() for row in chunk])
+
+    def merge_partial(self, partial):
+        """Merge a partial summary produced by another worker."""
+        other = SummaryAggregator()
+        other.restore(partial, partial['non_compliant'])
+        self.merge(other)
+
+    def finalize(self, invalid_imeis, unprocessed_imeis, report=None):
+        """Write non compliant report and return summary in the same format as build_summary.
+
+        report is the name and row count of a report already written while aggregating.
+        """
+        response = {}
+        if self.verified_imei:
+            if report is None and self.spill is not None:
+                spilled_report = CompliantReport()
+                for chunk in self.rows():
+                    spilled_report.append(chunk)
+                self.spill.close()
+                self.spill = None
+                report = (spilled_report.name, spilled_report.rows)
+            if report is None:
+                report_name, _ = BulkCommonResources.write_compliant_report(self.non_compliant)
+                report = (report_name, len(self.non_compliant))
+            report_name, non_compliant = report
+            response["unprocessed_imeis"] = sum(len(imei) for imei in unprocessed_imeis)
+            response["invalid_imei"] = invalid_imeis
+            response["pending_registration"] = self.pending_registration
+            response["pending_stolen_verification"] = self.pending_stolen_verification
+            response["verified_imei"] = self.verified_imei
+            response["count_per_condition"] = dict(self.blocking_count, **self.info_count)
+            response["no_condition"] = self.no_condition
+            response["non_complaint"] = non_compliant
+            response["compliant_report_name"] = report_name
+        return response
+
+    def amend(self, summary, unprocessed_imeis, report):
+        """Return summary of a request amended with counts of its re-processed IMEIs.
+
+        report is the name and row count of the request's report with statuses of this aggregator appended.
+        """
+        amended = dict(summary)
+        amended["unprocessed_imeis"] = sum(len(imei) for imei in unprocessed_imeis)
+        for key in ("verified_imei", "pending_registration", "pending_stolen_verification", "no_condition"):
+            amended[key] = summary.get(key, 0) + getattr(self, key)
+        count_per_condition = dict(summary.get("count_per_condition", {}))
+        for name, count in list(self.blocking_count.items()) + list(self.info_count.items()):
+            count_per_condition[name] = count_per_condition.get(name, 0) + count
+        amended["count_per_condition"] = count_per_condition
+        amended["compliant_report_name"], amended["non_complaint"] = report
+        return amended
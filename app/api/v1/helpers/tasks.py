@@ -46,33 +46,270 @@
 
 import os
 from time import sleep, time
-from celery.signals import task_postrun
+from celery.signals import task_postrun, worker_process_init, worker_process_shutdown
 
 from app import celery, app, db
 from .bulk_common import BulkCommonResources
+from .async_bulk import AsyncBulkResources
+from .summary_aggregator import SummaryAggregator
+from .bulk_pipeline import BulkPipeline
+from .checkpoint import BulkCheckpoint
+from .imei_range import ImeiRange
+from .job_input import JobInputStore
+from .unprocessed import UnprocessedImeis
+from .compliant_report import CompliantReport
+from .scheduler import BulkScheduler
+from .progress import ProgressTracker
+from .result_cache import ResultCache
+from ..models.job_progress import JobProgress
 from ..models.summary import Summary
+from celery import chord
 from celery.result import AsyncResult
+from celery.utils import uuid
 
 
 class CeleryTasks:
 
+    # fetch stats holding counters, summed when partial summaries are merged
+    SUMMED_STATS = ('core_retries', 'hedged_requests', 'batch_bisection')
+
     @staticmethod
-    @celery.task
-    def get_summary(imeis_list, invalid_imeis):
+    def submit(imeis_list, invalid_imeis, input, task_id=None, user_id=None):
+        """Submit bulk request for processing, returns tracking id and state of the request."""
+        config = app.config['system_config']['global']
+        priority = BulkScheduler.priority(len(imeis_list), user_id)
+        options = {} if priority is None else {'priority': priority}
+        subtask_size = int(config.get('SubtaskBatches', 50)) * int(config['ImeiBatchSize'])
+        tracking_id = task_id or uuid()
+        CeleryTasks.start_progress(tracking_id, len(imeis_list))
+        stored = None
+        if JobInputStore.backend() and not isinstance(imeis_list, ImeiRange):
+            stored = JobInputStore.put(tracking_id, imeis_list)  # tasks carry a reference instead of the IMEIs
+        if config.get('BulkExecution', 'single') == 'distributed' and len(imeis_list) > subtask_size:
+            # fan out batch ranges to all workers, merge step keeps the tracking id so status lookups are unchanged
+            ranges = [JobInputStore.part(stored, start, subtask_size) if stored else
+                      ImeiRange.dump(imeis_list[start:start + subtask_size])
+                      for start in range(0, len(imeis_list), subtask_size)]
+            header = [CeleryTasks.process_batches.subtask(args=(imeis,), kwargs={'tracking_id': tracking_id}, **options)
+                      for imeis in ranges]
+            body = (CeleryTasks.merge_summary.subtask(args=(invalid_imeis,), task_id=tracking_id, **options) |
+                    CeleryTasks.log_results.s(input=input))
+            chord(header)(body)
+            return tracking_id, AsyncResult(tracking_id).state
+        response = (CeleryTasks.get_summary.subtask(args=(stored or ImeiRange.dump(imeis_list), invalid_imeis),
+                                                    task_id=tracking_id) |
+                    CeleryTasks.log_results.s(input=input)).apply_async(**options)
+        return tracking_id, response.state
+
+    @staticmethod
+    def rerun(tracking_id, input, imei_count):
+        """Submit stored unprocessed IMEIs of a finished request for re-processing under its tracking id."""
+        priority = BulkScheduler.priority(imei_count, None)
+        options = {} if priority is None else {'priority': priority}
+        CeleryTasks.start_progress(tracking_id, imei_count)
+        response = (CeleryTasks.rerun_summary.subtask(args=(tracking_id,), task_id=tracking_id) |
+                    CeleryTasks.log_results.s(input=input)).apply_async(**options)
+        return response.state
+
+    @staticmethod
+    @celery.task(acks_late=True, reject_on_worker_lost=True)
+    def rerun_summary(tracking_id, engine=None):
+        """Celery task re-processing unprocessed IMEIs of a request, merged into its summary and report."""
+        summary = {}
+        try:
+            result = Summary.find_by_trackingid(tracking_id)
+            summary = ((result or {}).get('response') or {}).get('response') or {}
+            fetch_stats = {}
+            progress = ProgressTracker(tracking_id)
+            records, _, unprocessed_imeis = CeleryTasks.fetch_records(UnprocessedImeis.load(tracking_id) or [], 0,
+                                                                      engine, fetch_stats, SummaryAggregator(),
+                                                                      progress)
+            progress.publish()
+            if not records.verified_imei:
+                return {"response": summary, "task_id": tracking_id}  # nothing verified, request is left as it was
+            with BulkCommonResources.summary_context():
+                # statuses of re-processed IMEIs are appended to the report of the request
+                report = CompliantReport.resume(summary.get('compliant_report_name'), summary.get('non_complaint', 0))
+                report.append(records.non_compliant)
+                response = records.amend(summary, unprocessed_imeis, (report.name, report.rows))
+                response.update(fetch_stats)
+                response['rejected_imeis'] = summary.get('rejected_imeis', []) + fetch_stats.get('rejected_imeis', [])
+            UnprocessedImeis.save(tracking_id, unprocessed_imeis)
+            return {"response": response, "task_id": tracking_id}
+        except Exception as e:
+            # stored IMEIs and summary of the request are left as they were
+            app.logger.exception(e)
+            return {"response": summary, "task_id": tracking_id}
+
+    @staticmethod
+    def start_progress(tracking_id, total_imeis):
+        """Reset live progress of a submitted request, progress is best effort and never fails submission."""
+        try:
+            JobProgress.create(tracking_id, total_imeis)
+        except Exception as e:
+            app.logger.info("Error occurred while creating bulk request progress.")
+            app.logger.exception(e)
+
+    @staticmethod
+    @celery.task(acks_late=True, reject_on_worker_lost=True)
+    def get_summary(imeis_list, invalid_imeis, engine=None):
         """Celery task for bulk request processing."""
+        records = None
         try:
-            imeis_chunks = BulkCommonResources.chunked_data(imeis_list)
-            records, invalid_imeis, unprocessed_imeis = BulkCommonResources.start_threads(imeis_list=imeis_chunks,
-                                                                                          invalid_imeis=invalid_imeis)
+            imeis_list = ImeiRange.load(imeis_list)  # TAC requests arrive as a range descriptor
+            tracking_id = celery.current_task.request.id
+            fetch_stats = {}
+            # progress is checkpointed under the tracking id, direct calls without one are not resumable
+            checkpointing = tracking_id is not None and app.config['system_config']['global'].get('Checkpointing')
+            # pipelined summary decodes, classifies and reports batches concurrently with fetching
+            pipelined = not checkpointing and app.config['system_config']['global'].get('PipelinedSummary')
+            # jobs with a memory budget never keep all records, non compliant statuses spill over the budget, to the
+            # checkpoint rows file of checkpointed jobs
+            budget = SummaryAggregator.job_budget()
+            # streaming summary folds every batch into running counters instead of keeping all records
+            streaming = checkpointing or budget or app.config['system_config']['global'].get('StreamingSummary')
+            if pipelined:
+                records = BulkPipeline()
+            else:
+                records = SummaryAggregator(budget) if streaming else []
+            progress = ProgressTracker(tracking_id)
+            if checkpointing:
+                records, invalid_imeis, unprocessed_imeis = CeleryTasks.fetch_checkpointed(tracking_id, imeis_list,
+                                                                                           invalid_imeis, engine,
+                                                                                           fetch_stats, records,
+                                                                                           progress)
+            else:
+                records, invalid_imeis, unprocessed_imeis = CeleryTasks.fetch_records(imeis_list, invalid_imeis,
+                                                                                      engine, fetch_stats, records,
+                                                                                      progress)
+            progress.publish()
             # send records for summary generation
-            with app.request_context({'wsgi.url_scheme': "", 'SERVER_PORT': "", 'SERVER_NAME': "", 'REQUEST_METHOD': ""}):
-                response = BulkCommonResources.build_summary(records, invalid_imeis, unprocessed_imeis)
+            with BulkCommonResources.summary_context():
+                if streaming or pipelined:
+                    response = records.finalize(invalid_imeis, unprocessed_imeis)
+                else:
+                    response = BulkCommonResources.build_summary(records, invalid_imeis, unprocessed_imeis)
+                if response:
+                    response.update(fetch_stats)  # fetch engine figures e.g. adaptive batch size and concurrency
+                    if progress.is_cancelled:
+                        response['cancelled'] = True  # summary of batches fetched before cancellation
+            if tracking_id is not None and response:
+                UnprocessedImeis.save(tracking_id, unprocessed_imeis)  # kept for re-processing of the failed part
+            if checkpointing:
+                BulkCheckpoint.clear(tracking_id)
 
+            return {"response": response, "task_id": tracking_id}
+        except Exception as e:
+            app.logger.exception(e)
+            if isinstance(records, BulkPipeline):
+                records.close()  # stop pipeline stages of a failed request
+            return {"response": {}, "task_id": celery.current_task.request.id}
+
+    @staticmethod
+    @celery.task(acks_late=True, reject_on_worker_lost=True)
+    def process_batches(imeis_list, engine=None, tracking_id=None):
+        """Celery subtask for a range of batches of a distributed bulk request, returns partial summary."""
+        fetch_stats = {}
+        payload, imeis_list = imeis_list, None
+        progress = ProgressTracker(tracking_id)  # subtasks publish progress of the request they belong to
+        try:
+            imeis_list = ImeiRange.load(payload)  # stored input may be missing on a host not sharing JobInputDir
+            records, _, unprocessed_imeis = CeleryTasks.fetch_records(imeis_list, 0, engine, fetch_stats,
+                                                                      SummaryAggregator(), progress)
+            progress.publish()
+            return dict(records.partial(), unprocessed_imeis=unprocessed_imeis, fetch_stats=fetch_stats,
+                        cancelled=progress.is_cancelled)
+        except Exception as e:
+            # a failed subtask must not fail the chord, its IMEIs are reported as unprocessed instead
+            app.logger.info("Error occurred while processing bulk subtask.")
+            app.logger.exception(e)
+            if imeis_list is None:
+                # IMEIs of a range that could not be loaded are counted as unprocessed, they can not be listed
+                count = payload.get('count', 0) if isinstance(payload, dict) else len(payload)
+                progress.record(count, processed=False)
+                progress.publish()
+                return dict(SummaryAggregator().partial(), unprocessed_imeis=[], unloaded_imeis=count,
+                            fetch_stats=fetch_stats)
+            return dict(SummaryAggregator().partial(), unprocessed_imeis=[list(imeis_list)],
+                        fetch_stats=fetch_stats)
+
+    @staticmethod
+    @celery.task()
+    def merge_summary(partials, invalid_imeis):
+        """Celery chord callback merging partial summaries of a distributed bulk request."""
+        try:
+            records = SummaryAggregator(SummaryAggregator.job_budget())
+            unprocessed_imeis = []
+            fetch_stats = {}
+            for partial in partials:
+                records.merge_partial(partial)
+                unprocessed_imeis.extend(partial['unprocessed_imeis'])
+                CeleryTasks.merge_stats(fetch_stats, partial['fetch_stats'])
+            with BulkCommonResources.summary_context():
+                response = records.finalize(invalid_imeis, unprocessed_imeis)
+                if response:
+                    response['unprocessed_imeis'] += sum(partial.get('unloaded_imeis', 0) for partial in partials)
+                    response.update(fetch_stats)
+                    if any(partial.get('cancelled') for partial in partials):
+                        response['cancelled'] = True
+            if response:
+                UnprocessedImeis.save(celery.current_task.request.id, unprocessed_imeis)
             return {"response": response, "task_id": celery.current_task.request.id}
         except Exception as e:
             app.logger.exception(e)
             return {"response": {}, "task_id": celery.current_task.request.id}
 
+    @staticmethod
+    def merge_stats(fetch_stats, partial_stats):
+        """Merge fetch stats of a subtask, counters are summed and engine figures keep the latest value."""
+        for name, stats in partial_stats.items():
+            if name == 'result_cache':
+                ResultCache.merge_report(fetch_stats, stats)
+            elif name == 'rejected_imeis':
+                fetch_stats.setdefault(name, []).extend(stats)
+            elif name in CeleryTasks.SUMMED_STATS and name in fetch_stats:
+                for key, value in stats.items():
+                    fetch_stats[name][key] = fetch_stats[name].get(key, 0) + value
+            else:
+                fetch_stats[name] = dict(stats)
+
+    @staticmethod
+    def fetch_records(imeis_list, invalid_imeis, engine, fetch_stats, records, progress=None):
+        """Fetch IMEI records from core using selected engine."""
+        engine = engine or app.config['system_config']['global'].get('BulkFetchEngine', 'threads')
+        if engine == 'async':
+            return AsyncBulkResources.start_fetch(imeis_list=imeis_list, invalid_imeis=invalid_imeis,
+                                                  fetch_stats=fetch_stats, records=records, progress=progress)
+        imeis_chunks = BulkCommonResources.chunked_data(imeis_list)
+        return BulkCommonResources.start_threads(imeis_list=imeis_chunks, invalid_imeis=invalid_imeis, records=records,
+                                                 fetch_stats=fetch_stats, progress=progress)
+
+    @staticmethod
+    def fetch_checkpointed(tracking_id, imeis_list, invalid_imeis, engine, fetch_stats, records, tracker=None):
+        """Fetch IMEI records segment by segment, checkpointing progress after every segment."""
+        segment = int(app.config['system_config']['global'].get('CheckpointInterval', 100)) * \
+            int(app.config['system_config']['global']['ImeiBatchSize'])
+        progress = BulkCheckpoint.load(tracking_id, len(imeis_list), records)
+        for start in range(progress['completed_imeis'], len(imeis_list), segment):
+            if tracker is not None and tracker.cancelled():
+                break
+            records, invalid_imeis, unprocessed_imeis = CeleryTasks.fetch_records(imeis_list[start:start + segment],
+                                                                                  invalid_imeis, engine, fetch_stats,
+                                                                                  records, tracker)
+            progress['unprocessed_imeis'].extend(unprocessed_imeis)
+            progress['completed_imeis'] = min(start + segment, len(imeis_list))
+            progress = BulkCheckpoint.save(tracking_id, len(imeis_list), records, progress)
+        return records, invalid_imeis, progress['unprocessed_imeis']
+
+    @staticmethod
+    def clear_progress(tracking_id):
+        """Delete live progress of a completed request."""
+        try:
+            JobProgress.delete(tracking_id)
+        except Exception as e:
+            app.logger.info("Error occurred while deleting bulk request progress.")
+            app.logger.exception(e)
+
     @staticmethod
     @celery.task()
     def log_results(response, input):
@@ -80,10 +317,14 @@ class CeleryTasks:
             status = AsyncResult(response['task_id'])
             while not status.ready():
                 sleep(0.5)
-            if response['response']:
+            if response['response'].get('cancelled'):
+                Summary.update(input=input, status='CANCELLED', response=response)
+            elif response['response']:
                 Summary.update(input=input, status=status.state, response=response)
-            else:
+            elif not Summary.is_cancelled(response['task_id']):  # cancelled before any batch, nothing to keep
                 Summary.update(input=input, status='FAILURE', response=response)
+            CeleryTasks.clear_progress(response['task_id'])
+            JobInputStore.delete(response['task_id'])
             return True
         except Exception:
             Summary.update(input=input, status='FAILURE', response=response)
@@ -102,6 +343,7 @@ class CeleryTasks:
                 if current_time - creation_time >= app.config['system_config']['global']['CompliantReportDeletionTime']*3600:  # compare creation time is greater than 24 hrs
                     os.remove(os.path.join(app.config['dev_config']['UPLOADS']['report_dir'],
                                            f))  # if yes, delete file from directory
+            ResultCache.purge()  # expired core results are removed along with old reports
         except Exception as e:
             app.logger.exception(e)
             raise e
@@ -114,3 +356,14 @@ class CeleryTasks:
         # won't propagate across tasks)
         db.session.remove()
 
+    @worker_process_init.connect
+    def start_pipeline_pool(*args, **kwargs):
+        # pipeline process pool is forked once per prefork child before it runs any task, so no fetch thread
+        # is running while pool processes are forked, only workers running pipelined summaries need it
+        if app.config['system_config']['global'].get('PipelinedSummary'):
+            BulkPipeline.start_pool()
+
+    @worker_process_shutdown.connect
+    def stop_pipeline_pool(*args, **kwargs):
+        BulkPipeline.stop_pool()
+
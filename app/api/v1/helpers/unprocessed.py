@@ -0,0 +1,98 @@
+"""
+ SPDX-License-Identifier: BSD-4-Clause-Clear
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ All rights reserved.
+
+ Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+ limitations in the disclaimer below) provided that the following conditions are met:
+
+ * Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+ * Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+ * All advertising materials mentioning features or use of this software, or any deployment of this software, or
+   documentation accompanying any distribution of this software, must display the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+   products derived from this software without specific prior written permission.
+
+ SPDX-License-Identifier: ZLIB-ACKNOWLEDGEMENT
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ This software is provided 'as-is', without any express or implied warranty. In no event will the authors be held liable
+ for any damages arising from the use of this software.
+
+ Permission is granted to anyone to use this software for any purpose, including commercial applications, and to alter
+ it and redistribute it freely, subject to the following restrictions:
+
+ * The origin of this software must not be misrepresented; you must not claim that you wrote the original software. If
+   you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Altered source versions must be plainly marked as such, and must not be misrepresented as being the original software.
+ * This notice may not be removed or altered from any source distribution.
+
+ NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+ THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+ THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+ DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+ BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.                                                               #
+"""
+
+import os
+
+import numpy as np
+
+from app import app
+from ..helpers.imei_array import ImeiArray
+
+
+class UnprocessedImeis:
+    """IMEIs of a bulk request left unprocessed, kept packed next to its report so they can be re-processed."""
+
+    @staticmethod
+    def path(tracking_id):
+        """Return path of stored unprocessed IMEIs of a request."""
+        return os.path.join(app.config['dev_config']['UPLOADS']['report_dir'], 'unprocessed_' + tracking_id + '.npy')
+
+    @staticmethod
+    def save(tracking_id, unprocessed_imeis):
+        """Store unprocessed IMEI batches of a request replacing earlier ones, failures are logged only."""
+        try:
+            imeis = [imei for batch in unprocessed_imeis for imei in batch]
+            UnprocessedImeis.delete(tracking_id)
+            if imeis:
+                with open(UnprocessedImeis.path(tracking_id), 'wb') as stored:
+                    packed = ImeiArray.pack(imeis)
+                    np.save(stored, packed.values)
+                    np.save(stored, np.array([packed.width or 0]))
+        except Exception as e:
+            app.logger.info("Error occurred while storing unprocessed IMEIs.")
+            app.logger.exception(e)
+
+    @staticmethod
+    def load(tracking_id):
+        """Return stored unprocessed IMEIs of a request, None when there are none."""
+        if not os.path.exists(UnprocessedImeis.path(tracking_id)):
+            return None
+        with open(UnprocessedImeis.path(tracking_id), 'rb') as stored:
+            values = np.load(stored)
+            width = int(np.load(stored)[0])
+        return ImeiArray(values, width or None)
+
+    @staticmethod
+    def count(tracking_id):
+        """Return count of stored unprocessed IMEIs of a request."""
+        imeis = UnprocessedImeis.load(tracking_id)
+        return 0 if imeis is None else len(imeis)
+
+    @staticmethod
+    def delete(tracking_id):
+        """Remove stored unprocessed IMEIs of a request."""
+        if os.path.exists(UnprocessedImeis.path(tracking_id)):
+            os.remove(UnprocessedImeis.path(tracking_id))
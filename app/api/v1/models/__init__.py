@@ -44,7 +44,7 @@
  POSSIBILITY OF SUCH DAMAGE.                                                               #
 """
 
-__all__ = ["request", "summary"]
+__all__ = ["request", "summary", "checkpoint", "rate_limit", "job_progress", "imei_cache"]
 
 from ..models import *
 from flask_sqlalchemy import declarative_base
@@ -0,0 +1,119 @@
+"""
+ SPDX-License-Identifier: BSD-4-Clause-Clear
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ All rights reserved.
+
+ Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+ limitations in the disclaimer below) provided that the following conditions are met:
+
+ * Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+ * Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+ * All advertising materials mentioning features or use of this software, or any deployment of this software, or
+   documentation accompanying any distribution of this software, must display the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+   products derived from this software without specific prior written permission.
+
+ SPDX-License-Identifier: ZLIB-ACKNOWLEDGEMENT
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ This software is provided 'as-is', without any express or implied warranty. In no event will the authors be held liable
+ for any damages arising from the use of this software.
+
+ Permission is granted to anyone to use this software for any purpose, including commercial applications, and to alter
+ it and redistribute it freely, subject to the following restrictions:
+
+ * The origin of this software must not be misrepresented; you must not claim that you wrote the original software. If
+   you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Altered source versions must be plainly marked as such, and must not be misrepresented as being the original software.
+ * This notice may not be removed or altered from any source distribution.
+
+ NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+ THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+ THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+ DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+ BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.                                                               #
+"""
+
+import json
+from app import db
+
+
+class Checkpoint(db.Model):
+    """Database model for bulk request progress checkpoints."""
+    id = db.Column(db.Integer, primary_key=True)
+    tracking_id = db.Column(db.String(100), unique=True, index=True)
+    total_imeis = db.Column(db.Integer)
+    completed_imeis = db.Column(db.Integer)
+    state = db.Column(db.Text)
+    updated_time = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
+
+    def __init__(self, args):
+        """Constructor."""
+        self.tracking_id = args.get("tracking_id")
+        self.total_imeis = args.get("total_imeis")
+        self.completed_imeis = args.get("completed_imeis")
+        self.state = json.dumps(args.get("state"))
+
+    @property
+    def serialize(self):
+        """Serialize."""
+        return {"tracking_id": self.tracking_id, "total_imeis": self.total_imeis,
+                "completed_imeis": self.completed_imeis, "state": json.loads(self.state)}
+
+    @classmethod
+    def save(cls, args):
+        """Insert or update checkpoint of a bulk request."""
+        try:
+            checkpoint = cls.query.filter_by(tracking_id=args.get("tracking_id")).first()
+            if checkpoint is None:
+                db.session.add(cls(args))
+            else:
+                checkpoint.total_imeis = args.get("total_imeis")
+                checkpoint.completed_imeis = args.get("completed_imeis")
+                checkpoint.state = json.dumps(args.get("state"))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise Exception
+
+    @classmethod
+    def find_by_trackingid(cls, tracking_id):
+        try:
+            data = cls.query.filter_by(tracking_id=tracking_id).first()
+            if data:
+                return data.serialize
+            else:
+                return None
+        except Exception:
+            raise Exception
+
+    @classmethod
+    def move(cls, tracking_id, new_tracking_id):
+        """Move checkpoint of a bulk request resubmitted under a new tracking id."""
+        try:
+            for checkpoint in cls.query.filter_by(tracking_id=tracking_id).all():
+                checkpoint.tracking_id = new_tracking_id
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise Exception
+
+    @classmethod
+    def delete(cls, tracking_id):
+        """Delete checkpoint of a completed bulk request."""
+        try:
+            cls.query.filter_by(tracking_id=tracking_id).delete()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise Exception
@@ -0,0 +1,129 @@
+"""
+ SPDX-License-Identifier: BSD-4-Clause-Clear
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ All rights reserved.
+
+ Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+ limitations in the disclaimer below) provided that the following conditions are met:
+
+ * Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+ * Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+ * All advertising materials mentioning features or use of this software, or any deployment of this software, or
+   documentation accompanying any distribution of this software, must display the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+   products derived from this software without specific prior written permission.
+
+ SPDX-License-Identifier: ZLIB-ACKNOWLEDGEMENT
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ This software is provided 'as-is', without any express or implied warranty. In no event will the authors be held liable
+ for any damages arising from the use of this software.
+
+ Permission is granted to anyone to use this software for any purpose, including commercial applications, and to alter
+ it and redistribute it freely, subject to the following restrictions:
+
+ * The origin of this software must not be misrepresented; you must not claim that you wrote the original software. If
+   you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Altered source versions must be plainly marked as such, and must not be misrepresented as being the original software.
+ * This notice may not be removed or altered from any source distribution.
+
+ NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+ THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+ THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+ DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+ BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.                                                               #
+"""
+from sqlalchemy.exc import IntegrityError
+
+from app import app, db
+
+
+class ImeiCache(db.Model):
+    """Database model for DIRBS core results cached across bulk requests, empty record marks a lookup in flight."""
+    imei = db.Column(db.String(20), primary_key=True)
+    record = db.Column(db.Text)
+    cached_time = db.Column(db.DateTime, index=True)
+
+    def __init__(self, imei, record, cached_time):
+        """Constructor."""
+        self.imei = imei
+        self.record = record
+        self.cached_time = cached_time
+
+    # fetch threads run outside of application context, all queries use their own engine transaction
+
+    @classmethod
+    def find(cls, imeis):
+        """Return {imei: (record, cached time)} of cached and in flight IMEIs."""
+        try:
+            table = cls.__table__
+            with db.get_engine(app).connect() as connection:
+                rows = connection.execute(table.select().where(table.c.imei.in_(imeis)))
+                return {row.imei: (row.record, row.cached_time) for row in rows}
+        except Exception:
+            raise Exception
+
+    @classmethod
+    def claim(cls, imeis, now, expired=()):
+        """Mark IMEIs in flight replacing expired entries, returns False if another request claimed any first."""
+        if not imeis:
+            return True
+        try:
+            table = cls.__table__
+            with db.get_engine(app).begin() as connection:
+                if expired:
+                    connection.execute(table.delete().where(table.c.imei.in_(expired)))
+                connection.execute(table.insert(), [{"imei": imei, "record": None, "cached_time": now}
+                                                    for imei in imeis])
+            return True
+        except IntegrityError:
+            return False
+        except Exception:
+            raise Exception
+
+    @classmethod
+    def store(cls, records, now):
+        """Insert or replace {imei: record} entries, returns False if a concurrent request stored them first."""
+        if not records:
+            return True
+        try:
+            table = cls.__table__
+            with db.get_engine(app).begin() as connection:
+                connection.execute(table.delete().where(table.c.imei.in_(list(records))))
+                connection.execute(table.insert(), [{"imei": imei, "record": record, "cached_time": now}
+                                                    for imei, record in records.items()])
+            return True
+        except IntegrityError:
+            return False
+        except Exception:
+            raise Exception
+
+    @classmethod
+    def release(cls, imeis):
+        """Remove in flight marks of IMEIs whose lookup failed."""
+        try:
+            table = cls.__table__
+            with db.get_engine(app).begin() as connection:
+                connection.execute(table.delete().where(db.and_(table.c.imei.in_(imeis), table.c.record.is_(None))))
+        except Exception:
+            raise Exception
+
+    @classmethod
+    def purge(cls, before):
+        """Delete entries cached before given time."""
+        try:
+            table = cls.__table__
+            with db.get_engine(app).begin() as connection:
+                connection.execute(table.delete().where(table.c.cached_time < before))
+        except Exception:
+            raise Exception
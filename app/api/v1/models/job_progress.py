@@ -0,0 +1,130 @@
+"""
+ SPDX-License-Identifier: BSD-4-Clause-Clear
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ All rights reserved.
+
+ Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+ limitations in the disclaimer below) provided that the following conditions are met:
+
+ * Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+ * Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+ * All advertising materials mentioning features or use of this software, or any deployment of this software, or
+   documentation accompanying any distribution of this software, must display the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+   products derived from this software without specific prior written permission.
+
+ SPDX-License-Identifier: ZLIB-ACKNOWLEDGEMENT
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ This software is provided 'as-is', without any express or implied warranty. In no event will the authors be held liable
+ for any damages arising from the use of this software.
+
+ Permission is granted to anyone to use this software for any purpose, including commercial applications, and to alter
+ it and redistribute it freely, subject to the following restrictions:
+
+ * The origin of this software must not be misrepresented; you must not claim that you wrote the original software. If
+   you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Altered source versions must be plainly marked as such, and must not be misrepresented as being the original software.
+ * This notice may not be removed or altered from any source distribution.
+
+ NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+ THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+ THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+ DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+ BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.                                                               #
+"""
+from app import app, db
+
+
+class JobProgress(db.Model):
+    """Database model for live progress of bulk requests in process."""
+    tracking_id = db.Column(db.String(100), primary_key=True)
+    total_imeis = db.Column(db.Integer)
+    imeis_done = db.Column(db.Integer)
+    batches_done = db.Column(db.Integer)
+    batches_failed = db.Column(db.Integer)
+    started_time = db.Column(db.DateTime)
+    updated_time = db.Column(db.DateTime)
+
+    def __init__(self, tracking_id, total_imeis):
+        """Constructor."""
+        self.tracking_id = tracking_id
+        self.total_imeis = total_imeis
+        self.imeis_done = 0
+        self.batches_done = 0
+        self.batches_failed = 0
+
+    @property
+    def serialize(self):
+        """Serialize with throughput and estimated time to completion as of last update."""
+        elapsed = 0
+        if self.started_time is not None and self.updated_time is not None:
+            elapsed = (self.updated_time - self.started_time).total_seconds()
+        rate = self.imeis_done / elapsed if elapsed > 0 else None
+        return {
+            "total_imeis": self.total_imeis,
+            "imeis_done": self.imeis_done,
+            "batches_done": self.batches_done,
+            "batches_failed": self.batches_failed,
+            "imeis_per_second": round(rate, 1) if rate else None,
+            "eta_seconds": int((self.total_imeis - self.imeis_done) / rate) if rate else None,
+            "updated_time": self.updated_time.isoformat() if self.updated_time else None
+        }
+
+    @classmethod
+    def create(cls, tracking_id, total_imeis):
+        """Insert progress of a submitted request, replacing progress of a previous attempt."""
+        try:
+            cls.query.filter_by(tracking_id=tracking_id).delete()
+            db.session.add(cls(tracking_id, total_imeis))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise Exception
+
+    @classmethod
+    def add(cls, tracking_id, batches_done, batches_failed, imeis_done):
+        """Atomically add counts of fetched batches, several workers may process one request."""
+        try:
+            table = cls.__table__
+            # own transaction since fetch threads run outside of application context
+            with db.get_engine(app).begin() as connection:
+                connection.execute(table.update().where(table.c.tracking_id == tracking_id).values(
+                    batches_done=table.c.batches_done + batches_done,
+                    batches_failed=table.c.batches_failed + batches_failed,
+                    imeis_done=table.c.imeis_done + imeis_done,
+                    started_time=db.func.coalesce(table.c.started_time, db.func.now()),
+                    updated_time=db.func.now()))
+        except Exception:
+            raise Exception
+
+    @classmethod
+    def find_by_trackingid(cls, tracking_id):
+        try:
+            data = cls.query.filter_by(tracking_id=tracking_id).first()
+            if data:
+                return data.serialize
+            else:
+                return None
+        except Exception:
+            raise Exception
+
+    @classmethod
+    def delete(cls, tracking_id):
+        """Delete progress of a completed request."""
+        try:
+            cls.query.filter_by(tracking_id=tracking_id).delete()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise Exception
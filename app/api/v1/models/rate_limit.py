@@ -0,0 +1,84 @@
+"""
+ SPDX-License-Identifier: BSD-4-Clause-Clear
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ All rights reserved.
+
+ Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+ limitations in the disclaimer below) provided that the following conditions are met:
+
+ * Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+ * Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+ * All advertising materials mentioning features or use of this software, or any deployment of this software, or
+   documentation accompanying any distribution of this software, must display the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+   products derived from this software without specific prior written permission.
+
+ SPDX-License-Identifier: ZLIB-ACKNOWLEDGEMENT
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ This software is provided 'as-is', without any express or implied warranty. In no event will the authors be held liable
+ for any damages arising from the use of this software.
+
+ Permission is granted to anyone to use this software for any purpose, including commercial applications, and to alter
+ it and redistribute it freely, subject to the following restrictions:
+
+ * The origin of this software must not be misrepresented; you must not claim that you wrote the original software. If
+   you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Altered source versions must be plainly marked as such, and must not be misrepresented as being the original software.
+ * This notice may not be removed or altered from any source distribution.
+
+ NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+ THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+ THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+ DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+ BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.                                                               #
+"""
+from datetime import datetime
+
+from app import app, db
+
+
+class RateLimit(db.Model):
+    """Database model for token buckets of DIRBS core calls shared by all processes."""
+    traffic = db.Column(db.String(20), primary_key=True)
+    tokens = db.Column(db.Float)
+    updated_time = db.Column(db.DateTime)
+
+    def __init__(self, traffic, tokens, updated_time):
+        """Constructor."""
+        self.traffic = traffic
+        self.tokens = tokens
+        self.updated_time = updated_time
+
+    @classmethod
+    def take(cls, traffic, rate, burst, floor=0):
+        """Take a token from traffic bucket keeping at least floor tokens, returns seconds to wait if none."""
+        try:
+            table = cls.__table__
+            # own transaction so sessions of callers are neither committed nor removed
+            with db.get_engine(app).begin() as connection:
+                now = datetime.utcnow()
+                bucket = connection.execute(table.select().where(table.c.traffic == traffic).with_for_update()).first()
+                tokens = burst
+                if bucket is not None:
+                    elapsed = max((now - bucket.updated_time).total_seconds(), 0)  # clocks of hosts may drift apart
+                    tokens = min(burst, bucket.tokens + elapsed * rate)
+                wait = 0 if tokens - 1 >= floor else (floor + 1 - tokens) / rate
+                values = {"tokens": tokens if wait else tokens - 1, "updated_time": now}
+                if bucket is None:
+                    connection.execute(table.insert().values(traffic=traffic, **values))
+                else:
+                    connection.execute(table.update().where(table.c.traffic == traffic).values(**values))
+                return wait
+        except Exception:
+            raise Exception
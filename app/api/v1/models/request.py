@@ -114,3 +114,11 @@ class Request(db.Model):
         except Exception:
             raise Exception
 
+    @classmethod
+    def pending_count(cls, user_id):
+        """Count bulk requests of a user still in process."""
+        try:
+            return cls.query.join(Summary, Summary.id == cls.summary_id).filter(
+                cls.user_id == user_id, Summary.status == 'PENDING').count()
+        except Exception:
+            raise Exception
@@ -45,7 +45,7 @@
 """
 
 import ast
-from app import db
+from app import app, db
 from flask_babel import _
 
 
@@ -55,7 +55,7 @@ class Summary(db.Model):
     input = db.Column(db.String(100))
     tracking_id = db.Column(db.String(100))
     status = db.Column(db.String(20))
-    summary_response = db.Column(db.String(1000), server_default=None)
+    summary_response = db.Column(db.Text, server_default=None)
     input_type = db.Column(db.String(40))
     start_time = db.Column(db.DateTime, server_default=db.func.now())
     end_time = db.Column(db.DateTime, server_default=None)
@@ -115,11 +115,49 @@ class Summary(db.Model):
             db.session.rollback()
             raise Exception
 
+    @classmethod
+    def cancel(cls, tracking_id):
+        """Mark request in process as cancelled."""
+        try:
+            for row in cls.query.filter_by(tracking_id=tracking_id, status='PENDING').all():
+                row.status = 'CANCELLED'
+                row.end_time = db.func.now()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise Exception
+
+    @classmethod
+    def rerun(cls, tracking_id):
+        """Mark finished request pending again while its unprocessed IMEIs are re-processed, summary is kept."""
+        try:
+            for row in cls.query.filter_by(tracking_id=tracking_id).all():
+                row.status = 'PENDING'
+                row.end_time = None
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise Exception
+
+    @classmethod
+    def is_cancelled(cls, tracking_id):
+        """Return True if request is cancelled, usable outside of application context."""
+        try:
+            table = cls.__table__
+            query = db.select([db.func.count()]).select_from(table).where(
+                db.and_(table.c.tracking_id == tracking_id, table.c.status == 'CANCELLED'))
+            with db.get_engine(app).connect() as connection:
+                return connection.execute(query).scalar() > 0
+        except Exception:
+            raise Exception
+
     @classmethod
     def update_failed_task_to_pending(cls, args):
-        """Update request data."""
+        """Update request data, a resubmitted request moves from previous_tracking_id to its new tracking id."""
         try:
-            for row in cls.query.filter_by(input=args.get("input"), tracking_id=args.get("tracking_id")).all():
+            previous_tracking_id = args.get("previous_tracking_id", args.get("tracking_id"))
+            for row in cls.query.filter_by(input=args.get("input"), tracking_id=previous_tracking_id).all():
+                row.tracking_id = args.get("tracking_id")
                 row.status = args.get("status")
                 row.start_time = db.func.now()
                 row.end_time = None
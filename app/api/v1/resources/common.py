@@ -48,6 +48,9 @@ from ..handlers.error_handling import *
 from ..handlers.codes import RESPONSES, MIME_TYPES
 from ..models.summary import Summary
 from ..models.request import Request
+from ..models.job_progress import JobProgress
+from ..helpers.tasks import CeleryTasks
+from ..helpers.unprocessed import UnprocessedImeis
 
 from flask import send_from_directory
 from flask_apispec import MethodResource, doc
@@ -87,11 +90,20 @@ class AdminCheckBulkStatus(MethodResource):
                     response = {
                         'state': _('PENDING')
                     }
+                    progress = JobProgress.find_by_trackingid(task_id)
+                    if progress is not None:
+                        response['progress'] = progress  # batches done, throughput and ETA as of last update
                 elif result['status'] == 'SUCCESS':
                     response = {
                         "state": _(result['status']),
                         "result": result['response']
                     }
+                elif result['status'] == 'CANCELLED':
+                    # summary of batches fetched before cancellation, none when cancelled before the first batch
+                    response = {
+                        "state": _(result['status']),
+                        "result": result['response']
+                    }
                 else:
                     # something went wrong in the background job
                     response = {
@@ -105,6 +117,86 @@ class AdminCheckBulkStatus(MethodResource):
                             mimetype=MIME_TYPES.get('JSON'))
 
 
+class AdminCancelBulk(MethodResource):
+    """Flask resource to cancel bulk request in process."""
+
+    @doc(description="Cancel bulk request", tags=['bulk'])
+    def post(self, task_id):
+        """Cancel bulk request, summary of batches fetched before cancellation is kept."""
+        try:
+            result = Summary.find_by_trackingid(task_id)
+            if result is None:
+                response = {
+                    "state": _("task not found.")
+                }
+            elif result['status'] != 'PENDING':
+                response = {
+                    "state": _(result['status']),
+                    "message": _("Only requests in process can be cancelled.")
+                }
+            elif result['response']:
+                # a re-processing request keeps the summary of its completed run, cancelling it would hide that
+                # summary while the IMEIs it has not fetched yet are not tracked as unprocessed
+                response = {
+                    "state": _(result['status']),
+                    "message": _("Re-processing of unprocessed IMEIs can not be cancelled.")
+                }
+            else:
+                # fetch loop stops before its next batch, a queued request is not revoked but stops before its
+                # first batch so log_results still clears its progress and stored input
+                Summary.cancel(task_id)
+                response = {
+                    "state": _("CANCELLED"),
+                    "message": _("Request is cancelled.")
+                }
+            return Response(json.dumps(response), status=RESPONSES.get('OK'), mimetype=MIME_TYPES.get('JSON'))
+        except Exception as e:
+            app.logger.info("Error occurred while cancelling request.")
+            app.logger.exception(e)
+            return Response(MESSAGES.get('INTERNAL_SERVER_ERROR'), RESPONSES.get('INTERNAL_SERVER_ERROR'),
+                            mimetype=MIME_TYPES.get('JSON'))
+
+
+class AdminRerunBulk(MethodResource):
+    """Flask resource to re-process unprocessed IMEIs of a finished bulk request."""
+
+    @doc(description="Re-process unprocessed IMEIs of bulk request", tags=['bulk'])
+    def post(self, task_id):
+        """Re-process only IMEIs left unprocessed, results are merged into summary and report of the request."""
+        try:
+            result = Summary.find_by_trackingid(task_id)
+            imei_count = UnprocessedImeis.count(task_id)
+            if result is None:
+                response = {
+                    "state": _("task not found.")
+                }
+            elif result['status'] != 'SUCCESS':
+                # failed requests have no summary of their verified IMEIs to merge re-processed IMEIs into
+                response = {
+                    "state": _(result['status']),
+                    "message": _("Only successfully completed requests can be re-processed.")
+                }
+            elif not imei_count:
+                response = {
+                    "state": _(result['status']),
+                    "message": _("No unprocessed IMEIs to re-process.")
+                }
+            else:
+                Summary.rerun(task_id)
+                CeleryTasks.rerun(task_id, result['input'], imei_count)
+                response = {
+                    "state": _("PENDING"),
+                    "message": _("Unprocessed IMEIs are being re-processed."),
+                    "unprocessed_imeis": imei_count
+                }
+            return Response(json.dumps(response), status=RESPONSES.get('OK'), mimetype=MIME_TYPES.get('JSON'))
+        except Exception as e:
+            app.logger.info("Error occurred while re-processing request.")
+            app.logger.exception(e)
+            return Response(MESSAGES.get('INTERNAL_SERVER_ERROR'), RESPONSES.get('INTERNAL_SERVER_ERROR'),
+                            mimetype=MIME_TYPES.get('JSON'))
+
+
 @doc(description="Base Route", tags=['base'])
 @app.route('/', methods=['GET'])
 def index():
@@ -53,10 +53,14 @@ from flask_restful import request
 from flask_apispec import MethodResource, doc, use_kwargs
 from flask_babel import _
 from datetime import datetime
+from celery.utils import uuid
 
 from ..handlers.error_handling import *
 from ..handlers.codes import RESPONSES, MIME_TYPES
 from ..helpers.tasks import CeleryTasks
+from ..helpers.checkpoint import BulkCheckpoint
+from ..helpers.imei_range import ImeiRange
+from ..helpers.imei_array import ImeiArray
 from ..schema.system_schemas import BulkSchema
 from ..models.request import *
 from ..models.summary import *
@@ -65,6 +69,13 @@ from ..models.summary import *
 class AdminBulk(MethodResource):
     """Flask resource for DVS bulk request."""
 
+    @staticmethod
+    def tac_range(tac):
+        """IMEI range of a TAC request, IMEIs are generated by the worker while fetching."""
+        min_range = str(app.config['system_config']['global']['MinImeiRange'])
+        return ImeiRange(tac, int(min_range), int(app.config['system_config']['global']['MaxImeiRange']),
+                         width=len(min_range))
+
     @doc(description="Verify Bulk IMEIs via file/tac request", tags=['bulk'])
     @use_kwargs(BulkSchema().fields_dict, locations=['form'])
     def post(self, **args):
@@ -94,15 +105,16 @@ class AdminBulk(MethodResource):
                                             invalid_imeis += 1
                                         else:
                                             filtered_list.append(imei)
-                                    imeis_list = filtered_list
+                                    imeis_list = ImeiArray.pack(filtered_list)  # compact IMEIs for celery payload
                                     if imeis_list:
-                                        response = (CeleryTasks.get_summary.s(imeis_list, invalid_imeis) |
-                                                    CeleryTasks.log_results.s(input=str(filename))).apply_async()
+                                        tracking_id, state = CeleryTasks.submit(imeis_list, invalid_imeis,
+                                                                                input=str(filename),
+                                                                                user_id=request.form.get('user_id'))
                                         summary_data = {
-                                            "tracking_id": response.parent.id,
+                                            "tracking_id": tracking_id,
                                             "input": filename,
                                             "input_type": "file",
-                                            "status": response.state
+                                            "status": state
                                         }
                                         summary_record = Summary.create(summary_data)
                                         request_data = {
@@ -113,7 +125,7 @@ class AdminBulk(MethodResource):
                                         Request.create(request_data)
                                         data = {
                                             "message": _("You can track your request using this id"),
-                                            "task_id": response.parent.id
+                                            "task_id": tracking_id
                                         }
                                         return Response(json.dumps(data), status=RESPONSES.get('OK'), mimetype=MIME_TYPES.get('JSON'))
                                     else:
@@ -162,17 +174,21 @@ class AdminBulk(MethodResource):
                                     return Response(json.dumps(data), status=RESPONSES.get('OK'),
                                                     mimetype=MIME_TYPES.get('JSON'))
                                 else:
-                                    imei = tac + str(app.config['system_config']['global']['MinImeiRange'])
-                                    imei_list = [str(int(imei) + x) for x in
-                                                 range(int(app.config['system_config']['global']['MaxImeiRange']))]
-                                    response = (CeleryTasks.get_summary.subtask(args=(imei_list, invalid_imeis), task_id=tracking_id) |
-                                                CeleryTasks.log_results.s(input=tac)).apply_async()
+                                    # resubmitted under a new tracking id, a cancelled task of the previous id may
+                                    # still be queued
                                     summary_data = {
-                                        "tracking_id": tracking_id,
+                                        "tracking_id": uuid(),
+                                        "previous_tracking_id": tracking_id,
                                         "input": tac,
-                                        "status": response.state
+                                        "status": 'PENDING'
                                     }
                                     Summary.update_failed_task_to_pending(summary_data)
+                                    # checkpoint of the failed scan follows the request so the new job resumes it
+                                    BulkCheckpoint.move(tracking_id, summary_data['tracking_id'])
+                                    imei_list = self.tac_range(tac)
+                                    tracking_id, state = CeleryTasks.submit(imei_list, invalid_imeis, input=tac,
+                                                                            task_id=summary_data['tracking_id'],
+                                                                            user_id=request.form.get('user_id'))
                                     data = {
                                         "message": _("You can track your request using this id"),
                                         "task_id": tracking_id
@@ -180,15 +196,14 @@ class AdminBulk(MethodResource):
                                     return Response(json.dumps(data), status=RESPONSES.get('OK'),
                                                     mimetype=MIME_TYPES.get('JSON'))
                             else:
-                                imei = tac + str(app.config['system_config']['global']['MinImeiRange'])
-                                imei_list = [str(int(imei) + x) for x in range(int(app.config['system_config']['global']['MaxImeiRange']))]
-                                response = (CeleryTasks.get_summary.s(imei_list, invalid_imeis) |
-                                            CeleryTasks.log_results.s(input=tac)).apply_async()
+                                imei_list = self.tac_range(tac)
+                                tracking_id, state = CeleryTasks.submit(imei_list, invalid_imeis, input=tac,
+                                                                        user_id=request.form.get('user_id'))
                                 summary_data = {
-                                    "tracking_id": response.parent.id,
+                                    "tracking_id": tracking_id,
                                     "input": tac,
                                     "input_type": "tac",
-                                    "status": response.state
+                                    "status": state
                                 }
                                 summary_record = Summary.create(summary_data)
                                 request_data = {
@@ -199,7 +214,7 @@ class AdminBulk(MethodResource):
                                 Request.create(request_data)
                                 data = {
                                     "message": _("You can track your request using this id"),
-                                    "task_id": response.parent.id
+                                    "task_id": tracking_id
                                 }
                                 return Response(json.dumps(data), status=RESPONSES.get('OK'), mimetype=MIME_TYPES.get('JSON'))
                         else:
@@ -51,6 +51,7 @@ from flask_apispec import use_kwargs, MethodResource, doc
 from flask_babel import _
 
 from ..helpers.common import CommonResources
+from ..helpers.core_client import CoreClient
 from ..handlers.error_handling import *
 from ..handlers.codes import RESPONSES, MIME_TYPES
 from ..schema.system_schemas import BasicStatusSchema, SMSSchema
@@ -141,9 +142,7 @@ class BaseRoute(MethodResource):
         """Checks system's connection with DIRBS core."""
 
         try:
-            resp = requests.get('{base}/{version}/version'.format(
-                base=app.config['dev_config']['dirbs_core']['BaseUrl'],
-                version=app.config['dev_config']['dirbs_core']['Version']))  # dirbs core imei api call
+            resp = CoreClient.get('version')  # dirbs core version api call
             if resp.status_code == 200:
                 data = {
                     "message": _("CORE connected successfully.")
@@ -152,7 +151,7 @@ class BaseRoute(MethodResource):
                 data = {
                     "message": _("CORE connection failed.")
                 }
-        except requests.ConnectionError:
+        except (requests.ConnectionError, requests.Timeout):
             data = {
                 "message": _("CORE connection failed.")
             }
@@ -51,7 +51,8 @@ from app.common.apidoc import ApiDocs
 from .resources.public import BasicStatus, PublicSMS, BaseRoute
 from .resources.admin import FullStatus
 from .resources.dvs_bulk import AdminBulk
-from .resources.common import AdminCheckBulkStatus, AdminDownloadFile, index, GetRequests
+from .resources.common import AdminCheckBulkStatus, AdminDownloadFile, index, GetRequests, AdminCancelBulk, \
+    AdminRerunBulk
 
 api = Api(app, prefix='/api/v1')
 apidocs = ApiDocs(app, 'v1')
@@ -63,6 +64,8 @@ api.add_resource(FullStatus, '/fullstatus')
 api.add_resource(AdminBulk, '/bulk')
 api.add_resource(AdminDownloadFile, '/download/<filename>')
 api.add_resource(AdminCheckBulkStatus, '/bulkstatus/<task_id>')
+api.add_resource(AdminCancelBulk, '/cancel/<task_id>')
+api.add_resource(AdminRerunBulk, '/rerun/<task_id>')
 api.add_resource(GetRequests, '/requests/<user_id>')
 
 docs = apidocs.init_doc()
@@ -71,7 +74,7 @@ docs = apidocs.init_doc()
 def register():
     """ Method to register routes. """
     for route in [BaseRoute, BasicStatus, FullStatus, AdminBulk, AdminDownloadFile, AdminCheckBulkStatus,
-                  PublicSMS, index, GetRequests]:
+                  PublicSMS, index, GetRequests, AdminCancelBulk, AdminRerunBulk]:
         docs.register(route)
 
 register()
\ No newline at end of file
@@ -46,16 +46,118 @@
 
 """This modules manages database migration commands."""
 
+import json
+import random
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from time import perf_counter, sleep
+
 from flask_script import Manager
 from flask_migrate import Migrate, MigrateCommand
+from kombu import Connection, Exchange, Queue
+from kombu.compression import compress
+from kombu.serialization import dumps
 
 # noinspection PyUnresolvedReferences
 from app.api.v1.models import *
 from app import app, db
+from app.api.v1.helpers.imei_array import ImeiArray
+from app.api.v1.helpers.bulk_common import BulkCommonResources
 
-migrate = Migrate(app, db)
+migrate = Migrate(app, db, compare_type=True)  # column type changes e.g. summary_response to Text are migrated
 manager = Manager(app)
 manager.add_command('db', MigrateCommand)
 
+
+@manager.option('-n', '--imeis', dest='imeis', type=int, default=1000000, help='IMEIs of benchmarked bulk request')
+@manager.option('-b', '--broker', dest='broker', default=None, help='broker url, configured celery broker by default')
+@manager.option('-r', '--rounds', dest='rounds', type=int, default=3, help='publishes timed per payload and codec')
+def benchmark_task_payloads(imeis, broker, rounds):
+    """Compare message size and enqueue latency of json and compressed msgpack celery payloads."""
+    imeis_list = [str(35000000000000 + imei) for imei in range(imeis)]
+    summary = {"unprocessed_imeis": 0, "invalid_imei": 12, "pending_registration": 5821, "no_condition": 40213,
+               "pending_stolen_verification": 130, "verified_imei": imeis, "non_complaint": 8544,
+               "count_per_condition": {"gsma_not_found": 4100, "local_stolen": 130, "duplicate_compound": 2210,
+                                       "not_on_registration_list": 5821, "malformed_imei": 0},
+               "compliant_report_name": "compliant_report00000000-0000-0000-0000-000000000000.tsv"}
+    payloads = {"get_summary IMEI list": [imeis_list, 12],
+                "get_summary packed IMEIs": [ImeiArray.pack(imeis_list).descriptor(), 12],
+                "log_results summary": [{"response": summary, "task_id": "00000000-0000-0000-0000-000000000000"}]}
+    codecs = {"json": ('json', None), "msgpack": ('msgpack', None), "msgpack+zlib": ('msgpack', 'zlib')}
+    # throwaway queue, enqueue latency covers serialization, compression and the broker publish
+    queue = Queue('dvs-benchmark', Exchange('dvs-benchmark'), routing_key='dvs-benchmark', auto_delete=True)
+    with Connection(broker or app.config['CELERY_BROKER_URL']) as connection:
+        producer = connection.Producer()
+        for payload, payload_args in payloads.items():
+            for codec, (serializer, compression) in codecs.items():
+                body = dumps(payload_args, serializer=serializer)[2]
+                if compression:
+                    body = compress(body, compression)[0]
+                started = perf_counter()
+                for _ in range(rounds):
+                    producer.publish(payload_args, exchange=queue.exchange, routing_key=queue.routing_key,
+                                     declare=[queue], serializer=serializer, compression=compression)
+                print("{0:<26} {1:<13} {2:>12} bytes  enqueue {3:.4f}s".format(
+                    payload, codec, len(body), (perf_counter() - started) / rounds))
+        queue(connection).delete()
+
+
+class StubCoreHandler(BaseHTTPRequestHandler):
+    """DIRBS core stub answering imei-batch calls, a fixed share of batches responds slowly."""
+
+    latency = 0.05
+    slow_latency = 1.0
+    slow_ratio = 0.05
+
+    def log_message(self, *args):
+        """Keep benchmark output quiet."""
+
+    def do_POST(self):
+        """Answer an imei-batch call after the latency of its batch."""
+        imeis = json.loads(self.rfile.read(int(self.headers['Content-Length'])))['imeis']
+        slow = random.Random(imeis[0]).random() < self.slow_ratio  # same batches are slow in every run
+        sleep(self.slow_latency if slow else self.latency)
+        body = json.dumps({"results": [{"imei_norm": imei} for imei in imeis]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@manager.option('-b', '--batches', dest='batches', type=int, default=200, help='IMEI batches of benchmarked request')
+@manager.option('-s', '--slow-ratio', dest='slow_ratio', type=float, default=0.05, help='share of slow batches')
+@manager.option('-l', '--slow-latency', dest='slow_latency', type=float, default=1.0, help='seconds of slow batches')
+def benchmark_batch_scheduling(batches, slow_ratio, slow_latency):
+    """Compare static per thread chunks with the shared batch queue against a stub core with skewed latencies."""
+    StubCoreHandler.slow_ratio, StubCoreHandler.slow_latency = slow_ratio, slow_latency
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubCoreHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    app.config['dev_config']['dirbs_core']['BaseUrl'] = 'http://127.0.0.1:{0}/api'.format(server.server_port)
+    batch_size = app.config['system_config']['global']['ImeiBatchSize']
+    imeis = [str(35000000000000 + imei) for imei in range(batches * batch_size)]
+
+    # static chunks: every thread fetches the batches assigned to it up front
+    finished, records, unprocessed_imeis = [], [], []
+    started = perf_counter()
+
+    def fetch_chunk(chunk):
+        BulkCommonResources.get_records(chunk, records, unprocessed_imeis)
+        finished.append(perf_counter() - started)
+    threads = [Thread(target=fetch_chunk, args=(chunk,)) for chunk in BulkCommonResources.chunked_data(imeis)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print("static chunks  {0:7.2f}s  first thread idle at {1:.2f}s, {2} records".format(
+        max(finished), min(finished), len(records)))
+
+    # shared queue: threads take the next batch as soon as they are free
+    started = perf_counter()
+    records, _, _ = BulkCommonResources.start_threads(BulkCommonResources.chunked_data(imeis), 0)
+    print("shared queue   {0:7.2f}s  {1} records".format(perf_counter() - started, len(records)))
+    server.shutdown()
+
+
 if __name__ == '__main__':
     manager.run()
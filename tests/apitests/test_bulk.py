@@ -193,3 +193,24 @@ def test_bulk_via_tac_failure(flask_app):
     assert response.mimetype == 'application/json'
     assert json.loads(response.get_data(as_text=True))['task_id'] is not None
     assert json.loads(response.get_data(as_text=True))['message'] is not None
+
+
+def test_bulk_via_tac_cancelled(flask_app):
+    summary_data = {
+        "tracking_id": '1234567-asdfgh-890124',
+        "input": '67890223',
+        "input_type": "tac",
+        "status": 'CANCELLED'
+    }
+    summary_record = Summary.create(summary_data)
+    request_data = {
+        "username": 'username',
+        "user_id": 'user_id',
+        "summary_id": summary_record
+    }
+    Request.create(request_data)
+    response = flask_app.post('/api/v1/bulk', data=dict(tac='67890223', indicator='False', username='username', user_id='678126378126378'))
+    task_id = json.loads(response.get_data(as_text=True))['task_id']
+    assert response.status_code == 200
+    assert task_id != '1234567-asdfgh-890124'  # resubmitted under a new tracking id
+    assert Summary.find_by_input('67890223')['tracking_id'] == task_id
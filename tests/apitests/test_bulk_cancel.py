@@ -0,0 +1,122 @@
+"""
+ SPDX-License-Identifier: BSD-4-Clause-Clear
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ All rights reserved.
+
+ Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+ limitations in the disclaimer below) provided that the following conditions are met:
+
+ * Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+ * Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+ * All advertising materials mentioning features or use of this software, or any deployment of this software, or
+   documentation accompanying any distribution of this software, must display the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+   products derived from this software without specific prior written permission.
+
+ SPDX-License-Identifier: ZLIB-ACKNOWLEDGEMENT
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ This software is provided 'as-is', without any express or implied warranty. In no event will the authors be held liable
+ for any damages arising from the use of this software.
+
+ Permission is granted to anyone to use this software for any purpose, including commercial applications, and to alter
+ it and redistribute it freely, subject to the following restrictions:
+
+ * The origin of this software must not be misrepresented; you must not claim that you wrote the original software. If
+   you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Altered source versions must be plainly marked as such, and must not be misrepresented as being the original software.
+ * This notice may not be removed or altered from any source distribution.
+
+ NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+ THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+ THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+ DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+ BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.                                                               #
+"""
+
+import json
+from app import app, celery
+from app.api.v1.models.summary import Summary
+from app.api.v1.helpers.bulk_common import BulkCommonResources
+from app.api.v1.helpers.progress import ProgressTracker
+from app.api.v1.helpers.retry_policy import RetryPolicy
+from app.api.v1.helpers.tasks import CeleryTasks
+from app.api.v1.helpers.job_input import JobInputStore
+from app.api.v1.models.job_progress import JobProgress
+
+
+def test_bulk_cancel(flask_app, mocker):
+    """Test cancel API marks pending request cancelled without revoking its task id."""
+    revoke = mocker.patch.object(celery.control, 'revoke')
+    tracking_id = 'cancel-task-id'
+    Summary.create({"tracking_id": tracking_id, "input": 'cancel.txt', "input_type": "file", "status": 'PENDING'})
+    response = flask_app.post('/api/v1/cancel/' + tracking_id)
+    assert response.status_code == 200 and response.mimetype == 'application/json'
+    assert json.loads(response.get_data(as_text=True))['state'] == 'CANCELLED'
+    assert Summary.find_by_trackingid(tracking_id)['status'] == 'CANCELLED' and Summary.is_cancelled(tracking_id)
+    response = flask_app.post('/api/v1/cancel/' + tracking_id)
+    assert 'message' in json.loads(response.get_data(as_text=True)) and not revoke.called
+    response = flask_app.post('/api/v1/cancel/unknown-task-id')
+    assert json.loads(response.get_data(as_text=True))['state'] == 'task not found.'
+
+
+def test_cancelled_fetch_loop_stops(flask_app, mocker):
+    """Test fetch loop stops within one batch of cancellation and keeps fetched records."""
+    mocker.patch.dict(app.config['system_config']['global'], {'CancelCheckInterval': 0})
+    tracking_id = 'cancel-loop-task-id'
+    Summary.create({"tracking_id": tracking_id, "input": 'cancel-loop.txt', "input_type": "file",
+                    "status": 'PENDING'})
+
+    def post_batch(imeis, records):
+        records.extend({'imei_norm': imei} for imei in imeis)
+        Summary.cancel(tracking_id)
+        return 200
+
+    mocker.patch.object(BulkCommonResources, 'post_batch', side_effect=post_batch)
+    records, unprocessed_imeis = [], []
+    batches = [['3500000000000%d' % index] for index in range(5)]
+    BulkCommonResources.get_records(batches, records, unprocessed_imeis, RetryPolicy(), ProgressTracker(tracking_id))
+    assert BulkCommonResources.post_batch.call_count == 1 and len(records) == 1 and len(batches) == 4
+
+
+def test_cancelled_summary_logged(flask_app, mocker):
+    """Test summary of a cancelled request keeps partial counts and cancelled state."""
+    mocker.patch('app.api.v1.helpers.tasks.AsyncResult').return_value.state = 'SUCCESS'
+    tracking_id = 'cancel-log-task-id'
+    Summary.create({"tracking_id": tracking_id, "input": 'cancel-log.txt', "input_type": "file", "status": 'PENDING'})
+    Summary.cancel(tracking_id)
+    CeleryTasks.log_results({"response": {"verified_imei": 1, "cancelled": True}, "task_id": tracking_id},
+                            input='cancel-log.txt')
+    result = Summary.find_by_trackingid(tracking_id)
+    assert result['status'] == 'CANCELLED' and result['response']['response']['verified_imei'] == 1
+    response = json.loads(flask_app.post('/api/v1/bulkstatus/' + tracking_id).get_data(as_text=True))
+    assert response['state'] == 'CANCELLED' and response['result']['response']['verified_imei'] == 1
+
+
+def test_queued_cancelled_request_cleaned_up(flask_app, mocker, tmpdir):
+    """Test a request cancelled while queued stops before its first batch and its progress and input are removed."""
+    mocker.patch.dict(app.config['system_config']['global'], {'JobInputStore': 'local', 'JobInputDir': str(tmpdir)})
+    mocker.patch('app.api.v1.helpers.tasks.AsyncResult').return_value.state = 'SUCCESS'
+    mocker.patch.object(BulkCommonResources, 'post_batch', return_value=200)
+    tracking_id = 'cancel-queued-task-id'
+    Summary.create({"tracking_id": tracking_id, "input": 'cancel-queued.txt', "input_type": "file",
+                    "status": 'PENDING'})
+    CeleryTasks.start_progress(tracking_id, 2)
+    stored = JobInputStore.put(tracking_id, ['01206400000001', '35332206000303'])
+    flask_app.post('/api/v1/cancel/' + tracking_id)
+    records, _, unprocessed_imeis = CeleryTasks.fetch_records(JobInputStore.get(stored), 0, 'threads', {}, [],
+                                                              ProgressTracker(tracking_id))
+    assert not BulkCommonResources.post_batch.called and records == []
+    CeleryTasks.log_results({"response": {}, "task_id": tracking_id}, input='cancel-queued.txt')
+    assert Summary.find_by_trackingid(tracking_id)['status'] == 'CANCELLED'
+    assert JobProgress.find_by_trackingid(tracking_id) is None and not tmpdir.listdir()
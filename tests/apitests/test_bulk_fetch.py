@@ -0,0 +1,484 @@
+"""
+ SPDX-License-Identifier: BSD-4-Clause-Clear
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ All rights reserved.
+
+ Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+ limitations in the disclaimer below) provided that the following conditions are met:
+
+ * Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+ * Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+ * All advertising materials mentioning features or use of this software, or any deployment of this software, or
+   documentation accompanying any distribution of this software, must display the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+   products derived from this software without specific prior written permission.
+
+ SPDX-License-Identifier: ZLIB-ACKNOWLEDGEMENT
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ This software is provided 'as-is', without any express or implied warranty. In no event will the authors be held liable
+ for any damages arising from the use of this software.
+
+ Permission is granted to anyone to use this software for any purpose, including commercial applications, and to alter
+ it and redistribute it freely, subject to the following restrictions:
+
+ * The origin of this software must not be misrepresented; you must not claim that you wrote the original software. If
+   you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Altered source versions must be plainly marked as such, and must not be misrepresented as being the original software.
+ * This notice may not be removed or altered from any source distribution.
+
+ NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+ THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+ THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+ DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+ BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.                                                               #
+"""
+
+from app import app
+from app.api.v1.helpers.async_bulk import AsyncBulkResources
+from app.api.v1.helpers.batch_controller import BatchController
+from app.api.v1.helpers.retry_policy import CircuitBreaker, RetryPolicy
+from app.api.v1.helpers.bulk_common import BulkCommonResources
+from app.api.v1.helpers.imei_range import ImeiRange
+from app.api.v1.helpers.imei_array import ImeiArray
+from app.api.v1.helpers.result_cache import ResultCache
+from app.api.v1.helpers.job_input import JobInputStore
+from app.api.v1.helpers.fetch_executor import FetchExecutor
+from app.api.v1.helpers.hedge_policy import HedgePolicy
+from app.api.v1.helpers.progress import ProgressTracker
+from collections import OrderedDict
+from threading import Event, Lock, Thread, current_thread
+from time import sleep
+import numpy as np
+
+
+def imei_range(start, count):
+    """Helper to generate consecutive IMEIs."""
+    return [str(int(start) + x) for x in range(count)]
+
+
+async def stub_get_records(client, imeis, records):
+    """Stub core batch call, IMEI 35000000009999 poisons its batch."""
+    if '35000000009999' in imeis:
+        return 503
+    records.extend({'imei_norm': imei} for imei in imeis)
+    return 200
+
+
+def test_batch_data(flask_app):
+    """Test IMEIs are divided into batches of configured size."""
+    imeis = imei_range('35000000000000', 2500)
+    batches = BulkCommonResources.batch_data(imeis)
+    assert [len(batch) for batch in batches] == [1000, 1000, 500]
+    assert sum(batches, []) == imeis
+
+
+def test_lazy_tac_range(flask_app):
+    """Test TAC range generates the same IMEIs lazily and travels as a compact descriptor."""
+    tac_range = ImeiRange('35000000', 0, 2500)
+    assert list(tac_range) == imei_range('35000000000000', 2500)
+    assert ImeiRange('01234567', 0, 2)[1] == '01234567000001'
+    batches = BulkCommonResources.batch_data(tac_range)
+    assert all(isinstance(batch, ImeiRange) for batch in batches)
+    assert [len(batch) for batch in batches] == [1000, 1000, 500]
+    assert list(batches[2]) == imei_range('35000000002000', 500)
+    payload = ImeiRange.dump(tac_range[1000:])
+    assert payload == {'tac': '35000000', 'start': 1000, 'count': 1500, 'width': 6}
+    assert list(ImeiRange.load(payload)) == imei_range('35000000001000', 1500)
+    assert ImeiRange.load(['35000000000000']) == ['35000000000000']
+
+
+def test_packed_imei_array(flask_app):
+    """Test uploaded IMEIs are packed compactly, sliced without copies and restored as strings."""
+    imeis = ['01206400000001', '35332206000303', '12344321000020']
+    packed = ImeiArray.pack(imeis)
+    assert packed.values.dtype == np.int64 and list(packed) == imeis
+    assert np.shares_memory(packed[1:].values, packed.values) and list(packed[1:]) == imeis[1:]
+    mixed = ImeiArray.pack(['01206400000001', '3533220600030A', '123443210000201'])
+    assert mixed.values.itemsize == 16 and list(mixed) == ['01206400000001', '3533220600030A', '123443210000201']
+    for array in (packed, mixed):
+        assert list(ImeiRange.load(ImeiRange.dump(array))) == list(array)
+    large = ImeiArray.pack(imei_range('35000000000000', 2500))
+    assert large.values.nbytes == 2500 * 8
+    assert [list(batch) for batch in BulkCommonResources.batch_data(large)][2] == imei_range('35000000002000', 500)
+
+
+def test_job_input_claim_check(flask_app, mocker, tmpdir):
+    """Test stored bulk input is passed by reference and read back range by range."""
+    mocker.patch.dict(flask_app.application.config['system_config']['global'],
+                      {'JobInputStore': 'local', 'JobInputDir': str(tmpdir)})
+    imeis = imei_range('35000000000000', 2500)
+    reference = JobInputStore.put('job-1', imeis)
+    assert reference == {"input": 'job-1', "start": 0, "count": 2500, "width": 14}
+    assert list(ImeiRange.load(reference)) == imeis
+    part = JobInputStore.part(reference, 2000, 1000)
+    assert part['count'] == 500 and list(ImeiRange.load(part)) == imeis[2000:]
+    JobInputStore.delete('job-1')
+    assert not tmpdir.listdir()
+
+
+def test_async_fetch_tac_range(flask_app, mocker):
+    """Test async engine fetches batches of a lazy TAC range."""
+    mocker.patch.object(AsyncBulkResources, 'get_records', new=stub_get_records)
+    records, _, unprocessed_imeis = AsyncBulkResources.start_fetch(ImeiRange('35000000', 0, 10000), 0)
+    assert len(records) == 9000 and unprocessed_imeis == [imei_range('35000000009000', 1000)]
+
+
+def test_async_fetch_contract(flask_app, mocker):
+    """Test async engine returns records and unprocessed batches like the thread engine."""
+    mocker.patch.object(AsyncBulkResources, 'get_records', new=stub_get_records)
+    imeis = imei_range('35000000000000', 10000)
+    fetch_stats = {}
+    records, invalid_imeis, unprocessed_imeis = AsyncBulkResources.start_fetch(imeis, 3, fetch_stats=fetch_stats)
+    assert fetch_stats['core_retries']['retried_batches'] == flask_app.application.config['system_config']['global']['Retry']
+    assert invalid_imeis == 3
+    assert len(records) == 9000
+    assert len(unprocessed_imeis) == 1
+    assert '35000000009999' in unprocessed_imeis[0]
+
+
+def test_async_fetch_empty_input(flask_app, mocker):
+    """Test async engine with nothing to fetch."""
+    mocker.patch.object(AsyncBulkResources, 'get_records', new=stub_get_records)
+    records, invalid_imeis, unprocessed_imeis = AsyncBulkResources.start_fetch([], 0)
+    assert records == []
+    assert unprocessed_imeis == []
+
+
+def test_batch_controller_grows_under_target(flask_app):
+    """Test controller adds concurrency while core latency stays under target."""
+    controller = BatchController()
+    concurrency = controller.concurrency
+    for _ in range(concurrency):
+        controller.record(0.01, 200)
+    assert controller.concurrency == concurrency + 1
+    assert controller.batch_size == controller.max_batch_size
+
+
+def test_batch_controller_backs_off(flask_app):
+    """Test controller halves batch size and concurrency on core errors and timeouts."""
+    controller = BatchController()
+    concurrency, batch_size = controller.concurrency, controller.batch_size
+    controller.record(0.01, 503)
+    assert controller.concurrency == max(controller.min_concurrency, concurrency // 2)
+    assert controller.batch_size == max(controller.min_batch_size, batch_size // 2)
+    controller.record(0.01, None)  # same round trip, no second decrease
+    assert controller.decreases == 1
+    assert [len(batch) for batch in controller.batches(imei_range('35000000000000', 1200))] == [500, 500, 200]
+
+
+def test_async_fetch_adaptive_report(flask_app, mocker):
+    """Test adaptive async fetch reports its chosen values."""
+    mocker.patch.dict(flask_app.application.config['system_config']['global'], {'AdaptiveFetch': True})
+    mocker.patch.object(AsyncBulkResources, 'get_records', new=stub_get_records)
+    fetch_stats = {}
+    records, _, unprocessed_imeis = AsyncBulkResources.start_fetch(imei_range('35000000000000', 20000), 0,
+                                                                   fetch_stats=fetch_stats)
+    assert len(records) + sum(len(imeis) for imeis in unprocessed_imeis) == 20000
+    assert fetch_stats['adaptive_fetch']['decreases'] >= 1
+    assert fetch_stats['adaptive_fetch']['batch_size'] >= 100
+
+
+def test_retry_backoff_is_jittered_and_capped(flask_app):
+    """Test retry delays grow exponentially under the cap with jitter."""
+    policy = RetryPolicy()
+    delays = [policy.delay(attempt) for attempt in range(1, 20)]
+    assert all(0 <= delay <= policy.cap for delay in delays)
+    assert len(set(delays)) > 1
+    assert policy.retried_batches == 19
+
+
+def test_circuit_breaker_trips_and_recovers(flask_app, mocker):
+    """Test breaker opens above error rate, lets one probe through after cooldown and closes on success."""
+    breaker = CircuitBreaker()
+    for _ in range(breaker.window.maxlen):
+        assert breaker.acquire() == 0
+        breaker.record(503)
+    assert breaker.state == 'open' and breaker.trips == 1
+    assert breaker.acquire() > 0
+
+    mocker.patch('app.api.v1.helpers.retry_policy.monotonic', return_value=breaker.opened_at + breaker.cooldown)
+    assert breaker.acquire() == 0  # probe
+    assert breaker.acquire() > 0  # others wait for probe
+    breaker.record(None)
+    assert breaker.state == 'open' and breaker.trips == 2
+
+    mocker.patch('app.api.v1.helpers.retry_policy.monotonic', return_value=breaker.opened_at + breaker.cooldown)
+    assert breaker.acquire() == 0
+    breaker.record(200)
+    assert breaker.state == 'closed' and breaker.acquire() == 0
+
+
+def test_thread_fetch_retries_failed_batch(flask_app, mocker):
+    """Test thread engine retries a failing batch on its own until it succeeds."""
+    responses = [None, 503, 200]
+
+    def stub_post_batch(imeis, records):
+        status = responses.pop(0) if responses else 200
+        if status == 200:
+            records.extend({'imei_norm': imei} for imei in imeis)
+        return status
+    mocker.patch.object(BulkCommonResources, 'post_batch', side_effect=stub_post_batch)
+    fetch_stats = {}
+    records, _, unprocessed_imeis = BulkCommonResources.start_threads(
+        BulkCommonResources.chunked_data(imei_range('35000000000000', 1000)), 0, fetch_stats=fetch_stats)
+    assert len(records) == 1000 and unprocessed_imeis == []
+    assert fetch_stats['core_retries'] == {"retried_batches": 2, "breaker_trips": 0}
+
+
+def test_thread_fetch_shares_batch_queue(flask_app, mocker):
+    """Test batches left behind a stalled batch are taken by other threads instead of waiting for it."""
+    mocker.patch.dict(flask_app.application.config['system_config']['global'], {'NoOfThreads': 2})
+    stalled, others = [], []
+    rest_done, lock = Event(), Lock()
+
+    def post_batch(imeis, records):
+        with lock:
+            stall = not stalled
+            (stalled if stall else others).append(imeis[0])
+        if stall:
+            assert rest_done.wait(5)  # first batch taken is stalled until all other batches are fetched
+        elif len(others) == 19:
+            rest_done.set()
+        records.extend({'imei_norm': imei} for imei in imeis)
+        return 200
+
+    mocker.patch.object(BulkCommonResources, 'post_batch', side_effect=post_batch)
+    records, _, unprocessed_imeis = BulkCommonResources.start_threads(
+        BulkCommonResources.chunked_data(imei_range('35000000000000', 20000)), 0)
+    assert rest_done.is_set() and len(records) == 20000 and unprocessed_imeis == []
+
+
+def test_shared_fetch_threads_across_jobs(flask_app, mocker):
+    """Test simultaneous jobs share capped fetch threads and take turns."""
+    mocker.patch.dict(flask_app.application.config['system_config']['global'],
+                      {'SharedFetchThreads': 2, 'NoOfThreads': 2})
+    in_flight, fetched = [0, 0], []
+    lock = Lock()
+
+    def post_batch(imeis, records):
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight)
+        sleep(0.01)
+        with lock:
+            in_flight[0] -= 1
+            fetched.append(imeis[0][:8])
+        records.extend({'imei_norm': imei} for imei in imeis)
+        return 200
+
+    mocker.patch.object(BulkCommonResources, 'post_batch', side_effect=post_batch)
+    results = {}
+
+    def job(tac, count):
+        results[tac], _, _ = BulkCommonResources.start_threads(
+            BulkCommonResources.chunked_data(imei_range(tac + '000000', count)), 0)
+
+    long_job = Thread(target=job, args=('35000000', 20000))
+    long_job.start()
+    sleep(0.02)
+    job('35111111', 2000)
+    long_job.join()
+    assert len(results['35000000']) == 20000 and len(results['35111111']) == 2000
+    assert in_flight[1] <= 2 and len(FetchExecutor._threads) == 2
+    # the short job takes turns with the long one instead of waiting for all its batches
+    assert max(index for index, tac in enumerate(fetched) if tac == '35111111') < 12
+
+
+def test_shared_fetch_threads_schedule_retries(flask_app, mocker):
+    """Test batches backing off on shared threads are scheduled for retry instead of sleeping on the thread."""
+    mocker.patch.dict(flask_app.application.config['system_config']['global'],
+                      {'SharedFetchThreads': 2, 'NoOfThreads': 2, 'Retry': 2})
+    mocker.patch.object(RetryPolicy, 'delay', return_value=0.01)
+    blocking_sleep = mocker.patch('app.api.v1.helpers.bulk_common.sleep')
+    calls = []
+
+    def post_batch(imeis, records):
+        calls.append(imeis[0])
+        if imeis[0] == '35000000001000' and calls.count(imeis[0]) < 3:
+            return 503
+        records.extend({'imei_norm': imei} for imei in imeis)
+        return 200
+
+    mocker.patch.object(BulkCommonResources, 'post_batch', side_effect=post_batch)
+    records, _, unprocessed_imeis = BulkCommonResources.start_threads(
+        BulkCommonResources.chunked_data(imei_range('35000000000000', 4000)), 0)
+    assert len(records) == 4000 and unprocessed_imeis == []
+    assert calls.count('35000000001000') == 3 and not blocking_sleep.called
+
+
+def test_shared_hedge_policy_uses_shared_pool(flask_app, mocker):
+    """Test hedged calls of shared fetch threads go through one pool of the process, kept after a request ends."""
+    mocker.patch.dict(flask_app.application.config['system_config']['global'],
+                      {'SharedFetchThreads': 2, 'HedgePercentile': 95})
+    policy = HedgePolicy.create(2, shared=True)
+    assert policy.executor is FetchExecutor.hedge_executor()
+    policy.report(None)
+    assert policy.executor.submit(len, [1]).result() == 1
+
+
+def test_thread_fetch_bisects_rejected_batch(flask_app, mocker):
+    """Test a batch rejected for one malformed IMEI is split until that IMEI is isolated and listed as rejected."""
+    calls = []
+
+    def post_batch(imeis, records):
+        calls.append(len(imeis))
+        if '35000000002345' in imeis:
+            return 400
+        records.extend({'imei_norm': imei} for imei in imeis)
+        return 200
+
+    mocker.patch.object(BulkCommonResources, 'post_batch', side_effect=post_batch)
+    fetch_stats = {}
+    records, _, unprocessed_imeis = BulkCommonResources.start_threads(
+        BulkCommonResources.chunked_data(imei_range('35000000000000', 4000)), 0, fetch_stats=fetch_stats)
+    assert len(records) == 3999 and unprocessed_imeis == []
+    assert fetch_stats['batch_bisection'] == {"bisected_batches": 10, "rejected_imeis": 1}
+    assert fetch_stats['rejected_imeis'] == ['35000000002345']
+    assert len(calls) == 4 + 2 * 10 and fetch_stats['core_retries']['retried_batches'] == 0
+
+
+def test_async_fetch_bisects_rejected_batch(flask_app, mocker):
+    """Test async engine isolates IMEIs of a rejected batch the same way."""
+    async def get_records(client, imeis, records):
+        if '35000000000007' in imeis or '35000000000500' in imeis:
+            return 422
+        records.extend({'imei_norm': imei} for imei in imeis)
+        return 200
+
+    mocker.patch.object(AsyncBulkResources, 'get_records', new=get_records)
+    fetch_stats = {}
+    records, _, unprocessed_imeis = AsyncBulkResources.start_fetch(imei_range('35000000000000', 2000), 0,
+                                                                   fetch_stats=fetch_stats)
+    assert len(records) == 1998 and unprocessed_imeis == []
+    assert sorted(fetch_stats['rejected_imeis']) == ['35000000000007', '35000000000500']
+
+
+def test_thread_fetch_does_not_bisect_auth_error(flask_app, mocker):
+    """Test client errors other than 400 and 422 come from configuration and leave batches unprocessed whole."""
+    mocker.patch.dict(app.config['system_config']['global'], {'Retry': 0})
+    mocker.patch.object(BulkCommonResources, 'post_batch', return_value=403)
+    fetch_stats = {}
+    records, _, unprocessed_imeis = BulkCommonResources.start_threads(
+        BulkCommonResources.chunked_data(imei_range('35000000000000', 4000)), 0, fetch_stats=fetch_stats)
+    assert BulkCommonResources.post_batch.call_count == 4 and len(unprocessed_imeis) == 4
+    assert fetch_stats['batch_bisection']['bisected_batches'] == 0 and fetch_stats['rejected_imeis'] == []
+
+
+def test_thread_fetch_hedges_straggler(flask_app, mocker):
+    """Test a batch call far slower than the others is duplicated and the first answer is used."""
+    mocker.patch.dict(flask_app.application.config['system_config']['global'],
+                      {'NoOfThreads': 2, 'HedgePercentile': 90, 'HedgeMaxRatio': 0.5})
+    straggler, calls, release = '35000000030000', [], Event()
+
+    def post_batch(imeis, records):
+        calls.append(imeis[0])
+        if imeis[0] == straggler and calls.count(straggler) == 1:
+            release.wait(5)  # first call of this batch hangs
+            return None
+        sleep(0.005)
+        records.extend({'imei_norm': imei} for imei in imeis)
+        return 200
+
+    mocker.patch.object(BulkCommonResources, 'post_batch', side_effect=post_batch)
+    fetch_stats = {}
+    records, _, unprocessed_imeis = BulkCommonResources.start_threads(
+        BulkCommonResources.chunked_data(imei_range('35000000000000', 40000)), 0, fetch_stats=fetch_stats)
+    assert not release.is_set()  # finished without waiting for the hanging call
+    release.set()
+    assert len(records) == 40000 and unprocessed_imeis == [] and calls.count(straggler) == 2
+    stats = fetch_stats['hedged_requests']
+    assert stats['batch_calls'] == 40 and stats['hedge_wins'] >= 1 and 1 <= stats['hedged_calls'] <= 20
+
+
+def test_hedging_capped_to_ratio_of_calls(flask_app, mocker):
+    """Test duplicate calls stay within HedgeMaxRatio of batch calls."""
+    mocker.patch.dict(flask_app.application.config['system_config']['global'],
+                      {'HedgePercentile': 95, 'HedgeMaxRatio': 0.05})
+    policy = HedgePolicy(1)
+    policy.calls = 10
+    assert not policy.allow()
+    policy.calls = 20
+    assert policy.allow() and not policy.allow() and policy.hedged == 1
+    policy.report(None)
+
+
+def local_cache(flask_app, mocker):
+    """Helper to enable an empty local result cache."""
+    mocker.patch.object(ResultCache, '_records', OrderedDict())
+    mocker.patch.object(ResultCache, '_in_flight', {})
+    mocker.patch.dict(flask_app.application.config['system_config']['global'], {'ResultCacheBackend': 'local'})
+
+
+def test_result_cache_across_jobs(flask_app, mocker):
+    """Test overlapping jobs only send cache misses to core and report hit ratio."""
+    local_cache(flask_app, mocker)
+    sent = []
+
+    def post_batch(imeis, records):
+        sent.extend(imeis)
+        records.extend({'imei_norm': imei} for imei in imeis)
+        return 200
+
+    mocker.patch.object(BulkCommonResources, 'post_batch', side_effect=post_batch)
+    first = imei_range('35000000000000', 1500)
+    BulkCommonResources.start_threads(BulkCommonResources.chunked_data(first), 0)
+    fetch_stats = {}
+    records, _, _ = BulkCommonResources.start_threads(
+        BulkCommonResources.chunked_data(imei_range('35000000001000', 1000)), 0, fetch_stats=fetch_stats)
+    assert len(sent) == 2000 and sorted(record['imei_norm'] for record in records) == imei_range('35000000001000', 1000)
+    assert fetch_stats['result_cache']['hits'] == 500 and fetch_stats['result_cache']['misses'] == 500
+    assert fetch_stats['result_cache']['hit_ratio'] == 0.5
+
+
+def test_result_cache_coalesces_in_flight(flask_app, mocker):
+    """Test a job waits for IMEIs in flight for another job instead of querying them again."""
+    local_cache(flask_app, mocker)
+    imeis = imei_range('35000000000000', 10)
+    owner, waiter, records = ResultCache('local'), ResultCache('local'), []
+    assert owner.lookup(imeis) == ([], [], imeis)
+    thread = Thread(target=lambda: records.append(waiter.resolve(imeis + ['35000000000010'], records)))
+    thread.start()
+    owner.store(imeis, [{'imei_norm': imei} for imei in imeis])
+    thread.join()
+    assert records[-1] == ['35000000000010'] and len(records) == 11
+    assert waiter.coalesced + waiter.hits == 10 and waiter.misses == 1
+
+
+def test_async_fetch_result_cache(flask_app, mocker):
+    """Test async engine serves cached IMEIs and keeps unprocessed batches to misses."""
+    local_cache(flask_app, mocker)
+    mocker.patch.object(AsyncBulkResources, 'get_records', new=stub_get_records)
+    AsyncBulkResources.start_fetch(imei_range('35000000000000', 2000), 0)
+    fetch_stats = {}
+    records, _, unprocessed_imeis = AsyncBulkResources.start_fetch(imei_range('35000000001000', 9000), 0,
+                                                                   fetch_stats=fetch_stats)
+    assert len(records) == 8000 and fetch_stats['result_cache']['hits'] == 1000
+    assert unprocessed_imeis == [imei_range('35000000009000', 1000)]
+
+
+def test_async_fetch_progress_off_event_loop(flask_app, mocker):
+    """Test async engine looks up cancellation and publishes progress outside the event loop thread."""
+    threads = set()
+    progress = ProgressTracker('async-progress-id')
+
+    def track(*args, **kwargs):
+        threads.add(current_thread())
+        return False
+
+    mocker.patch.object(progress, 'cancelled', side_effect=track)
+    mocker.patch.object(progress, 'record', side_effect=track)
+    mocker.patch.object(AsyncBulkResources, 'get_records', new=stub_get_records)
+    records, _, _ = AsyncBulkResources.start_fetch(imei_range('35000000000000', 2000), 0, progress=progress)
+    assert len(records) == 2000 and progress.record.call_count == 2 and threads
+    assert current_thread() not in threads
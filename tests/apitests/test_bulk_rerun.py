@@ -0,0 +1,153 @@
+"""
+ SPDX-License-Identifier: BSD-4-Clause-Clear
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ All rights reserved.
+
+ Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+ limitations in the disclaimer below) provided that the following conditions are met:
+
+ * Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+ * Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+ * All advertising materials mentioning features or use of this software, or any deployment of this software, or
+   documentation accompanying any distribution of this software, must display the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+   products derived from this software without specific prior written permission.
+
+ SPDX-License-Identifier: ZLIB-ACKNOWLEDGEMENT
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ This software is provided 'as-is', without any express or implied warranty. In no event will the authors be held liable
+ for any damages arising from the use of this software.
+
+ Permission is granted to anyone to use this software for any purpose, including commercial applications, and to alter
+ it and redistribute it freely, subject to the following restrictions:
+
+ * The origin of this software must not be misrepresented; you must not claim that you wrote the original software. If
+   you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Altered source versions must be plainly marked as such, and must not be misrepresented as being the original software.
+ * This notice may not be removed or altered from any source distribution.
+
+ NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+ THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+ THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+ DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+ BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.                                                               #
+"""
+
+import os
+import json
+import pandas as pd
+from app import app
+from app.api.v1.models.summary import Summary
+from app.api.v1.helpers.bulk_common import BulkCommonResources
+from app.api.v1.helpers.unprocessed import UnprocessedImeis
+
+
+def test_unprocessed_imeis_stored(flask_app):
+    """Test unprocessed IMEI batches of a request are stored packed and replaced by later runs."""
+    UnprocessedImeis.save('stored-task-id', [['01206400000001', '35332206000303'], ['3533220600030A']])
+    assert list(UnprocessedImeis.load('stored-task-id')) == ['01206400000001', '35332206000303', '3533220600030A']
+    UnprocessedImeis.save('stored-task-id', [['01206400000001']])
+    assert list(UnprocessedImeis.load('stored-task-id')) == ['01206400000001']
+    UnprocessedImeis.save('stored-task-id', [])
+    assert UnprocessedImeis.load('stored-task-id') is None and UnprocessedImeis.count('stored-task-id') == 0
+
+
+def test_bulk_rerun_merges_summary(flask_app, mocker, mocked_imei_data):
+    """Test rerun API re-processes only unprocessed IMEIs and merges them into summary and report."""
+    mocker.patch('app.api.v1.helpers.tasks.AsyncResult').return_value.state = 'SUCCESS'
+    results = mocked_imei_data['bulk']['results']
+    tracking_id = 'rerun-task-id'
+    with BulkCommonResources.summary_context():
+        previous = BulkCommonResources.build_summary(list(results[:6]), 1, [results[6:8]])
+    Summary.create({"tracking_id": tracking_id, "input": 'rerun.txt', "input_type": "file", "status": 'PENDING'})
+    Summary.update(input='rerun.txt', status='SUCCESS', response={"response": previous, "task_id": tracking_id})
+    UnprocessedImeis.save(tracking_id, [[record['imei_norm'] for record in results[6:]]])
+
+    def post_batch(imeis, records):
+        records.extend(record for record in results if record['imei_norm'] in imeis)
+        return 200
+
+    mocker.patch.object(BulkCommonResources, 'post_batch', side_effect=post_batch)
+    response = flask_app.post('/api/v1/rerun/' + tracking_id)
+    assert json.loads(response.get_data(as_text=True))['unprocessed_imeis'] == len(results) - 6
+    with BulkCommonResources.summary_context():
+        expected = BulkCommonResources.build_summary(list(results), 1, [])
+    result = Summary.find_by_trackingid(tracking_id)
+    summary = result['response']['response']
+    assert result['status'] == 'SUCCESS' and BulkCommonResources.post_batch.call_count == 1
+    for key in ('verified_imei', 'pending_registration', 'pending_stolen_verification', 'no_condition',
+                'count_per_condition', 'non_complaint', 'unprocessed_imeis', 'invalid_imei'):
+        assert summary[key] == expected[key]
+    assert summary['compliant_report_name'] == previous['compliant_report_name']
+    report = pd.read_csv(os.path.join(app.config['dev_config']['UPLOADS']['report_dir'],
+                                      summary['compliant_report_name']), sep='\t', index_col=0)
+    assert len(report) == summary['non_complaint'] and list(report.index) == list(range(len(report)))
+    assert UnprocessedImeis.load(tracking_id) is None
+    response = flask_app.post('/api/v1/rerun/' + tracking_id)
+    assert json.loads(response.get_data(as_text=True))['message'] == 'No unprocessed IMEIs to re-process.'
+
+
+def test_bulk_rerun_requires_finished_request(flask_app):
+    """Test rerun API refuses requests in process and unknown requests."""
+    Summary.create({"tracking_id": 'rerun-pending-id', "input": 'rerun-pending.txt', "input_type": "file",
+                    "status": 'PENDING'})
+    UnprocessedImeis.save('rerun-pending-id', [['01206400000001']])
+    response = flask_app.post('/api/v1/rerun/rerun-pending-id')
+    assert json.loads(response.get_data(as_text=True))['state'] == 'PENDING'
+    assert 'message' in json.loads(response.get_data(as_text=True))
+    response = flask_app.post('/api/v1/rerun/unknown-task-id')
+    assert json.loads(response.get_data(as_text=True))['state'] == 'task not found.'
+
+
+def test_bulk_rerun_refuses_failed_request(flask_app):
+    """Test rerun API refuses failed requests, they have no summary to merge re-processed IMEIs into."""
+    Summary.create({"tracking_id": 'rerun-failed-id', "input": 'rerun-failed.txt', "input_type": "file",
+                    "status": 'PENDING'})
+    Summary.update(input='rerun-failed.txt', status='FAILURE', response={"response": {}, "task_id": 'rerun-failed-id'})
+    UnprocessedImeis.save('rerun-failed-id', [['01206400000001']])
+    response = json.loads(flask_app.post('/api/v1/rerun/rerun-failed-id').get_data(as_text=True))
+    assert response['state'] == 'FAILURE' and 'unprocessed_imeis' not in response
+    assert Summary.find_by_trackingid('rerun-failed-id')['status'] == 'FAILURE'
+
+
+def test_bulk_rerun_nothing_verified(flask_app, mocker, mocked_imei_data):
+    """Test a rerun verifying no IMEI leaves summary and stored IMEIs of the request unchanged."""
+    mocker.patch('app.api.v1.helpers.tasks.AsyncResult').return_value.state = 'SUCCESS'
+    results = mocked_imei_data['bulk']['results']
+    tracking_id = 'rerun-down-id'
+    with BulkCommonResources.summary_context():
+        previous = BulkCommonResources.build_summary(list(results[:6]), 1, [results[6:8]])
+    Summary.create({"tracking_id": tracking_id, "input": 'rerun-down.txt', "input_type": "file", "status": 'PENDING'})
+    Summary.update(input='rerun-down.txt', status='SUCCESS', response={"response": previous, "task_id": tracking_id})
+    UnprocessedImeis.save(tracking_id, [[record['imei_norm'] for record in results[6:8]]])
+    mocker.patch.object(BulkCommonResources, 'post_batch', return_value=503)  # core still down
+    flask_app.post('/api/v1/rerun/' + tracking_id)
+    result = Summary.find_by_trackingid(tracking_id)
+    assert result['status'] == 'SUCCESS' and result['response']['response'] == previous
+    assert UnprocessedImeis.count(tracking_id) == 2
+
+
+def test_bulk_rerun_not_cancelled(flask_app):
+    """Test a request re-processing its unprocessed IMEIs can not be cancelled and keeps its summary."""
+    tracking_id = 'rerun-cancel-id'
+    Summary.create({"tracking_id": tracking_id, "input": 'rerun-cancel.txt', "input_type": "file",
+                    "status": 'PENDING'})
+    Summary.update(input='rerun-cancel.txt', status='SUCCESS',
+                   response={"response": {"verified_imei": 3}, "task_id": tracking_id})
+    Summary.rerun(tracking_id)
+    response = json.loads(flask_app.post('/api/v1/cancel/' + tracking_id).get_data(as_text=True))
+    assert response['state'] == 'PENDING' and response['message'] == \
+        'Re-processing of unprocessed IMEIs can not be cancelled.'
+    assert not Summary.is_cancelled(tracking_id)
+    assert Summary.find_by_trackingid(tracking_id)['response']['response'] == {"verified_imei": 3}
@@ -45,6 +45,12 @@
 """
 
 import json
+from datetime import timedelta
+from app import db
+from app.api.v1.models.summary import Summary
+from app.api.v1.models.job_progress import JobProgress
+from app.api.v1.helpers.progress import ProgressTracker
+from app.api.v1.helpers.tasks import CeleryTasks
 
 
 def test_bulk_status_task_id(flask_app):
@@ -62,3 +68,37 @@ def test_bulk_status_mimetype(flask_app):
     response = flask_app.post('/api/v1/bulkstatus/' + tracking_id)
     assert response.status_code == 200
     assert response.mimetype == 'application/json'
+
+
+def test_bulk_status_progress(flask_app, mocker):
+    """Test bulk status API reports live progress of a pending request."""
+    tracking_id = 'progress-task-id'
+    Summary.create({"tracking_id": tracking_id, "input": 'progress.txt', "input_type": "file", "status": 'PENDING'})
+    JobProgress.create(tracking_id, 5000)
+    response = flask_app.post('/api/v1/bulkstatus/' + tracking_id)
+    progress = json.loads(response.get_data(as_text=True))['progress']
+    assert progress['imeis_done'] == 0 and progress['imeis_per_second'] is None and progress['eta_seconds'] is None
+    tracker = ProgressTracker(tracking_id)
+    mocker.patch('app.api.v1.helpers.progress.JobProgress.add', wraps=JobProgress.add)
+    tracker.record(1000)  # first batch is published right away
+    response = flask_app.post('/api/v1/bulkstatus/' + tracking_id)
+    progress = json.loads(response.get_data(as_text=True))['progress']
+    # no rate is known until progress is updated after the first batch
+    assert progress['imeis_done'] == 1000 and progress['imeis_per_second'] is None and progress['eta_seconds'] is None
+    tracker.record(1000)
+    tracker.record(1000, processed=False)
+    assert JobProgress.add.call_count == 1  # later batches wait for the publish interval
+    tracker.publish()
+    response = flask_app.post('/api/v1/bulkstatus/' + tracking_id)
+    progress = json.loads(response.get_data(as_text=True))['progress']
+    assert progress['total_imeis'] == 5000 and progress['imeis_done'] == 3000
+    assert progress['batches_done'] == 2 and progress['batches_failed'] == 1
+    job_progress = JobProgress.query.get(tracking_id)
+    job_progress.started_time = job_progress.updated_time - timedelta(seconds=10)
+    db.session.commit()
+    response = flask_app.post('/api/v1/bulkstatus/' + tracking_id)
+    progress = json.loads(response.get_data(as_text=True))['progress']
+    assert progress['imeis_per_second'] == 300.0 and progress['eta_seconds'] == 6
+    CeleryTasks.clear_progress(tracking_id)
+    response = flask_app.post('/api/v1/bulkstatus/' + tracking_id)
+    assert 'progress' not in json.loads(response.get_data(as_text=True))
@@ -46,7 +46,18 @@
 
 import os
 from app.api.v1.helpers.tasks import CeleryTasks
+from app.api.v1.helpers.core_client import CoreClient
+from app.api.v1.helpers.bulk_common import BulkCommonResources
+from app.api.v1.helpers.summary_aggregator import SummaryAggregator
+from app.api.v1.helpers.bulk_pipeline import BulkPipeline
+from app.api.v1.helpers.job_input import JobInputStore
+from app.api.v1.helpers.imei_array import ImeiArray
+from kombu.compression import compress, decompress
+from kombu.serialization import dumps, loads
+from app.api.v1.helpers.core_codec import CoreCodec
+import billiard
 import pandas as pd
+import pytest
 
 
 def test_dvs_bulk_summary():
@@ -81,3 +92,254 @@ def test_compliant_report(app):
 def test_report_deletion():
     """Tests report deletion process"""
     CeleryTasks.delete_files()
+
+
+def test_core_client_pooled_session(app):
+    """Tests core client reuses one pooled keep-alive session per traffic class."""
+    assert CoreClient.session() is CoreClient.session()
+    assert CoreClient.session('bulk') is not CoreClient.session('interactive')
+    adapter = CoreClient.session('bulk').get_adapter(CoreClient.url('imei-batch'))
+    assert adapter._pool_maxsize == app.config['system_config']['global']['NoOfThreads']
+    assert CoreClient.timeout() == (app.config['system_config']['global']['CoreConnectTimeout'],
+                                    app.config['system_config']['global']['CoreReadTimeout'])
+    assert CoreClient.timeout(read=5)[1] == 5
+
+
+def test_core_client_bulk_pool_size(app, mocker):
+    """Tests bulk pool holds a connection per shared fetch thread and per hedged duplicate."""
+    mocker.patch.dict(app.config['system_config']['global'], {'NoOfThreads': 4, 'SharedFetchThreads': 16,
+                                                              'HedgePercentile': 95})
+    adapter = CoreClient.build_session('bulk').get_adapter(CoreClient.url('imei-batch'))
+    assert adapter._pool_maxsize == 32
+
+
+def test_streaming_summary_matches_dataframes(app, mocked_imei_data):
+    """Tests streaming summary aggregation returns the same summary and report as dataframes."""
+    records = mocked_imei_data['bulk']['results']
+    with BulkCommonResources.summary_context():
+        expected = BulkCommonResources.build_summary(list(records), 2, [['35499405000401']])
+        aggregator = SummaryAggregator()
+        aggregator.extend(records[:5])
+        aggregator.extend(records[5:])
+        response = aggregator.finalize(2, [['35499405000401']])
+    expected_report = pd.read_csv(os.path.join(app.config['dev_config']['UPLOADS']['report_dir'],
+                                               expected.pop('compliant_report_name')), sep='\t', index_col=0)
+    report = pd.read_csv(os.path.join(app.config['dev_config']['UPLOADS']['report_dir'],
+                                      response.pop('compliant_report_name')), sep='\t', index_col=0)
+    assert response == expected
+    assert report.sort_index(axis=1).equals(expected_report.sort_index(axis=1))
+    assert len(aggregator.non_compliant) == response['non_complaint']
+
+
+def test_summary_spills_over_memory_budget(app, mocked_imei_data):
+    """Tests non compliant statuses spilled over memory budget are merged into the same summary and report."""
+    records = mocked_imei_data['bulk']['results']
+    with BulkCommonResources.summary_context():
+        expected = BulkCommonResources.build_summary(list(records), 2, [])
+        aggregator = SummaryAggregator(budget=1)
+        for start in range(0, len(records), 4):
+            aggregator.extend(records[start:start + 4])
+        assert aggregator.spilled > 0 and not aggregator.non_compliant
+        assert len(aggregator.partial()['non_compliant']) == aggregator.non_compliant_count()
+        response = aggregator.finalize(2, [])
+    expected_report = pd.read_csv(os.path.join(app.config['dev_config']['UPLOADS']['report_dir'],
+                                               expected.pop('compliant_report_name')), sep='\t', index_col=0)
+    report = pd.read_csv(os.path.join(app.config['dev_config']['UPLOADS']['report_dir'],
+                                      response.pop('compliant_report_name')), sep='\t', index_col=0)
+    assert response == expected
+    assert report.sort_index(axis=1).equals(expected_report.sort_index(axis=1))
+
+
+def test_dvs_bulk_memory_budget(app, mocker):
+    """Tests DVS bulk summary of a job crossing its memory budget."""
+    imeis = ['01206400000001', '35332206000303', '12344321000020']
+    expected = CeleryTasks.get_summary(imeis, 0)['response']
+    mocker.patch.dict(app.config['system_config']['global'], {'JobMemoryBudget': 0.000001})
+    response = CeleryTasks.get_summary(imeis, 0)['response']
+    expected.pop('compliant_report_name')
+    report = pd.read_csv(os.path.join(app.config['dev_config']['UPLOADS']['report_dir'],
+                                      response.pop('compliant_report_name')), sep='\t', index_col=0)
+    assert response == expected and len(report) == response['non_complaint']
+
+
+def test_dvs_bulk_streaming_summary(app, mocker):
+    """Tests DVS bulk summary counts with streaming aggregation."""
+    mocker.patch.dict(app.config['system_config']['global'], {'StreamingSummary': True})
+    task = CeleryTasks.get_summary(['01206400000001', '35332206000303', '12344321000020', '35499405000401',
+                                    '35236005000001', '01368900000001'], 0)
+    task = task['response']
+    assert task['pending_registration'] == 8 and task['no_condition'] == 2 and \
+        task['pending_stolen_verification'] == 7 and task['verified_imei'] == 18 and \
+        task['count_per_condition']['gsma_not_found'] == 7 and task['non_complaint'] > 0
+
+
+def test_pipelined_summary_matches_dataframes(app, mocked_imei_data):
+    """Tests pipelined summary stages return the same summary and report as dataframes."""
+    records = mocked_imei_data['bulk']['results']
+    with BulkCommonResources.summary_context():
+        expected = BulkCommonResources.build_summary(list(records), 2, [['35499405000401']])
+    pipeline = BulkPipeline(size=1)
+    pipeline.feed(CoreCodec.dumps({'results': records[:5]}))
+    pipeline.extend(records[5:8])
+    pipeline.feed(CoreCodec.dumps({'results': records[8:]}))
+    response = pipeline.finalize(2, [['35499405000401']])
+    expected_report = pd.read_csv(os.path.join(app.config['dev_config']['UPLOADS']['report_dir'],
+                                               expected.pop('compliant_report_name')), sep='\t', index_col=0)
+    report = pd.read_csv(os.path.join(app.config['dev_config']['UPLOADS']['report_dir'],
+                                      response.pop('compliant_report_name')), sep='\t', index_col=0)
+    assert response == expected
+    # batches reach the report in the order their stages finish them
+    assert report.sort_values('imei').reset_index(drop=True).sort_index(axis=1).equals(
+        expected_report.sort_values('imei').reset_index(drop=True).sort_index(axis=1))
+
+
+def test_pipelined_summary_process_pool(app, mocked_imei_data):
+    """Tests pipelined summary decoded and classified in a process pool matches dataframes."""
+    records = mocked_imei_data['bulk']['results']
+    with BulkCommonResources.summary_context():
+        expected = BulkCommonResources.build_summary(list(records), 0, [])
+    pipeline = BulkPipeline(size=1, processes=2)
+    for start in range(0, len(records), 4):
+        pipeline.feed(CoreCodec.dumps({'results': records[start:start + 4]}))
+    response = pipeline.finalize(0, [])
+    report = pd.read_csv(os.path.join(app.config['dev_config']['UPLOADS']['report_dir'],
+                                      response.pop('compliant_report_name')), sep='\t', index_col=0)
+    expected.pop('compliant_report_name')
+    BulkPipeline.stop_pool()
+    assert response == expected and len(report) == response['non_complaint']
+
+
+def pipelined_summary_in_daemon(records, results):
+    """Run a process pool pipeline the way a prefork worker process does."""
+    BulkPipeline._pool = None  # pool of the parent process is not usable after fork
+    BulkPipeline.start_pool(2)
+    pipeline = BulkPipeline(size=1, processes=2)
+    pipeline.feed(CoreCodec.dumps({'results': records}))
+    results.put(pipeline.finalize(0, [])['verified_imei'])
+    BulkPipeline.stop_pool()
+
+
+def test_pipelined_summary_process_pool_daemon(mocked_imei_data):
+    """Tests pipeline process pool starts inside daemonic prefork worker processes."""
+    records = mocked_imei_data['bulk']['results']
+    results = billiard.Queue()
+    worker = billiard.Process(target=pipelined_summary_in_daemon, args=(records, results), daemon=True)
+    worker.start()
+    assert results.get(timeout=60) == len(records)
+    worker.join()
+
+
+def test_pipeline_pool_needs_pipelined_summary(app, mocker):
+    """Tests worker processes start the pipeline pool only when PipelinedSummary is on."""
+    mocker.patch.dict(app.config['system_config']['global'], {'PipelinedSummary': False, 'PipelineProcesses': 2})
+    CeleryTasks.start_pipeline_pool()
+    assert BulkPipeline.start_pool() is None and BulkPipeline._pool is None
+    mocker.patch.dict(app.config['system_config']['global'], {'PipelinedSummary': True})
+    CeleryTasks.start_pipeline_pool()
+    assert BulkPipeline._pool is not None
+    BulkPipeline.stop_pool()
+
+
+def test_pipelined_summary_stage_failure(app, mocker):
+    """Tests a failing pipeline stage keeps draining its queue and fails the summary."""
+    mocker.patch.object(BulkPipeline, 'decode', side_effect=ValueError('malformed response'))
+    pipeline = BulkPipeline(size=1)
+    for _ in range(5):
+        pipeline.feed(b'{}')
+    with pytest.raises(ValueError):
+        pipeline.finalize(0, [])
+
+
+def test_dvs_bulk_pipelined_summary(app, mocker):
+    """Tests DVS bulk summary counts with pipelined stages."""
+    mocker.patch.dict(app.config['system_config']['global'], {'PipelinedSummary': True, 'PipelineQueueSize': 1})
+    task = CeleryTasks.get_summary(['01206400000001', '35332206000303', '12344321000020', '35499405000401',
+                                    '35236005000001', '01368900000001'], 0)
+    task = task['response']
+    assert task['pending_registration'] == 8 and task['no_condition'] == 2 and \
+        task['pending_stolen_verification'] == 7 and task['verified_imei'] == 18 and \
+        task['count_per_condition']['gsma_not_found'] == 7 and task['non_complaint'] > 0
+    report = pd.read_csv(os.path.join(app.config['dev_config']['UPLOADS']['report_dir'],
+                                      task['compliant_report_name']), sep='\t', index_col=0)
+    assert len(report) == task['non_complaint']
+
+
+def test_dvs_bulk_stored_input(app, mocker, tmpdir):
+    """Tests bulk summary of an input passed by job input store reference matches inline IMEIs."""
+    imeis = ['01206400000001', '35332206000303', '12344321000020']
+    expected = CeleryTasks.get_summary(imeis, 0)['response']
+    mocker.patch.dict(app.config['system_config']['global'], {'JobInputStore': 'local', 'JobInputDir': str(tmpdir)})
+    response = CeleryTasks.get_summary(JobInputStore.put('stored-input', imeis), 0)['response']
+    expected.pop('compliant_report_name')
+    response.pop('compliant_report_name')
+    assert response == expected
+
+
+def test_dvs_bulk_distributed_summary(app, mocker):
+    """Tests partial summaries of distributed subtasks merge into the bulk summary format."""
+    imeis = ['01206400000001', '35332206000303', '12344321000020', '35499405000401', '35236005000001',
+             '01368900000001']
+    single = CeleryTasks.get_summary(imeis[:3], 0)['response']
+    partials = [CeleryTasks.process_batches(imeis[:3]), CeleryTasks.process_batches(imeis[3:])]
+    mocker.patch.object(CeleryTasks, 'fetch_records', side_effect=Exception('worker lost'))
+    partials.append(CeleryTasks.process_batches(['35499405000402']))
+    task = CeleryTasks.merge_summary(partials, 2)['response']
+    assert task.keys() == single.keys()
+    assert task['verified_imei'] == 2 * single['verified_imei'] and task['invalid_imei'] == 2
+    assert task['pending_registration'] == 2 * single['pending_registration']
+    assert task['count_per_condition'] == {name: 2 * count for name, count in single['count_per_condition'].items()}
+    assert task['non_complaint'] == 2 * single['non_complaint'] and task['unprocessed_imeis'] == 1
+    report = pd.read_csv(os.path.join(app.config['dev_config']['UPLOADS']['report_dir'],
+                                      task['compliant_report_name']), sep='\t', index_col=0)
+    assert len(report) == task['non_complaint']
+
+
+def test_distributed_missing_stored_input(app, mocker, tmpdir):
+    """Tests a subtask whose stored input is missing reports its range unprocessed instead of failing the chord."""
+    mocker.patch.dict(app.config['system_config']['global'], {'JobInputStore': 'local', 'JobInputDir': str(tmpdir)})
+    imeis = ['01206400000001', '35332206000303', '12344321000020']
+    stored = JobInputStore.put('missing-input', imeis)
+    partials = [CeleryTasks.process_batches(JobInputStore.part(stored, 0, 2))]
+    JobInputStore.delete('missing-input')
+    partials.append(CeleryTasks.process_batches(JobInputStore.part(stored, 2, 1)))
+    task = CeleryTasks.merge_summary(partials, 0)['response']
+    assert task['verified_imei'] > 0 and task['unprocessed_imeis'] == 1
+
+
+def test_distributed_fetch_stats_merge():
+    """Tests subtask fetch counters are summed while engine figures keep the latest value."""
+    fetch_stats = {}
+    CeleryTasks.merge_stats(fetch_stats, {'core_retries': {'retried_batches': 2, 'breaker_trips': 0},
+                                          'adaptive_fetch': {'batch_size': 500}})
+    CeleryTasks.merge_stats(fetch_stats, {'core_retries': {'retried_batches': 1, 'breaker_trips': 1},
+                                          'adaptive_fetch': {'batch_size': 250}})
+    assert fetch_stats == {'core_retries': {'retried_batches': 3, 'breaker_trips': 1},
+                           'adaptive_fetch': {'batch_size': 250}}
+
+
+def test_core_codec_field_extraction(app, mocker, mocked_imei_data):
+    """Tests fast codec with field extraction yields the same bulk summary as full records."""
+    imeis = ['01206400000001', '35332206000303', '12344321000020']
+    mocker.patch.dict(app.config['system_config']['global'], {'ExtractSummaryFields': False})
+    expected = CeleryTasks.get_summary(imeis, 0)['response']
+    mocker.patch.dict(app.config['system_config']['global'], {'ExtractSummaryFields': True, 'CoreJsonCodec': 'orjson'})
+    response = CeleryTasks.get_summary(imeis, 0)['response']
+    expected.pop('compliant_report_name')
+    response.pop('compliant_report_name')
+    assert response == expected
+    record = CoreCodec.batch_results(CoreCodec.dumps(mocked_imei_data['bulk']))[0]
+    assert set(record) <= set(CoreCodec.SUMMARY_FIELDS) and 'imei_norm' in record
+    assert CoreCodec.loads(CoreCodec.batch_request(imeis)) == {'imeis': imeis}
+
+
+def test_task_payloads_msgpack_zlib():
+    """Tests bulk task payloads and results round trip through compressed msgpack and shrink below json."""
+    imeis = [str(35000000000000 + imei) for imei in range(10000)]
+    summary = [{"response": {"verified_imei": 3, "count_per_condition": {"gsma_not_found": 1}}, "task_id": "abc"}]
+    for payload in ([imeis, 2], [ImeiArray.pack(imeis).descriptor(), 2], summary):
+        content_type, encoding, body = dumps(payload, serializer='msgpack')
+        compressed, compression = compress(body, 'zlib')
+        assert loads(decompress(compressed, compression), content_type, encoding, accept=[content_type]) == payload
+    assert len(compress(dumps([imeis, 2], serializer='msgpack')[2], 'zlib')[0]) < \
+        len(dumps([imeis, 2], serializer='json')[2]) / 4
+
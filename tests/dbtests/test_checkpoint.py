@@ -0,0 +1,163 @@
+"""
+ SPDX-License-Identifier: BSD-4-Clause-Clear
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ All rights reserved.
+
+ Redistribution and use in source and binary forms, with or without modification, are permitted (subject to the
+ limitations in the disclaimer below) provided that the following conditions are met:
+
+ * Redistributions of source code must retain the above copyright notice, this list of conditions and the following
+   disclaimer.
+ * Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following
+   disclaimer in the documentation and/or other materials provided with the distribution.
+ * All advertising materials mentioning features or use of this software, or any deployment of this software, or
+   documentation accompanying any distribution of this software, must display the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Neither the name of Qualcomm Technologies, Inc. nor the names of its contributors may be used to endorse or promote
+   products derived from this software without specific prior written permission.
+
+ SPDX-License-Identifier: ZLIB-ACKNOWLEDGEMENT
+
+ Copyright (c) 2018-2019 Qualcomm Technologies, Inc.
+
+ This software is provided 'as-is', without any express or implied warranty. In no event will the authors be held liable
+ for any damages arising from the use of this software.
+
+ Permission is granted to anyone to use this software for any purpose, including commercial applications, and to alter
+ it and redistribute it freely, subject to the following restrictions:
+
+ * The origin of this software must not be misrepresented; you must not claim that you wrote the original software. If
+   you use this software in a product, an acknowledgment is required by displaying the trademark/logo as per the details
+   provided here: https://www.qualcomm.com/documents/dirbs-logo-and-brand-guidelines
+ * Altered source versions must be plainly marked as such, and must not be misrepresented as being the original software.
+ * This notice may not be removed or altered from any source distribution.
+
+ NO EXPRESS OR IMPLIED LICENSES TO ANY PARTY'S PATENT RIGHTS ARE GRANTED BY THIS LICENSE. THIS SOFTWARE IS PROVIDED BY
+ THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+ THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+ DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR
+ BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.                                                               #
+"""
+
+import os
+import copy
+import pytest
+
+from app.api.v1.models.checkpoint import Checkpoint
+from app.api.v1.helpers.checkpoint import BulkCheckpoint
+from app.api.v1.helpers.summary_aggregator import SummaryAggregator
+from app.api.v1.helpers.tasks import CeleryTasks
+from app.api.v1.resources.dvs_bulk import AdminBulk
+from app.api.v1.models.summary import Summary
+
+
+def stub_fetch(template, calls, fail_at=None):
+    """Stub fetch engine returning a copy of template record per IMEI, fails at given call."""
+    def fetch_records(imeis_list, invalid_imeis, engine, fetch_stats, records, progress=None):
+        assert progress is None or hasattr(progress, 'record')  # progress tracker, not checkpoint progress
+        calls.append(imeis_list[0])
+        if len(calls) == fail_at:
+            raise ConnectionError("worker lost")
+        results = []
+        for imei in imeis_list:
+            record = copy.deepcopy(template)
+            record['imei_norm'] = imei
+            results.append(record)
+        records.extend(results)
+        return records, invalid_imeis, []
+    return fetch_records
+
+
+def test_checkpoint_save_find_delete(db):
+    """Test checkpoint insertion, update and deletion."""
+    args = {"tracking_id": 'checkpoint-task-id', "total_imeis": 10, "completed_imeis": 5, "state": {"a": 1}}
+    Checkpoint.save(args)
+    args['completed_imeis'] = 10
+    Checkpoint.save(args)
+    result = Checkpoint.find_by_trackingid('checkpoint-task-id')
+    assert result['completed_imeis'] == 10 and result['state'] == {"a": 1}
+    Checkpoint.delete('checkpoint-task-id')
+    assert Checkpoint.find_by_trackingid('checkpoint-task-id') is None
+
+
+def test_checkpointed_job_resumes(db, app, mocker, mocked_imei_data):
+    """Test a failed bulk job resumes from its first unfinished segment with its partial aggregates."""
+    mocker.patch.dict(app.config['system_config']['global'], {'CheckpointInterval': 1})
+    template = mocked_imei_data['bulk']['results'][1]  # non compliant record
+    imeis = [str(35000000000000 + x) for x in range(5000)]
+
+    calls = []
+    mocker.patch.object(CeleryTasks, 'fetch_records', new=stub_fetch(template, calls, fail_at=3))
+    with pytest.raises(ConnectionError):
+        CeleryTasks.fetch_checkpointed('resume-task-id', imeis, 0, None, {}, SummaryAggregator())
+    assert Checkpoint.find_by_trackingid('resume-task-id')['completed_imeis'] == 2000
+
+    calls = []
+    mocker.patch.object(CeleryTasks, 'fetch_records', new=stub_fetch(template, calls))
+    records, _, unprocessed_imeis = CeleryTasks.fetch_checkpointed('resume-task-id', imeis, 0, None, {},
+                                                                   SummaryAggregator())
+    assert calls == ['35000000002000', '35000000003000', '35000000004000']
+    assert len(records) == 5000 and len(records.non_compliant) == 5000 and unprocessed_imeis == []
+    assert [row['imei'] for row in records.non_compliant] == imeis
+
+    BulkCheckpoint.clear('resume-task-id')
+    assert not os.path.exists(BulkCheckpoint.rows_path('resume-task-id'))
+
+
+def test_checkpointed_job_resumes_within_memory_budget(db, app, mocker, mocked_imei_data):
+    """Test a failed bulk job with a memory budget resumes with its statuses spilled to the checkpoint rows file."""
+    mocker.patch.dict(app.config['system_config']['global'], {'CheckpointInterval': 1})
+    template = mocked_imei_data['bulk']['results'][1]  # non compliant record
+    imeis = [str(35000000000000 + x) for x in range(5000)]
+
+    calls = []
+    mocker.patch.object(CeleryTasks, 'fetch_records', new=stub_fetch(template, calls, fail_at=3))
+    with pytest.raises(ConnectionError):
+        CeleryTasks.fetch_checkpointed('budget-task-id', imeis, 0, None, {}, SummaryAggregator(budget=1))
+    assert Checkpoint.find_by_trackingid('budget-task-id')['state']['progress']['rows'] == 2000
+
+    calls = []
+    mocker.patch.object(CeleryTasks, 'fetch_records', new=stub_fetch(template, calls))
+    records, _, unprocessed_imeis = CeleryTasks.fetch_checkpointed('budget-task-id', imeis, 0, None, {},
+                                                                   SummaryAggregator(budget=1))
+    assert calls == ['35000000002000', '35000000003000', '35000000004000']
+    assert records.spilled == 5000 and not records.non_compliant and unprocessed_imeis == []
+    assert [row['imei'] for chunk in records.rows() for row in chunk] == imeis
+
+    response = records.finalize(0, unprocessed_imeis)
+    assert response['non_complaint'] == 5000 and response['verified_imei'] == 5000
+    BulkCheckpoint.clear('budget-task-id')
+    assert not os.path.exists(BulkCheckpoint.rows_path('budget-task-id'))
+
+
+def test_resubmitted_tac_scan_resumes(db, app, flask_app, mocker, mocked_imei_data):
+    """Test a failed TAC scan resubmitted under a new tracking id resumes from the checkpoint of its failed job."""
+    mocker.patch.dict(app.config['system_config']['global'], {'CheckpointInterval': 1, 'MaxImeiRange': 5000})
+    template = mocked_imei_data['bulk']['results'][1]
+    Summary.create({"tracking_id": 'tac-scan-task-id', "input": '35000011', "input_type": "tac", "status": 'PENDING'})
+    scan = AdminBulk.tac_range('35000011')
+    calls = []
+    mocker.patch.object(CeleryTasks, 'fetch_records', new=stub_fetch(template, calls, fail_at=3))
+    with pytest.raises(ConnectionError):
+        CeleryTasks.fetch_checkpointed('tac-scan-task-id', scan, 0, None, {}, SummaryAggregator())
+    Summary.update(input='35000011', status='FAILURE', response={"response": {}, "task_id": 'tac-scan-task-id'})
+
+    mocker.patch.object(CeleryTasks, 'submit', side_effect=lambda *args, **kwargs: (kwargs['task_id'], 'PENDING'))
+    flask_app.post('/api/v1/bulk', data=dict(tac='35000011', indicator='False', username='username',
+                                             user_id='678126378126378'))
+    tracking_id = CeleryTasks.submit.call_args[1]['task_id']
+    assert tracking_id != 'tac-scan-task-id' and Checkpoint.find_by_trackingid('tac-scan-task-id') is None
+    assert not os.path.exists(BulkCheckpoint.rows_path('tac-scan-task-id'))
+
+    calls = []
+    mocker.patch.object(CeleryTasks, 'fetch_records', new=stub_fetch(template, calls, fail_at=1))
+    with pytest.raises(ConnectionError):
+        CeleryTasks.fetch_checkpointed(tracking_id, CeleryTasks.submit.call_args[0][0], 0, None, {},
+                                       SummaryAggregator())
+    assert calls == ['35000011002000']  # resumed after the two segments of the failed job
+    BulkCheckpoint.clear(tracking_id)
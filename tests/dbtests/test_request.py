@@ -46,6 +46,8 @@
 
 from app.api.v1.models.request import Request
 from app.api.v1.models.summary import Summary
+from app.api.v1.helpers.scheduler import BulkScheduler
+from app import app
 
 
 def test_request_insert():
@@ -69,3 +71,18 @@ def test_request_insert():
 
     result = Request.find(request_data['summary_id'], request_data['user_id'])
     assert result is not None
+
+
+def test_scheduler_priority(db, mocker):
+    """Test fair share and shortest job priorities of bulk requests."""
+    assert BulkScheduler.priority(1000000, 'sched-user') is None
+    for index in range(3):
+        summary_id = Summary.create({"tracking_id": 'sched-task-%d' % index, "input": '6789012%d' % index,
+                                     "input_type": "tac", "status": 'PENDING'})
+        Request.create({"username": "sched", "user_id": 'sched-user', "summary_id": summary_id})
+    assert Request.pending_count('sched-user') == 3
+    mocker.patch.dict(app.config['system_config']['global'], {'SchedulingPolicies': ['shortest_job']})
+    assert BulkScheduler.priority(200) > BulkScheduler.priority(1000000) == 3
+    mocker.patch.dict(app.config['system_config']['global'], {'SchedulingPolicies': ['fair_share', 'shortest_job']})
+    assert BulkScheduler.priority(200, 'sched-user') == 4 and BulkScheduler.priority(200, 'other-user') == 7
+    assert BulkScheduler.priority(1000000, 'sched-user') == 0